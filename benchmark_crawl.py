@@ -0,0 +1,335 @@
+"""
+Benchmark harness for the crawl engines against the local mock server.
+
+Starts ``src/mock_server.py``, points ``get_config()`` at it and runs each
+engine, reporting throughput, per-page latency percentiles and CPU per page.
+The ``pipeline`` engine is the staged crawl of ``pipeline.py`` (HTTP fetch
+overlapped with extraction and CSV writes); its latencies are fetch times
+only, so its wall time can be compared with ``latency_sum``. The ``threads``
+engine requests all pages from ``--threads`` concurrent threads, as crawl
+workers do; with ``--transport`` it compares new connections per request,
+kept-alive HTTP/1.1 and multiplexed HTTP/2 (``--handshake-delay`` gives each
+new connection the set-up cost of a remote host). ``--class-hash`` renames
+the hashed product classes like a site redeploy; with ``--canary`` each run
+is preceded by the selector probe of ``canary.py`` (an aborted run is
+reported with the requests it spent). ``--plan`` compares crawl plans
+(``crawl_planner.py``): 'sweep' is the configured pages at the site's default
+page size, the others request up to ``max_page_size`` products per page; the
+listing sizes learned by one run are planned with by the next (``--plan auto
+auto``), and ``products_digest`` shows whether two plans collected the same products.
+Selenium runs also report the browser's peak resident memory (Chrome and
+chromedriver processes, sampled from /proc) and that peak per concurrent page.
+
+Usage:
+    python benchmark_crawl.py --engine requests --pages 5 --ram-sizes 8 12
+    python benchmark_crawl.py --engine requests pipeline --latency fixed:0.2
+    python benchmark_crawl.py --engine requests --stream --bandwidth 2000000
+    python benchmark_crawl.py --engine threads --threads 6 --transport http1 keepalive http2 --handshake-delay 0.1
+    python benchmark_crawl.py --engine requests --class-hash x7Kp2 --canary
+    python benchmark_crawl.py --engine requests --pages 20 --ram-sizes 8 12 16 32 --plan sweep auto auto
+    python benchmark_crawl.py --engine requests selenium --variant js --error-rate 0.05
+    python benchmark_crawl.py --engine selenium --variant js --tabs 1 4 8
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+from time import time, process_time
+sys.path.append('src')
+
+from loguru import logger
+
+from canary import SelectorDriftError, preflight
+from config import get_config, make_url_builder
+from fetcher import get_fetcher
+from field_selectors import field_rates, get_strategy, set_strategy
+from memory_budget import process_tree_rss
+from metrics import registry, STAGE_METRIC
+from mock_server import MockBestBuyServer, parse_latency_spec
+from recrawl_scheduler import records_hash
+
+
+def percentile(values, q):
+    """
+    Nearest-rank percentile of a list of numbers.
+
+    Args:
+        values (list): Samples
+        q (float): Percentile in [0, 100]
+
+    Returns:
+        float: Percentile value, 0.0 for an empty list
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def cpu_seconds():
+    """
+    CPU time of this process plus reaped children (chromedriver, Chrome).
+    """
+    times = os.times()
+    return process_time() + times.children_user + times.children_system
+
+
+class BrowserMemorySampler(threading.Thread):
+    """
+    Samples the peak RSS of the scraper's chromedriver process tree.
+    """
+
+    def __init__(self, interval=0.5):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.root_pid = None
+        self.peak = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            if self.root_pid:
+                self.peak = max(self.peak, process_tree_rss(self.root_pid))
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def run_engine(engine, config):
+    """
+    Runs one engine over the configured URL space and measures it.
+
+    Args:
+        engine (str): 'requests', 'pipeline', 'threads' or 'selenium'
+        config (dict): Scraper configuration pointing at the mock server
+
+    Returns:
+        dict: Benchmark results
+    """
+    latencies = []
+    patches = []
+    sampler = None
+
+    if engine == 'requests':
+        import scraper as module
+        owner, attribute = module, 'scrape_page'
+        run = lambda: module.scrape_all_laptops(config, make_url_builder(config))
+    elif engine == 'threads':
+        import scraper as module
+        from concurrent.futures import ThreadPoolExecutor
+        from recrawl_scheduler import plan_crawl
+        owner, attribute = module, 'scrape_page'
+        build_url = make_url_builder(config)
+
+        def run():
+            targets, _ = plan_crawl(config)
+            started = time()
+            with ThreadPoolExecutor(config.get('benchmark_threads', 4)) as executor:
+                pages = executor.map(
+                    lambda item: targets.accept(item[1][0], item[1][1], module.scrape_page(
+                        build_url(item[1][1], item[1][0]), item[0] + 1, started, config)),
+                    enumerate(targets))
+                return [record for records in pages if records for record in records]
+    elif engine == 'pipeline':
+        import pipeline as module
+        owner, attribute = module, 'fetch_page'
+        config['engine'] = 'http'
+        run = lambda: module.run_pipeline(config, make_url_builder(config))[0]
+    elif engine == 'selenium':
+        import scraper_selenium as module
+        owner, attribute = module.BestBuySeleniumScraper, 'scrape_page'
+        run = lambda: module.scrape_all_laptops(config, make_url_builder(config))
+        sampler = BrowserMemorySampler()
+        original_setup = owner.setup_driver
+
+        def sampled_setup_driver(self):
+            ok = original_setup(self)
+            service = getattr(self.driver, 'service', None)
+            if ok and service is not None and service.process is not None:
+                sampler.root_pid = service.process.pid
+            return ok
+
+        def timed_finish_tab(self, tab):
+            try:
+                return original_finish_tab(self, tab)
+            finally:
+                latencies.append(time() - tab['dispatched'])
+
+        original_finish_tab = owner._finish_tab
+        patches += [('setup_driver', original_setup, sampled_setup_driver),
+                    ('_finish_tab', original_finish_tab, timed_finish_tab)]
+    else:
+        raise ValueError(f"Unknown engine: {engine}")
+
+    original = getattr(owner, attribute)
+
+    def timed_scrape_page(*args, **kwargs):
+        started = time()
+        try:
+            return original(*args, **kwargs)
+        finally:
+            latencies.append(time() - started)
+
+    patches.append((attribute, original, timed_scrape_page))
+    for name, _, patched in patches:
+        setattr(owner, name, patched)
+    registry.reset()
+    if sampler is not None:
+        sampler.start()
+    cpu_start, wall_start = cpu_seconds(), time()
+    try:
+        data = run()
+    finally:
+        for name, unpatched, _ in patches:
+            setattr(owner, name, unpatched)
+        if sampler is not None:
+            sampler.stop()
+    wall, cpu = time() - wall_start, cpu_seconds() - cpu_start
+
+    pages = len(latencies)
+    tabs = config.get('selenium_tabs', 1) if engine == 'selenium' else None
+    memory = {}
+    if sampler is not None and sampler.peak:
+        # Attached to a browser daemon there is no child process tree to sample
+        memory = {
+            'browser_rss_peak_mb': round(sampler.peak / 2 ** 20, 1),
+            'browser_rss_per_concurrent_page_mb': round(sampler.peak / 2 ** 20 / tabs, 1)
+        }
+    return {
+        'engine': engine,
+        'tabs': tabs,
+        # The transport in use: 'http2' falls back to 'keepalive' without httpx[http2]
+        'transport': get_fetcher(config).transport.name,
+        'stream_parse': config.get('stream_parse', False),
+        'extraction_strategy': get_strategy(),
+        **memory,
+        'pages': pages,
+        'products': len(data),
+        'products_digest': records_hash(list(data))[:16],
+        'wall_seconds': round(wall, 3),
+        'pages_per_second': round(pages / wall, 3) if wall else 0.0,
+        'latency_p50': round(percentile(latencies, 50), 4),
+        'latency_p95': round(percentile(latencies, 95), 4),
+        'latency_p99': round(percentile(latencies, 99), 4),
+        'latency_max': round(max(latencies), 4) if latencies else 0.0,
+        'latency_sum': round(sum(latencies), 3),
+        'cpu_per_page': round(cpu / pages, 4) if pages else 0.0,
+        'field_rates': {key: round(value, 4) for key, value in field_rates().items()},
+        'stages': {
+            name.split('"')[1]: {key: summary[key] for key in ('count', 'sum', 'p50', 'p95')}
+            for name, summary in registry.to_dict()['histograms'].items()
+            if name.startswith(STAGE_METRIC)
+        }
+    }
+
+
+def main():
+    """
+    Parse arguments, start the mock server and benchmark each engine.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark crawl engines against the mock server')
+    parser.add_argument('--engine', nargs='+', default=['requests'],
+                        choices=['requests', 'pipeline', 'threads', 'selenium'])
+    parser.add_argument('--pages', type=int, default=5, help='Pages per RAM size')
+    parser.add_argument('--ram-sizes', nargs='+', default=['8', '12', '32'])
+    parser.add_argument('--variant', choices=['static', 'js'], default='static')
+    parser.add_argument('--latency', default='lognormal:0.05:0.5')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-429', type=float, default=0.0)
+    parser.add_argument('--hedge', action='store_true', help='Enable hedged requests')
+    parser.add_argument('--max-retries', type=int, default=3)
+    parser.add_argument('--backoff-base', type=float, default=0.1)
+    parser.add_argument('--stream', action='store_true',
+                        help='Extract while downloading (stream_parse) instead of parsing the full body')
+    parser.add_argument('--bandwidth', type=float, help='Mock server send rate in bytes/s (default: unlimited)')
+    parser.add_argument('--transport', nargs='+', default=['http1'], choices=['http1', 'keepalive', 'http2'],
+                        help='Fetch transports to compare (one run each)')
+    parser.add_argument('--threads', type=int, default=4, help='Concurrent requests of the threads engine')
+    parser.add_argument('--handshake-delay', type=float, default=0.0,
+                        help='Mock server delay per new connection (simulated TCP/TLS set-up)')
+    parser.add_argument('--class-hash', help='Rename the hashed product classes on the mock server')
+    parser.add_argument('--canary', action='store_true', help='Probe the selectors before each run')
+    parser.add_argument('--plan', nargs='+', default=['sweep'], choices=['sweep', 'filtered', 'unfiltered', 'auto'],
+                        help="Crawl plans to compare in turn ('sweep': configured pages at the default page size)")
+    parser.add_argument('--tabs', nargs='+', type=int, default=[1],
+                        help='Selenium tab pool sizes to compare (one run each)')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level='WARNING')
+
+    server = MockBestBuyServer({
+        'variant': args.variant,
+        'latency': parse_latency_spec(args.latency),
+        'error_rate': args.error_rate,
+        'rate_429': args.rate_429,
+        'bandwidth': args.bandwidth,
+        'handshake_delay': args.handshake_delay,
+        'class_hash': args.class_hash
+    })
+
+    results = []
+    runs = [(engine, tabs, transport, plan) for engine in args.engine
+            for tabs in (args.tabs if engine == 'selenium' else [1])
+            for transport in (args.transport if engine != 'selenium' else ['http1'])
+            for plan in args.plan]
+    # Listing sizes learned by one run are planned with by the following ones
+    plan_state = tempfile.NamedTemporaryFile(suffix='_crawl_plan.json', delete=False).name
+    os.remove(plan_state)
+    with server:
+        for engine, tabs, transport, plan in runs:
+            config = get_config()
+            config.update({
+                'base_url': server.base_url,
+                # The engines besides selenium fetch over HTTP only (matters to the canary)
+                'engine': 'selenium' if engine == 'selenium' else 'http',
+                'pages': [str(page) for page in range(1, args.pages + 1)],
+                'ram_sizes': args.ram_sizes,
+                'sleep_min': 0,
+                'sleep_max': 0,
+                'request_budget': args.pages * len(args.ram_sizes),
+                'recrawl_state_file': None,
+                'archive_path': None,
+                'aggregates_dir': None,
+                'dataset_dir': None,
+                'output_file': os.path.join(tempfile.gettempdir(), 'benchmark_crawl.csv'),
+                'hedge_requests': args.hedge,
+                'max_retries': args.max_retries,
+                'backoff_base': args.backoff_base,
+                'stream_parse': args.stream,
+                'transport': transport,
+                'benchmark_threads': args.threads,
+                'selenium_tabs': tabs,
+                'browser_mode': 'launch',
+                'crawl_plan': 'filtered' if plan == 'sweep' else plan,
+                'max_page_size': None if plan == 'sweep' else config['max_page_size'],
+                'crawl_plan_state_file': plan_state
+            })
+            before = server.stats
+            set_strategy(config['extraction_strategy'])
+            try:
+                if args.canary:
+                    preflight(config, make_url_builder(config))
+                result = run_engine(engine, config)
+            except SelectorDriftError as e:
+                result = {'engine': engine, 'aborted': str(e), 'products': 0}
+            result['plan'] = plan
+            result['server'] = {key: value - before.get(key, 0) for key, value in server.stats.items()}
+            results.append(result)
+            print(json.dumps(result, indent=2))
+    if os.path.exists(plan_state):
+        os.remove(plan_state)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark of logging overhead in the extraction loop.
+
+Replays the per-product and per-page log calls of ``scrape_all_laptops`` for
+10,000 products and reports the time spent in logging, compared with a run
+with every sink removed:
+
+- before: synchronous text sinks, eagerly formatted f-strings on every product
+- after: background JSON file sink (``setup_logging('fast')``), lazy arguments
+  and ``LogSampler`` thinning in the per-product path
+
+"caller" is the time the scraping thread itself spends logging; "drained"
+also waits for the background writer to finish.
+
+Usage:
+    python benchmark_logging.py --products 10000 --repeat 3
+"""
+
+import argparse
+import shutil
+import sys
+import tempfile
+from time import perf_counter
+sys.path.append('src')
+
+from logger import logger, setup_logging, flush_logging, LogSampler
+
+PAGE_SIZE = 24
+
+
+def legacy_loop(names, pages_urls):
+    """Log calls as written before the sampled logging mode."""
+    for page, url in enumerate(pages_urls):
+        logger.info(f'Request #{page + 1} | Frequency: {(page + 1) / 3.0:.2f} req/s | URL: {url[:80]}...')
+        for name in names[page * PAGE_SIZE:(page + 1) * PAGE_SIZE]:
+            logger.debug(f"No price found for {name}, skipping")
+        logger.info(f"Extracted {PAGE_SIZE} laptops from this page")
+
+
+def sampled_loop(names, pages_urls, sampler):
+    """Log calls as written with lazy arguments and sampling."""
+    for page, url in enumerate(pages_urls):
+        logger.info('Request #{} | Frequency: {:.2f} req/s | URL: {}...', page + 1, (page + 1) / 3.0, url[:80])
+        for name in names[page * PAGE_SIZE:(page + 1) * PAGE_SIZE]:
+            sampler.debug('missing_price', "No price found for {}, skipping", name)
+        logger.info("Extracted {} laptops from this page", PAGE_SIZE)
+
+
+def measure(loop, repeat):
+    """Best-of-``repeat`` wall time of ``loop()`` in seconds."""
+    best = None
+    for _ in range(repeat):
+        started = perf_counter()
+        loop()
+        elapsed = perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    """
+    Run each logging configuration and print the overhead per 10k products.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark logging overhead per 10k extracted products')
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--file-level', default='DEBUG', help='Level of the file sink (DEBUG or INFO)')
+    args = parser.parse_args()
+
+    names = [f'Laptop model {i} (Intel Core i5/16GB RAM/512GB SSD/Windows 11)' for i in range(args.products)]
+    urls = [f'http://127.0.0.1/en-ca/category/windows-laptops/36711?page={page}'
+            for page in range((args.products + PAGE_SIZE - 1) // PAGE_SIZE)]
+    log_dir = tempfile.mkdtemp(prefix='bench-logs-')
+    scale = 10000.0 / args.products
+
+    try:
+        logger.remove()
+        baseline = measure(lambda: legacy_loop(names, urls), args.repeat)
+
+        setup_logging('default', console_level='WARNING', file_level=args.file_level, log_dir=log_dir)
+        before = measure(lambda: legacy_loop(names, urls), args.repeat)
+
+        setup_logging('fast', console_level='WARNING', file_level=args.file_level, log_dir=log_dir)
+        after = measure(lambda: sampled_loop(names, urls, LogSampler()), args.repeat)
+        after_drained = measure(lambda: (sampled_loop(names, urls, LogSampler()), flush_logging()), args.repeat)
+    finally:
+        setup_logging('default', console_level='WARNING', log_dir=log_dir)
+        logger.remove()
+        shutil.rmtree(log_dir, ignore_errors=True)
+
+    print(f"Products: {args.products} | file sink level: {args.file_level}")
+    print(f"No sinks (loop cost):           {baseline * scale * 1000:9.2f} ms / 10k products")
+    print(f"Before (sync text, f-strings):  {(before - baseline) * scale * 1000:9.2f} ms / 10k products overhead")
+    print(f"After (queued JSON, sampled):   {(after - baseline) * scale * 1000:9.2f} ms / 10k products overhead (caller)")
+    print(f"                                {(after_drained - baseline) * scale * 1000:9.2f} ms / 10k products overhead (drained)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+tracemalloc check of memory per page in the extraction path.
+
+For each sample page (``debug_page.html`` plus listing pages from the mock
+server) this measures, with ``tracemalloc``:
+
+- peak: the highest Python allocation while the page is parsed and extracted
+- retained: what is still allocated once ``extract_page_records`` returns,
+  without waiting for a GC pass (only the records should remain)
+
+and compares the retained size with the previous behaviour of handing the
+product containers (and through them the whole tree) to the caller. The
+streaming extractor (``stream_parser.py``) is measured on the same page fed
+in 16 KB chunks; its records must equal those of the tree-based path. It also
+reports the bytes per collected record in a ``RecordBuffer`` against the
+previous dict-with-price-string representation.
+Exits with status 1 if a page exceeds ``--max-peak-mb`` or ``--max-retained-kb``,
+or if the two extractors disagree, so it can run as a check in CI.
+
+Usage:
+    python benchmark_memory.py
+    python benchmark_memory.py --pages 10 --max-peak-mb 16 --max-retained-kb 256
+"""
+
+import argparse
+import gc
+import sys
+import tracemalloc
+sys.path.append('src')
+
+import requests
+from bs4 import BeautifulSoup
+from loguru import logger
+
+from config import make_url_builder
+from mock_server import MockBestBuyServer
+from records import RecordBuffer
+from scraper import extract_page_records, find_product_containers
+from stream_parser import StreamingPageParser
+
+
+def sample_pages(count):
+    """
+    Returns (label, html) pairs: the captured live page and mock listing pages.
+    """
+    with open('debug_page.html', encoding='utf-8') as f:
+        pages = [('debug_page.html', f.read())]
+    with MockBestBuyServer({'latency': {'distribution': 'fixed', 'value': 0.0}}) as server:
+        build_url = make_url_builder({'base_url': server.base_url})
+        for page in range(1, count + 1):
+            pages.append((f'mock page {page}', requests.get(build_url(str(page), '16')).text))
+    return pages
+
+
+def measure(func):
+    """
+    Runs ``func()`` under tracemalloc.
+
+    Returns:
+        tuple: (result, peak bytes, retained bytes)
+    """
+    gc.collect()
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    result = func()
+    current, peak = tracemalloc.get_traced_memory()
+    return result, peak - base, current - base
+
+
+def containers_of(html):
+    """The previous hand-off: containers that keep the whole tree alive."""
+    return find_product_containers(BeautifulSoup(html, 'html.parser'))
+
+
+def stream_records(html, chunk_size=16384):
+    """Records of a page fed to the streaming extractor as download-sized chunks."""
+    parser = StreamingPageParser()
+    for start in range(0, len(html), chunk_size):
+        parser.feed(html[start:start + chunk_size])
+    return parser.close()
+
+
+def as_dicts(records):
+    """The previous representation: a dict per record with the price as text."""
+    return [{'name': r.name, 'price': f'${r.price:,.2f}', 'rating': r.rating, 'reviews': r.reviews}
+            for r in records]
+
+
+def main():
+    """
+    Measure every sample page and check the limits.
+    """
+    parser = argparse.ArgumentParser(description='Check peak and retained memory per extracted page')
+    parser.add_argument('--pages', type=int, default=5, help='Mock listing pages to sample')
+    parser.add_argument('--max-peak-mb', type=float, default=16.0)
+    parser.add_argument('--max-retained-kb', type=float, default=256.0)
+    args = parser.parse_args()
+
+    logger.remove()
+    pages = sample_pages(args.pages)
+    # Warm-up so one-off imports and caches are not attributed to the first page
+    extract_page_records(pages[0][1])
+
+    tracemalloc.start()
+    collected = []
+    failures = 0
+    print(f"{'page':<18}{'size KB':>9}{'records':>9}{'peak MB':>9}{'retained KB':>13}{'containers KB':>15}"
+          f"{'stream peak MB':>16}")
+    for label, html in pages:
+        records, peak, retained = measure(lambda: extract_page_records(html))
+        containers, _, held = measure(lambda: containers_of(html))
+        del containers
+        streamed, stream_peak, _ = measure(lambda: stream_records(html))
+        collected.extend(records)
+
+        ok = (peak <= args.max_peak_mb * 2 ** 20 and retained <= args.max_retained_kb * 1024
+              and streamed == records)
+        failures += not ok
+        print(f"{label:<18}{len(html) / 1024:>9.0f}{len(records):>9}{peak / 2 ** 20:>9.2f}"
+              f"{retained / 1024:>13.1f}{held / 1024:>15.1f}{stream_peak / 2 ** 20:>16.2f}"
+              f"{'' if ok else '  FAIL'}{'' if streamed == records else ' (stream records differ)'}")
+
+    # Name strings are shared by both representations, so this is the per-record overhead
+    _, _, dict_bytes = measure(lambda: as_dicts(collected))
+    _, _, buffer_bytes = measure(lambda: RecordBuffer(collected))
+    tracemalloc.stop()
+    print(f"Bytes per record besides the name: {dict_bytes / len(collected):.0f} as dicts, "
+          f"{buffer_bytes / len(collected):.0f} in a RecordBuffer")
+
+    if failures:
+        print(f"{failures} page(s) over the limits (peak {args.max_peak_mb} MB, retained {args.max_retained_kb} KB) "
+              f"or with differing streamed records")
+        sys.exit(1)
+    print("All pages within limits")
+
+
+if __name__ == '__main__':
+    main()
@@ -4,4 +4,13 @@ Web Scraping with Python - Source Code Module
 This module contains the web scraping utilities for Best Buy laptop data collection and analysis.
 """
 
+import os
+import sys
+
 __version__ = "1.0.0"
+
+# Modules import each other by bare name (``from metrics import ...``), as the
+# scripts run with ``src`` on the path; make that work for ``import src.x`` too.
+_SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+if _SRC_DIR not in sys.path:
+    sys.path.append(_SRC_DIR)
@@ -0,0 +1,581 @@
+"""
+Per-crawl-date summaries of the scraped data, merged for reports over any date range.
+
+Reports used to rescan every saved row for each statistic. ``save_data``
+now folds each batch it writes into a small summary of its crawl date
+(``aggregates_dir/crawl_date=YYYY-MM-DD.json``), and a date range is
+reported by merging those summaries. Every part of a summary merges
+exactly, in any order:
+
+- ``FixedHistogram``: counts over bins that never move (``HISTOGRAM_BINS``);
+- ``MomentSketch``: count, min, max and central moments up to the 4th
+  (Chan / Pebay pairwise updates), for mean, std, skewness and kurtosis;
+- ``QuantileSketch``: log-bucketed counts (DDSketch) answering any
+  quantile within ``QUANTILE_ACCURACY`` relative error;
+- ``CorrelationAccumulator``: means and co-moments of the numeric columns,
+  for their Pearson correlation matrix.
+
+A crawl that replaces its output file replaces its date's summary; batches
+appended to the file (the pipeline's persist stage) are merged into it.
+
+    python src/aggregates.py                                 # all dates
+    python src/aggregates.py --from 2025-06-01 --to 2025-06-30
+    python src/aggregates.py --backfill data/laptops_bestbuy_2025.csv --date 2025-06-15
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from metrics import timer
+
+COLUMNS = ('prices', 'ratings', 'votes')
+
+# Bin edges per column; fixed so summaries of any two dates can be added bin by bin
+HISTOGRAM_BINS = {
+    'prices': np.linspace(0, 10000, 201),                        # $50 bins up to $10,000
+    'ratings': np.linspace(0, 5, 21),                            # 0.25 stars
+    'votes': np.concatenate(([0], np.geomspace(1, 1e6, 61))),    # 0, then 10 bins per decade
+}
+
+# Relative error of the quantile sketch (1%)
+QUANTILE_ACCURACY = 0.01
+
+SUMMARY_VERSION = 1
+
+_PARTITION = re.compile(r'^crawl_date=(\d{4}-\d{2}-\d{2})\.json$')
+
+
+class FixedHistogram:
+    """
+    Counts over fixed bin edges, plus the values below and above them.
+    """
+
+    __slots__ = ('edges', 'counts', 'under', 'over')
+
+    def __init__(self, edges):
+        """
+        Args:
+            edges (np.ndarray): Increasing bin edges (the last bin includes its right edge)
+        """
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.counts = np.zeros(len(self.edges) - 1, dtype=np.int64)
+        self.under = 0
+        self.over = 0
+
+    def add(self, values):
+        """
+        Args:
+            values (np.ndarray): Values without NaN
+        """
+        counts, _ = np.histogram(values, self.edges)
+        self.counts += counts
+        self.under += int(np.count_nonzero(values < self.edges[0]))
+        self.over += int(np.count_nonzero(values > self.edges[-1]))
+
+    def merge(self, other):
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError("Cannot merge histograms with different bin edges")
+        self.counts += other.counts
+        self.under += other.under
+        self.over += other.over
+
+    def to_dict(self):
+        return {'edges': self.edges.tolist(), 'counts': self.counts.tolist(),
+                'under': self.under, 'over': self.over}
+
+    @classmethod
+    def from_dict(cls, state):
+        histogram = cls(state['edges'])
+        histogram.counts = np.asarray(state['counts'], dtype=np.int64)
+        histogram.under = state['under']
+        histogram.over = state['over']
+        return histogram
+
+
+class MomentSketch:
+    """
+    Count, extremes and central moment sums (M2..M4) of one column.
+    """
+
+    __slots__ = ('n', 'min', 'max', 'mean', 'm2', 'm3', 'm4')
+
+    def __init__(self):
+        self.n = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.m3 = 0.0
+        self.m4 = 0.0
+
+    def add(self, values):
+        """
+        Args:
+            values (np.ndarray): Values without NaN
+        """
+        if not len(values):
+            return
+        batch = MomentSketch()
+        batch.n = len(values)
+        batch.min = float(values.min())
+        batch.max = float(values.max())
+        batch.mean = float(values.mean())
+        deviations = values - batch.mean
+        squares = deviations * deviations
+        batch.m2 = float(squares.sum())
+        batch.m3 = float((squares * deviations).sum())
+        batch.m4 = float((squares * squares).sum())
+        self.merge(batch)
+
+    def merge(self, other):
+        """
+        Combines two sketches as if their values had been added to one (Pebay, 2008).
+        """
+        if not other.n:
+            return
+        if not self.n:
+            for name in self.__slots__:
+                setattr(self, name, getattr(other, name))
+            return
+        na, nb = self.n, other.n
+        n = na + nb
+        delta = other.mean - self.mean
+        m2 = self.m2 + other.m2 + delta ** 2 * na * nb / n
+        m3 = (self.m3 + other.m3 + delta ** 3 * na * nb * (na - nb) / n ** 2
+              + 3 * delta * (na * other.m2 - nb * self.m2) / n)
+        m4 = (self.m4 + other.m4 + delta ** 4 * na * nb * (na * na - na * nb + nb * nb) / n ** 3
+              + 6 * delta ** 2 * (na * na * other.m2 + nb * nb * self.m2) / n ** 2
+              + 4 * delta * (na * other.m3 - nb * self.m3) / n)
+        self.mean += delta * nb / n
+        self.n, self.m2, self.m3, self.m4 = n, m2, m3, m4
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def std(self):
+        """
+        Returns:
+            float: Sample standard deviation (ddof=1, as ``DataFrame.describe``)
+        """
+        return math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else math.nan
+
+    def skewness(self):
+        """
+        Returns:
+            float: Population skewness (``Series.skew`` adds a small-sample correction)
+        """
+        return math.sqrt(self.n) * self.m3 / self.m2 ** 1.5 if self.m2 else math.nan
+
+    def kurtosis(self):
+        """
+        Returns:
+            float: Population excess kurtosis (0 for a normal distribution)
+        """
+        return self.n * self.m4 / self.m2 ** 2 - 3 if self.m2 else math.nan
+
+    def to_dict(self):
+        state = {name: getattr(self, name) for name in self.__slots__}
+        if not self.n:
+            state['min'] = state['max'] = None
+        return state
+
+    @classmethod
+    def from_dict(cls, state):
+        sketch = cls()
+        for name in cls.__slots__:
+            setattr(sketch, name, state[name])
+        if not sketch.n:
+            sketch.min, sketch.max = math.inf, -math.inf
+        return sketch
+
+
+class QuantileSketch:
+    """
+    Relative-error quantile sketch of non-negative values (DDSketch).
+
+    A value ``x > 0`` is counted in bucket ``ceil(log(x) / log(gamma))``,
+    ``gamma = (1 + a) / (1 - a)``; every bucket is answered with one value
+    within ``a`` relative error of all values it holds. Zeros (unrated
+    products, products without reviews) are counted apart.
+    """
+
+    __slots__ = ('accuracy', 'gamma', 'zeros', 'buckets')
+
+    def __init__(self, accuracy=QUANTILE_ACCURACY):
+        """
+        Args:
+            accuracy (float): Relative error of the returned quantiles
+        """
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.zeros = 0
+        self.buckets = {}
+
+    @property
+    def count(self):
+        return self.zeros + sum(self.buckets.values())
+
+    def add(self, values):
+        """
+        Args:
+            values (np.ndarray): Values without NaN (negative values count as zeros)
+        """
+        positive = values[values > 0]
+        self.zeros += len(values) - len(positive)
+        if not len(positive):
+            return
+        keys, counts = np.unique(np.ceil(np.log(positive) / math.log(self.gamma)).astype(np.int64),
+                                 return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            self.buckets[key] = self.buckets.get(key, 0) + count
+
+    def merge(self, other):
+        if other.accuracy != self.accuracy:
+            raise ValueError("Cannot merge quantile sketches of different accuracy")
+        self.zeros += other.zeros
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+
+    def quantile(self, q):
+        """
+        Args:
+            q (float): Quantile (0-1)
+
+        Returns:
+            float: Estimated value at rank ``q * (count - 1)`` (NaN if empty)
+        """
+        count = self.count
+        if not count:
+            return math.nan
+        rank = q * (count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if rank < seen:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    def to_dict(self):
+        return {'accuracy': self.accuracy, 'zeros': self.zeros,
+                'buckets': {str(key): count for key, count in self.buckets.items()}}
+
+    @classmethod
+    def from_dict(cls, state):
+        sketch = cls(state['accuracy'])
+        sketch.zeros = state['zeros']
+        sketch.buckets = {int(key): count for key, count in state['buckets'].items()}
+        return sketch
+
+
+class CorrelationAccumulator:
+    """
+    Means and co-moment matrix of several columns over rows with all of them present.
+    """
+
+    __slots__ = ('columns', 'n', 'mean', 'comoments')
+
+    def __init__(self, columns=COLUMNS):
+        """
+        Args:
+            columns (tuple): Column names
+        """
+        self.columns = tuple(columns)
+        self.n = 0
+        self.mean = np.zeros(len(self.columns))
+        self.comoments = np.zeros((len(self.columns), len(self.columns)))
+
+    def add(self, matrix):
+        """
+        Args:
+            matrix (np.ndarray): Rows x columns, complete rows only
+        """
+        if not len(matrix):
+            return
+        batch = CorrelationAccumulator(self.columns)
+        batch.n = len(matrix)
+        batch.mean = matrix.mean(axis=0)
+        deviations = matrix - batch.mean
+        batch.comoments = deviations.T @ deviations
+        self.merge(batch)
+
+    def merge(self, other):
+        if other.columns != self.columns:
+            raise ValueError("Cannot merge correlation accumulators of different columns")
+        if not other.n:
+            return
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.comoments = self.comoments + other.comoments + np.outer(delta, delta) * self.n * other.n / n
+        self.mean = self.mean + delta * other.n / n
+        self.n = n
+
+    def correlation(self):
+        """
+        Returns:
+            pd.DataFrame: Pearson correlation matrix (as ``DataFrame.corr``)
+        """
+        scale = np.sqrt(np.diag(self.comoments))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            matrix = self.comoments / np.outer(scale, scale)
+        return pd.DataFrame(matrix, index=list(self.columns), columns=list(self.columns))
+
+    def to_dict(self):
+        return {'columns': list(self.columns), 'n': self.n,
+                'mean': self.mean.tolist(), 'comoments': self.comoments.tolist()}
+
+    @classmethod
+    def from_dict(cls, state):
+        accumulator = cls(state['columns'])
+        accumulator.n = state['n']
+        accumulator.mean = np.asarray(state['mean'], dtype=np.float64)
+        accumulator.comoments = np.asarray(state['comoments'], dtype=np.float64)
+        return accumulator
+
+
+class DatasetSummary:
+    """
+    Mergeable summary of a set of rows: per-column sketches and their correlation.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.histograms = {column: FixedHistogram(HISTOGRAM_BINS[column]) for column in COLUMNS}
+        self.moments = {column: MomentSketch() for column in COLUMNS}
+        self.quantiles = {column: QuantileSketch() for column in COLUMNS}
+        self.correlation = CorrelationAccumulator(COLUMNS)
+
+    @classmethod
+    def from_frame(cls, df):
+        """
+        Summarises a cleaned dataframe (float prices, 0-5 ratings, int votes).
+
+        Args:
+            df (pd.DataFrame): Rows to summarise
+
+        Returns:
+            DatasetSummary: Summary of the rows
+        """
+        summary = cls()
+        summary.add(df)
+        return summary
+
+    def add(self, df):
+        """
+        Args:
+            df (pd.DataFrame): Cleaned rows to fold in
+        """
+        matrix = df[list(COLUMNS)].to_numpy(dtype=np.float64)
+        self.rows += len(matrix)
+        for index, column in enumerate(COLUMNS):
+            values = matrix[:, index]
+            values = values[~np.isnan(values)]
+            self.histograms[column].add(values)
+            self.moments[column].add(values)
+            self.quantiles[column].add(values)
+        self.correlation.add(matrix[~np.isnan(matrix).any(axis=1)])
+
+    def merge(self, other):
+        """
+        Args:
+            other (DatasetSummary): Summary folded into this one
+        """
+        self.rows += other.rows
+        for column in COLUMNS:
+            self.histograms[column].merge(other.histograms[column])
+            self.moments[column].merge(other.moments[column])
+            self.quantiles[column].merge(other.quantiles[column])
+        self.correlation.merge(other.correlation)
+
+    def describe(self):
+        """
+        Descriptive statistics laid out as ``DataFrame.describe`` (quartiles within 1%).
+
+        Returns:
+            pd.DataFrame: count, mean, std, min, 25%, 50%, 75% and max per column
+        """
+        stats = {}
+        for column in COLUMNS:
+            moments, quantiles = self.moments[column], self.quantiles[column]
+            empty = not moments.n
+            # A quantile never lies outside the exact extremes
+            clamp = (lambda value: value) if empty else (lambda value: min(max(value, moments.min), moments.max))
+            stats[column] = {
+                'count': float(moments.n),
+                'mean': moments.mean if not empty else math.nan,
+                'std': moments.std(),
+                'min': moments.min if not empty else math.nan,
+                '25%': clamp(quantiles.quantile(0.25)),
+                '50%': clamp(quantiles.quantile(0.5)),
+                '75%': clamp(quantiles.quantile(0.75)),
+                'max': moments.max if not empty else math.nan,
+            }
+        return pd.DataFrame(stats)
+
+    def to_dict(self):
+        return {
+            'version': SUMMARY_VERSION,
+            'rows': self.rows,
+            'histograms': {column: sketch.to_dict() for column, sketch in self.histograms.items()},
+            'moments': {column: sketch.to_dict() for column, sketch in self.moments.items()},
+            'quantiles': {column: sketch.to_dict() for column, sketch in self.quantiles.items()},
+            'correlation': self.correlation.to_dict()
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        if state.get('version') != SUMMARY_VERSION:
+            raise ValueError(f"Unsupported summary version {state.get('version')}")
+        summary = cls()
+        summary.rows = state['rows']
+        summary.histograms = {column: FixedHistogram.from_dict(value) for column, value in state['histograms'].items()}
+        summary.moments = {column: MomentSketch.from_dict(value) for column, value in state['moments'].items()}
+        summary.quantiles = {column: QuantileSketch.from_dict(value) for column, value in state['quantiles'].items()}
+        summary.correlation = CorrelationAccumulator.from_dict(state['correlation'])
+        return summary
+
+
+class AggregateStore:
+    """
+    Directory of per-crawl-date summaries (``crawl_date=YYYY-MM-DD.json``).
+    """
+
+    def __init__(self, directory):
+        """
+        Args:
+            directory (str): Directory holding the summaries
+        """
+        self.directory = directory
+
+    def path(self, crawl_date):
+        return os.path.join(self.directory, f'crawl_date={crawl_date}.json')
+
+    def dates(self):
+        """
+        Returns:
+            list: Crawl dates (ISO strings) with a summary, oldest first
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        matches = (_PARTITION.match(name) for name in os.listdir(self.directory))
+        return sorted(match.group(1) for match in matches if match)
+
+    def read(self, crawl_date):
+        """
+        Returns:
+            DatasetSummary: Summary of one crawl date (None if there is none)
+        """
+        path = self.path(crawl_date)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return DatasetSummary.from_dict(json.load(f))
+
+    def write(self, crawl_date, summary):
+        """
+        Stores the summary of a crawl date (atomically replaces the file).
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(crawl_date)
+        temp_file = path + '.tmp'
+        with open(temp_file, 'w') as f:
+            json.dump(summary.to_dict(), f)
+        os.replace(temp_file, path)
+
+    def update(self, df, crawl_date=None, replace=False):
+        """
+        Folds cleaned rows into the summary of their crawl date.
+
+        Args:
+            df (pd.DataFrame): Cleaned rows
+            crawl_date (str): ISO date (defaults to today)
+            replace (bool): Start the date's summary over instead of merging into it
+
+        Returns:
+            DatasetSummary: Updated summary of the date
+        """
+        crawl_date = crawl_date or date.today().isoformat()
+        with timer('aggregate'):
+            summary = None if replace else self.read(crawl_date)
+            if summary is None:
+                summary = DatasetSummary()
+            summary.add(df)
+            self.write(crawl_date, summary)
+        logger.debug("Aggregates of {} updated ({} rows)", crawl_date, summary.rows)
+        return summary
+
+    def load(self, start=None, end=None):
+        """
+        Merges the summaries of a date range.
+
+        Args:
+            start (str): First crawl date included (None = the oldest)
+            end (str): Last crawl date included (None = the newest)
+
+        Returns:
+            tuple: (DatasetSummary, list of the merged dates)
+        """
+        dates = [crawl_date for crawl_date in self.dates()
+                 if (start is None or crawl_date >= start) and (end is None or crawl_date <= end)]
+        summary = DatasetSummary()
+        for crawl_date in dates:
+            summary.merge(self.read(crawl_date))
+        return summary, dates
+
+
+def log_report(summary, dates):
+    """
+    Logs the statistics of a merged summary (same tables as ``visualize_data``).
+
+    Args:
+        summary (DatasetSummary): Merged summary
+        dates (list): Crawl dates it covers
+    """
+    span = f"{dates[0]} to {dates[-1]}" if dates else "no crawl dates"
+    logger.info("{} rows from {} crawl date(s) ({})", summary.rows, len(dates), span)
+    logger.info(f"\n{summary.describe()}")
+    logger.info(f"Correlation:\n{summary.correlation.correlation().round(3)}")
+    for column in COLUMNS:
+        moments = summary.moments[column]
+        logger.info("{}: skewness {:.2f}, excess kurtosis {:.2f}", column, moments.skewness(), moments.kurtosis())
+
+
+def main():
+    """
+    Command-line entry point: report a date range, or backfill a date from a CSV file.
+    """
+    from config import get_config
+    from data_cleaner import load_and_process_data
+
+    config = get_config()
+    parser = argparse.ArgumentParser(description='Report statistics from the per-crawl-date aggregates')
+    parser.add_argument('--dir', default=config['aggregates_dir'], help='Aggregates directory')
+    parser.add_argument('--from', dest='start', help='First crawl date (YYYY-MM-DD)')
+    parser.add_argument('--to', dest='end', help='Last crawl date (YYYY-MM-DD)')
+    parser.add_argument('--backfill', metavar='CSV', help='Summarise an existing CSV file as one crawl date')
+    parser.add_argument('--date', help='Crawl date of --backfill (default: today)')
+    args = parser.parse_args()
+
+    store = AggregateStore(args.dir)
+    if args.backfill:
+        summary = store.update(load_and_process_data(args.backfill), args.date, replace=True)
+        logger.success("Summarised {} rows of {} into {}", summary.rows, args.backfill,
+                       store.path(args.date or date.today().isoformat()))
+        return
+    summary, dates = store.load(args.start, args.end)
+    if not dates:
+        logger.warning("No aggregates in {} for the requested dates", args.dir)
+        return
+    log_report(summary, dates)
+
+
+if __name__ == '__main__':
+    main()
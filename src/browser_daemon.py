@@ -0,0 +1,312 @@
+"""
+Long-lived local browser service for the Selenium scraper.
+
+Starting Chrome (and resolving a chromedriver through webdriver-manager) costs
+several seconds per run and needs network access. The daemon starts one
+headless Chrome with a remote-debugging port plus a chromedriver server, and
+records both in a state file; ``BestBuySeleniumScraper`` then attaches to the
+running browser instead of launching its own:
+
+    python src/browser_daemon.py start
+    python src/browser_daemon.py status
+    python src/browser_daemon.py stop
+
+The chromedriver path is resolved once (configured path, PATH, the system
+package, and only then webdriver-manager) and cached on disk together with
+the installed Chrome version, so later runs work offline. A Chrome update
+invalidates the cached path, and a driver that fails to start a session is
+replaced through webdriver-manager (``resolve_chromedriver(refresh=True)``).
+"""
+
+import argparse
+import json
+import os
+import shutil
+import signal
+import subprocess
+import tempfile
+from time import sleep, time
+from urllib.error import URLError
+from urllib.request import urlopen
+
+from loguru import logger
+
+from config import get_config
+
+DEFAULT_DRIVER_CACHE = os.path.join('~', '.cache', 'bestbuy-scraper', 'chromedriver.json')
+CHROME_BINARIES = ['google-chrome', 'google-chrome-stable', 'chromium', 'chromium-browser']
+
+
+def _write_json(path, data):
+    """Atomically replaces ``path`` with ``data`` as JSON."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp_file = path + '.tmp'
+    with open(temp_file, 'w') as f:
+        json.dump(data, f)
+    os.replace(temp_file, path)
+
+
+def _read_json(path):
+    """Returns the JSON content of ``path``, or None if missing or unreadable."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _is_executable(path):
+    return bool(path) and os.path.isfile(path) and os.access(path, os.X_OK)
+
+
+def chrome_version(config):
+    """
+    Returns the installed Chrome version string, or None if it cannot be read.
+
+    Args:
+        config (dict): Configuration dictionary
+
+    Returns:
+        str: Output of ``chrome --version``, e.g. 'Chromium 126.0.6478.126'
+    """
+    try:
+        result = subprocess.run([resolve_chrome_binary(config), '--version'],
+                                capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def resolve_chromedriver(config, refresh=False):
+    """
+    Returns a chromedriver path, resolving it at most once per Chrome version.
+
+    Order: ``config['chromedriver_path']``, the cached path (if resolved for
+    the installed Chrome version), ``chromedriver`` on PATH,
+    ``/usr/bin/chromedriver``, then webdriver-manager (network). Whatever is
+    found is written to ``config['driver_cache_file']``.
+
+    Args:
+        config (dict): Configuration dictionary
+        refresh (bool): Skip the cache and the local drivers and resolve through
+            webdriver-manager (after a driver failed to start a session)
+
+    Returns:
+        str: Path to an executable chromedriver
+    """
+    if not refresh and _is_executable(config.get('chromedriver_path')):
+        return config['chromedriver_path']
+
+    cache_file = os.path.expanduser(config.get('driver_cache_file') or DEFAULT_DRIVER_CACHE)
+    version = chrome_version(config)
+    cached = _read_json(cache_file) or {}
+    if not refresh and _is_executable(cached.get('path')) and cached.get('chrome_version') == version:
+        return cached['path']
+
+    path = None
+    if not refresh:
+        path = shutil.which('chromedriver')
+        if not _is_executable(path):
+            path = '/usr/bin/chromedriver'
+    if not _is_executable(path):
+        # Only reached on a cold machine or a stale driver: downloads one matching the browser
+        from webdriver_manager.chrome import ChromeDriverManager
+        logger.info("Resolving chromedriver with WebDriver Manager...")
+        path = ChromeDriverManager().install()
+
+    _write_json(cache_file, {'path': path, 'chrome_version': version, 'resolved_at': time()})
+    logger.debug("Cached chromedriver path {} for {} in {}", path, version, cache_file)
+    return path
+
+
+def resolve_chrome_binary(config):
+    """
+    Returns the Chrome/Chromium executable used by the daemon.
+
+    Args:
+        config (dict): Configuration dictionary
+
+    Returns:
+        str: Path to the browser executable
+
+    Raises:
+        FileNotFoundError: If no browser is installed
+    """
+    if config.get('chrome_binary'):
+        return config['chrome_binary']
+    for name in CHROME_BINARIES:
+        path = shutil.which(name)
+        if path:
+            return path
+    raise FileNotFoundError(f"No Chrome binary found (tried {', '.join(CHROME_BINARIES)})")
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except (OSError, TypeError):
+        return False
+    return True
+
+
+def _endpoint_alive(url):
+    try:
+        with urlopen(url, timeout=1) as response:
+            return response.status == 200
+    except (URLError, OSError, ValueError):
+        return False
+
+
+class BrowserDaemon:
+    """
+    A headless Chrome and chromedriver kept running between scraper runs.
+    """
+
+    def __init__(self, config):
+        """
+        Args:
+            config (dict): Configuration dictionary
+        """
+        self.config = config
+        self.state_file = config.get('browser_state_file', 'data/browser_daemon.json')
+        self.debug_port = config.get('browser_debug_port', 9222)
+        self.driver_port = config.get('browser_driver_port', 9515)
+
+    def state(self):
+        """
+        Returns the recorded daemon state if both processes still answer.
+
+        Returns:
+            dict: debugger_address, driver_url and process ids, or None
+        """
+        state = _read_json(self.state_file)
+        if not state:
+            return None
+        if not (_pid_alive(state.get('chrome_pid')) and _pid_alive(state.get('driver_pid'))):
+            return None
+        if not _endpoint_alive(f"http://{state['debugger_address']}/json/version"):
+            return None
+        if not _endpoint_alive(f"{state['driver_url']}/status"):
+            return None
+        return state
+
+    def start(self, startup_timeout=15):
+        """
+        Starts Chrome and chromedriver unless they are already running.
+
+        Args:
+            startup_timeout (float): Seconds to wait for both endpoints
+
+        Returns:
+            dict: Daemon state
+        """
+        state = self.state()
+        if state:
+            logger.info("Browser daemon already running at {}", state['debugger_address'])
+            return state
+
+        user_data_dir = self.config.get('browser_profile_dir') or tempfile.mkdtemp(prefix='bestbuy-chrome-')
+        user_agent = self.config.get('user_agent', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36')
+        chrome_args = [
+            resolve_chrome_binary(self.config),
+            f'--remote-debugging-port={self.debug_port}',
+            f'--user-data-dir={user_data_dir}',
+            '--headless=new',
+            '--no-sandbox',
+            '--disable-dev-shm-usage',
+            '--disable-gpu',
+            '--disable-blink-features=AutomationControlled',
+            '--window-size=1920,1080',
+            '--no-first-run',
+            f'--user-agent={user_agent}',
+            'about:blank'
+        ]
+        driver_args = [resolve_chromedriver(self.config), f'--port={self.driver_port}']
+
+        # New sessions so the processes outlive the shell that started them
+        chrome = subprocess.Popen(chrome_args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                  start_new_session=True)
+        driver = subprocess.Popen(driver_args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                  start_new_session=True)
+        state = {
+            'chrome_pid': chrome.pid,
+            'driver_pid': driver.pid,
+            'debugger_address': f'127.0.0.1:{self.debug_port}',
+            'driver_url': f'http://127.0.0.1:{self.driver_port}',
+            'user_data_dir': user_data_dir,
+            'started_at': time()
+        }
+
+        deadline = time() + startup_timeout
+        while time() < deadline:
+            if (_endpoint_alive(f"http://{state['debugger_address']}/json/version")
+                    and _endpoint_alive(f"{state['driver_url']}/status")):
+                _write_json(self.state_file, state)
+                logger.success("Browser daemon started (Chrome {}, chromedriver {})",
+                               state['debugger_address'], state['driver_url'])
+                return state
+            sleep(0.2)
+
+        self._terminate(state)
+        raise RuntimeError(f'Browser daemon did not come up within {startup_timeout}s')
+
+    def _terminate(self, state):
+        for key in ('driver_pid', 'chrome_pid'):
+            if _pid_alive(state.get(key)):
+                try:
+                    os.kill(state[key], signal.SIGTERM)
+                except OSError:
+                    pass
+
+    def stop(self):
+        """
+        Stops the recorded processes and removes the state file.
+        """
+        state = _read_json(self.state_file)
+        if not state:
+            logger.info("Browser daemon is not running")
+            return
+        self._terminate(state)
+        if not self.config.get('browser_profile_dir'):
+            shutil.rmtree(state.get('user_data_dir', ''), ignore_errors=True)
+        os.remove(self.state_file)
+        logger.info("Browser daemon stopped")
+
+
+def daemon_state(config):
+    """
+    Returns the running daemon's state, or None.
+
+    Args:
+        config (dict): Configuration dictionary
+
+    Returns:
+        dict: Daemon state (see ``BrowserDaemon.state``)
+    """
+    return BrowserDaemon(config).state()
+
+
+def main():
+    """
+    Command-line entry point: start, stop or status.
+    """
+    parser = argparse.ArgumentParser(description='Warm headless Chrome shared by Selenium scraper runs')
+    parser.add_argument('command', choices=['start', 'stop', 'status'])
+    args = parser.parse_args()
+
+    daemon = BrowserDaemon(get_config())
+    if args.command == 'start':
+        daemon.start()
+    elif args.command == 'stop':
+        daemon.stop()
+    else:
+        state = daemon.state()
+        if state:
+            logger.info("Running | Chrome {} | chromedriver {} | up {:.0f}s", state['debugger_address'],
+                        state['driver_url'], time() - state['started_at'])
+        else:
+            logger.info("Not running")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+"""
+Pre-flight selector-drift canary.
+
+The extractors find product fields through build-hashed class names
+(``field_selectors.FIELD_CLASSES``). After a redeploy of the site they
+silently stop matching, and a crawl spends its whole request budget and
+politeness sleeps to collect nothing. ``preflight`` fetches one listing page
+first and measures, per extraction strategy, the share of product containers
+in which each field is found:
+
+- the configured strategy passes: the crawl starts as usual;
+- it fails but another strategy (e.g. hash-agnostic class prefixes) passes:
+  the extractors are switched to it and the drift is logged;
+- every strategy fails: ``SelectorDriftError`` aborts the run before the
+  crawl starts.
+
+Expected rates are ``config['canary_min_rates']``. Pages rendered by
+JavaScript have no containers in their static HTML, so for the browser
+engines an empty probe is inconclusive rather than a failure.
+
+    python src/canary.py                  # probe the configured site
+    python src/canary.py --url http://127.0.0.1:8765/en-ca/category/windows-laptops/36711?page=1
+"""
+
+import argparse
+from random import randint
+from time import sleep, time
+
+from bs4 import BeautifulSoup
+from loguru import logger
+
+from field_selectors import MATCHED_FIELDS, STRATEGIES, class_filter, format_rates, set_strategy
+from metrics import registry, timer
+from scraper import fetch_page, find_product_containers, release_tree
+
+# Minimum share of containers in which each field must be found
+DEFAULT_MIN_RATES = {'name': 0.9, 'price': 0.9, 'rating': 0.1}
+
+
+class SelectorDriftError(RuntimeError):
+    """
+    Raised when no extraction strategy finds the product fields of the probe page.
+    """
+
+
+def _has_field(container, field, strategy):
+    if field == 'price':
+        return (container.find('span', class_=class_filter('price', strategy)) is not None
+                or container.find('div', class_=class_filter('fallback_price', strategy)) is not None)
+    if field == 'rating':
+        rating = container.find('span', class_=class_filter('rating', strategy))
+        return (rating is not None and rating.find('meta', {'itemprop': 'ratingValue'}) is not None
+                and rating.find('meta', {'itemprop': 'reviewCount'}) is not None)
+    return container.find('h3', class_=class_filter(field, strategy)) is not None
+
+
+def measure_fields(html, strategies=STRATEGIES):
+    """
+    Field hit rates of a listing page under each extraction strategy.
+
+    Args:
+        html (str): Page HTML
+        strategies (tuple): Strategies to measure
+
+    Returns:
+        dict: Strategy -> ``{'containers': n, 'name': rate, 'price': rate, 'rating': rate}``
+    """
+    page_html = BeautifulSoup(html, 'html.parser')
+    containers = find_product_containers(page_html)
+    results = {}
+    for strategy in strategies:
+        rates = {'containers': len(containers)}
+        for field in MATCHED_FIELDS:
+            hits = sum(_has_field(container, field, strategy) for container in containers)
+            rates[field] = hits / len(containers) if containers else 0.0
+        results[strategy] = rates
+    del containers
+    release_tree(page_html)
+    return results
+
+
+def failed_fields(rates, min_rates):
+    """
+    Fields below their expected rate.
+
+    Args:
+        rates (dict): One strategy's entry of ``measure_fields``
+        min_rates (dict): Field -> minimum hit rate
+
+    Returns:
+        list: Names of the failing fields (``'containers'`` when the page has none)
+    """
+    if not rates['containers']:
+        return ['containers']
+    return [field for field, minimum in min_rates.items() if rates[field] < minimum]
+
+
+def probe_url(config, build_url_func):
+    """
+    URL of the page the canary fetches: the first configured page of the first RAM size.
+
+    Args:
+        config (dict): Configuration dictionary
+        build_url_func (function): Function to build URLs
+
+    Returns:
+        str: Probe URL
+    """
+    return build_url_func(config['pages'][0], config['ram_sizes'][0])
+
+
+def select_strategy(config, html, url):
+    """
+    Chooses the extraction strategy from the probe page's field hit rates.
+
+    Args:
+        config (dict): Configuration dictionary
+        html (str): Probe page HTML (None if it could not be fetched)
+        url (str): Probe URL (for messages)
+
+    Returns:
+        str: First strategy, configured one first, meeting ``config['canary_min_rates']``
+
+    Raises:
+        SelectorDriftError: No strategy finds the fields at their expected rates
+    """
+    configured = config.get('extraction_strategy', 'exact')
+    if html is None:
+        # Could not fetch at all: not a selector problem, the crawl's own retries apply
+        logger.warning("Canary: probe request failed, starting the crawl without a selector check")
+        return configured
+
+    min_rates = dict(DEFAULT_MIN_RATES, **(config.get('canary_min_rates') or {}))
+    order = (configured,) + tuple(strategy for strategy in STRATEGIES if strategy != configured)
+    with timer('canary'):
+        results = measure_fields(html, order)
+    for strategy in order:
+        logger.info("Canary: {} selectors | {}", strategy, format_rates(results[strategy]))
+
+    engine = config.get('engine', 'hybrid')
+    if not results[configured]['containers'] and engine != 'http':
+        logger.warning("Canary: no product containers in the static HTML (page rendered by "
+                       "JavaScript?); inconclusive for the {} engine", engine)
+        return configured
+
+    for strategy in order:
+        if not failed_fields(results[strategy], min_rates):
+            if strategy != configured:
+                logger.warning("Canary: {} selectors missed {}; switching extraction to {} selectors",
+                               configured, ', '.join(failed_fields(results[configured], min_rates)), strategy)
+                registry.counter('canary_strategy_switches_total',
+                                 'Crawls whose extraction strategy the canary changed').inc()
+            return strategy
+
+    registry.counter('canary_aborts_total', 'Crawls aborted by the selector canary').inc()
+    expected = ', '.join(f'{field} {rate:.0%}' for field, rate in min_rates.items())
+    found = '; '.join(f'{strategy}: {format_rates(results[strategy])}' for strategy in order)
+    raise SelectorDriftError(f"No extraction strategy finds the product fields of {url} "
+                             f"(expected {expected}; found {found})")
+
+
+def preflight(config, build_url_func, url=None):
+    """
+    Probes one page and selects the extraction strategy of the crawl.
+
+    The selected strategy is applied with ``field_selectors.set_strategy``.
+    The usual politeness sleep follows the probe, so the crawl's first
+    request is not sent right after it.
+
+    Args:
+        config (dict): Configuration dictionary
+        build_url_func (function): Function to build URLs
+        url (str): Page to probe (defaults to ``probe_url``)
+
+    Returns:
+        str: Strategy in use for the crawl
+
+    Raises:
+        SelectorDriftError: No strategy finds the fields at their expected rates
+    """
+    url = url or probe_url(config, build_url_func)
+    # The probe needs the HTML itself: no streaming, and no archiving of a page the crawl fetches again
+    probe_config = dict(config, stream_parse=False, archive_path=None)
+    logger.info("Canary: probing {}", url[:80])
+    with timer('canary'):
+        html = fetch_page(url, 1, time(), probe_config)
+
+    strategy = select_strategy(config, html, url)
+    set_strategy(strategy)
+
+    if config.get('sleep_max', 0) > 0:
+        sleep_time = randint(config['sleep_min'], config['sleep_max'])
+        logger.info("Sleeping for {} seconds...", sleep_time)
+        with timer('sleep'):
+            sleep(sleep_time)
+    return strategy
+
+
+def main():
+    """
+    Command-line entry point: probe one page and print the field match rates.
+    """
+    from config import get_config, make_url_builder
+
+    parser = argparse.ArgumentParser(description='Check that the product selectors still match the live site')
+    parser.add_argument('--url', help='Listing page to probe (defaults to the first configured page)')
+    args = parser.parse_args()
+
+    config = dict(get_config(), sleep_min=0, sleep_max=0)
+    try:
+        strategy = preflight(config, make_url_builder(config), args.url)
+    except SelectorDriftError as e:
+        logger.error("Canary failed: {}", e)
+        raise SystemExit(1)
+    logger.success("Canary passed with {} selectors", strategy)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,298 @@
+"""
+Indexed in-memory queries over the laptop catalogue.
+
+Questions such as "under $800, rated at least 4.5, with 100+ reviews"
+used to reload the CSV and scan the whole DataFrame. ``CatalogueIndex``
+builds, once:
+
+- a sorted index per numeric column (row ids ordered by value), so a range
+  predicate is two binary searches (``np.searchsorted``) giving a slice of
+  matching row ids;
+- an inverted index from lower-cased name tokens to sorted row-id posting
+  lists.
+
+A query starts from its most selective part (keyword posting lists,
+intersected smallest first by binary search, or else the shortest range
+slice) and checks the remaining range predicates only on those candidates,
+so its cost follows the candidate count rather than the catalogue size.
+
+    index = CatalogueIndex.from_csv('data/laptops_bestbuy_2025.csv')
+    index.query(prices=(None, 800), ratings=(4.5, None), votes=(100, None), keywords='16gb oled')
+
+    python src/catalogue_index.py --max-price 800 --min-rating 4.5 --min-votes 100
+    python src/catalogue_index.py --dataset data/normalized --years 2019 2025 --keywords chromebook
+"""
+
+import argparse
+import re
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from data_cleaner import load_and_process_data
+
+# Columns with a sorted index
+NUMERIC_COLUMNS = ('prices', 'ratings', 'votes')
+
+_TOKEN = r'[a-z0-9]+'
+
+
+def tokenize(text):
+    """
+    Splits a name or keyword query into index tokens.
+
+    Args:
+        text (str): Product name or keywords
+
+    Returns:
+        list: Lower-case alphanumeric tokens
+
+    Example:
+        >>> tokenize('ASUS Vivobook 15.6" (16GB RAM)')
+        ['asus', 'vivobook', '15', '6', '16gb', 'ram']
+    """
+    return re.findall(_TOKEN, str(text).lower())
+
+
+class CatalogueIndex:
+    """
+    Sorted and inverted indexes over a cleaned laptop dataframe.
+    """
+
+    def __init__(self, df):
+        """
+        Builds all indexes.
+
+        Args:
+            df (pd.DataFrame): Cleaned dataframe with ``laptops`` and the ``NUMERIC_COLUMNS``
+        """
+        started = perf_counter()
+        self.df = df.reset_index(drop=True)
+        self.size = len(self.df)
+
+        self.columns = {}
+        self.sorted_ids = {}
+        self.sorted_values = {}
+        for column in NUMERIC_COLUMNS:
+            values = self.df[column].to_numpy(dtype=np.float64)
+            order = np.argsort(values, kind='stable').astype(np.int64)
+            self.columns[column] = values
+            self.sorted_ids[column] = order
+            self.sorted_values[column] = values[order]
+
+        self.postings = self._build_postings(self.df['laptops'])
+        logger.info("Indexed {} rows ({} name tokens) in {:.2f}s",
+                    self.size, len(self.postings), perf_counter() - started)
+
+    @staticmethod
+    def _build_postings(names):
+        """
+        Token -> sorted unique row ids, built with vectorised numpy operations.
+
+        History repeats the same names crawl after crawl, so only distinct
+        names are tokenised; their (token, name) pairs are then expanded to
+        the rows carrying each name.
+        """
+        name_codes, distinct = pd.factorize(names.to_numpy())
+        pairs = pd.Series(distinct).astype('string').str.lower().str.findall(_TOKEN).explode().dropna()
+        if pairs.empty:
+            return {}
+        pairs = pd.DataFrame({'name': pairs.index.to_numpy(dtype=np.int64), 'token': pairs.to_numpy()})
+        # A token repeated in one name is posted once
+        pairs = pairs.drop_duplicates()
+        token_codes, vocabulary = pd.factorize(pairs['token'].to_numpy())
+        pair_names = pairs['name'].to_numpy()
+
+        # Rows grouped by name code (rows without a name are never posted)
+        named = np.flatnonzero(name_codes >= 0)
+        rows_by_name = named[np.argsort(name_codes[named], kind='stable')]
+        counts = np.bincount(name_codes[named], minlength=len(distinct))
+        name_starts = np.cumsum(counts) - counts
+
+        # Expand every (token, name) pair to the rows carrying that name
+        pair_counts = counts[pair_names]
+        offsets = np.repeat(name_starts[pair_names] - (np.cumsum(pair_counts) - pair_counts), pair_counts)
+        rows = rows_by_name[offsets + np.arange(len(offsets))]
+        tokens = np.repeat(token_codes, pair_counts)
+
+        order = np.lexsort((rows, tokens))
+        rows, tokens = rows[order], tokens[order]
+        bounds = np.flatnonzero(np.diff(tokens)) + 1
+        starts = np.concatenate(([0], bounds))
+        return {vocabulary[tokens[start]]: ids for start, ids in zip(starts, np.split(rows, bounds))}
+
+    @classmethod
+    def from_csv(cls, filename):
+        """
+        Args:
+            filename (str): CSV file (any schema version, see ``normalize.py``)
+
+        Returns:
+            CatalogueIndex: Index over the cleaned file
+        """
+        return cls(load_and_process_data(filename))
+
+    @classmethod
+    def from_dataset(cls, output_dir, years=None):
+        """
+        Args:
+            output_dir (str): Normalised dataset directory
+            years (iterable): Years to load (None = all)
+
+        Returns:
+            CatalogueIndex: Index over the selected partitions
+        """
+        from normalize import load_dataset
+        return cls(load_dataset(output_dir, years))
+
+    def range_ids(self, column, low=None, high=None):
+        """
+        Row ids with ``low <= column <= high`` (binary search on the sorted index).
+
+        Args:
+            column (str): One of ``NUMERIC_COLUMNS``
+            low (float): Inclusive lower bound (None = unbounded)
+            high (float): Inclusive upper bound (None = unbounded)
+
+        Returns:
+            np.ndarray: Matching row ids in value order (a view, do not modify)
+        """
+        values = self.sorted_values[column]
+        start = 0 if low is None else np.searchsorted(values, low, side='left')
+        # NaN sorts last, so an open upper bound stops at +inf to exclude it
+        stop = np.searchsorted(values, np.inf if high is None else high, side='right')
+        return self.sorted_ids[column][start:stop]
+
+    def keyword_ids(self, keywords):
+        """
+        Row ids whose name contains every keyword token.
+
+        Args:
+            keywords (str): Space-separated keywords
+
+        Returns:
+            np.ndarray: Sorted matching row ids
+        """
+        lists = [self.postings.get(token) for token in tokenize(keywords)]
+        if not lists:
+            return np.arange(self.size)
+        if any(ids is None for ids in lists):
+            return np.empty(0, dtype=np.int64)
+        lists.sort(key=len)
+        result = lists[0]
+        for ids in lists[1:]:
+            if not len(result):
+                break
+            # Binary-search the shorter list's ids in the longer one
+            positions = np.minimum(np.searchsorted(ids, result), len(ids) - 1)
+            result = result[ids[positions] == result]
+        return result
+
+    def query_ids(self, keywords=None, **ranges):
+        """
+        Row ids matching all keywords and range predicates.
+
+        Args:
+            keywords (str): Space-separated keywords (None = no keyword filter)
+            **ranges: ``column=(low, high)`` inclusive bounds, None for open ends
+
+        Returns:
+            np.ndarray: Sorted matching row ids
+        """
+        unknown = set(ranges) - set(NUMERIC_COLUMNS)
+        if unknown:
+            raise ValueError(f"No index on {sorted(unknown)} (indexed: {NUMERIC_COLUMNS})")
+        ranges = {column: bounds for column, bounds in ranges.items() if bounds is not None}
+
+        # Start from the most selective predicate, check the others on its candidates only
+        if keywords and tokenize(keywords):
+            candidates = self.keyword_ids(keywords)
+            from_slice = False
+        elif ranges:
+            slices = {column: self.range_ids(column, *bounds) for column, bounds in ranges.items()}
+            column = min(slices, key=lambda name: len(slices[name]))
+            candidates = slices[column]
+            ranges.pop(column)
+            from_slice = True
+        else:
+            return np.arange(self.size)
+
+        for column, (low, high) in ranges.items():
+            if not len(candidates):
+                break
+            values = self.columns[column][candidates]
+            mask = ~np.isnan(values)
+            if low is not None:
+                mask &= values >= low
+            if high is not None:
+                mask &= values <= high
+            candidates = candidates[mask]
+        # A range slice is in value order; only the survivors are sorted
+        return np.sort(candidates) if from_slice else candidates
+
+    def query(self, keywords=None, order_by=None, descending=False, limit=None, **ranges):
+        """
+        Rows matching all keywords and range predicates.
+
+        Args:
+            keywords (str): Space-separated keywords
+            order_by (str): Column to sort the result by (None = catalogue order)
+            descending (bool): Sort descending
+            limit (int): Maximum rows returned
+            **ranges: ``column=(low, high)`` inclusive bounds, e.g. ``prices=(None, 800)``
+
+        Returns:
+            pd.DataFrame: Matching rows
+        """
+        ids = self.query_ids(keywords, **ranges)
+        if order_by is not None:
+            order = np.argsort(self.columns[order_by][ids], kind='stable')
+            ids = ids[order[::-1]] if descending else ids[order]
+        if limit is not None:
+            ids = ids[:limit]
+        return self.df.iloc[ids]
+
+
+def main():
+    """
+    Command-line entry point.
+    """
+    parser = argparse.ArgumentParser(description='Query the laptop catalogue through in-memory indexes')
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--csv', default='data/laptops_bestbuy_2025.csv', help='CSV file to index')
+    source.add_argument('--dataset', help='Normalised dataset directory (see normalize.py)')
+    parser.add_argument('--years', nargs='+', type=int, help='Dataset years to load')
+    parser.add_argument('--keywords', help='Words that must all appear in the name')
+    for column, label in (('prices', 'price'), ('ratings', 'rating'), ('votes', 'votes')):
+        parser.add_argument(f'--min-{label}', type=float, dest=f'min_{column}')
+        parser.add_argument(f'--max-{label}', type=float, dest=f'max_{column}')
+    parser.add_argument('--order-by', choices=NUMERIC_COLUMNS)
+    parser.add_argument('--descending', action='store_true')
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    if args.dataset:
+        index = CatalogueIndex.from_dataset(args.dataset, args.years)
+    else:
+        index = CatalogueIndex.from_csv(args.csv)
+
+    ranges = {}
+    for column in NUMERIC_COLUMNS:
+        low, high = getattr(args, f'min_{column}'), getattr(args, f'max_{column}')
+        if low is not None or high is not None:
+            ranges[column] = (low, high)
+
+    started = perf_counter()
+    ids = index.query_ids(args.keywords, **ranges)
+    elapsed = perf_counter() - started
+    result = index.query(args.keywords, args.order_by, args.descending, args.limit, **ranges)
+
+    with pd.option_context('display.max_colwidth', 80, 'display.width', 160):
+        print(result[['laptops', *NUMERIC_COLUMNS]].to_string())
+    print(f"{len(ids)} of {index.size} rows matched in {elapsed * 1000:.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -5,6 +5,11 @@ Updated for the NEW Best Buy Canada website structure (2025).
 URL: https://www.bestbuy.ca/en-ca/category/windows-laptops/36711
 """
 
+BASE_URL = 'https://www.bestbuy.ca/en-ca/category/windows-laptops/36711'
+
+# RAM "filter" of the listing without any filter (see crawl_planner.py)
+UNFILTERED = 'all'
+
 
 def get_config():
     """
@@ -20,9 +25,66 @@ def get_config():
     - pages: List of page numbers to scrape (1-10 recommended for testing)
     - ram_sizes: RAM size filters in GB (8, 16, 32 are most common)
     - sleep_min/max: Random delay between requests (10-20 seconds to be respectful)
-    - max_requests: Maximum number of requests to prevent overloading
+    - request_budget: Maximum requests per run; the recrawl scheduler spends it
+      on the pages most likely to have changed (replaces max_requests)
+    - crawl_plan: 'auto' (fewest requests), 'filtered' (one listing per RAM size) or
+      'unfiltered' (one listing, RAM derived from product names); see ``crawl_planner.py``
+    - site_page_size/max_page_size: Products per page by default and the largest
+      ``pageSize`` requested (None = never ask for a page size); plans count pages
+      at ``site_page_size`` until the site is seen serving the larger size
+    - crawl_plan_state_file: Listing and served page sizes learned by earlier runs (None = not kept)
+    - recrawl_state_file: Per-page change statistics and last records (None = fixed sweep in config order)
+    - recrawl_min_probability: Skip pages less likely than this to have changed (their last records are kept)
     - output_file: CSV filename for scraped data
+    - aggregates_dir: Per-crawl-date mergeable summaries updated on every save (None = off);
+      see ``aggregates.py``
+    - dataset_dir: Products also written as crawl_date=/ram_size= partitioned shards, one
+      writer per process without locks (None = CSV only); see ``dataset.py``
+    - figure_cache_dir: Rendered figures keyed by data/code/style hash; unchanged figures
+      are not redrawn (None = off); see ``figure_cache.py``
+    - figure_cache_max_mb: Size the figure cache is trimmed to (least recently used first)
     - user_agent: Modern browser user agent string
+    - base_url: Category listing URL (point it at the mock server for offline runs)
+    - runs_dir: Directory receiving one timestamped sub-directory of reports per run
+    - log_mode: 'default' (synchronous text logs) or 'fast' (queued sinks, JSON log file)
+    - queue_url: Shared work queue for crawl_worker.py (sqlite:///path or a registered backend)
+    - lease_seconds: Visibility timeout of a leased URL before it is handed to another worker
+    - max_attempts: Leases per URL before it is marked failed
+    - global_min_interval: Seconds between two requests across all crawl workers
+    - timeout_multiplier/min_timeout: Adaptive timeout = clamp(p99 latency x multiplier, min_timeout, timeout)
+    - max_retries/backoff_base/backoff_max: Jittered exponential backoff for failed requests
+    - hedge_requests: Send a duplicate request when the first exceeds the host's p95 latency
+    - retry_budget_ratio: Extra requests (retries + hedges) allowed per normal request
+    - request_interval: Minimum seconds between the starts of any two requests of a
+      process, retries, hedges and escalated browser loads included (None = sleep_min)
+    - transport: 'http1' (new connection per request), 'keepalive' (reused HTTP/1.1
+      connections) or 'http2' (httpx, concurrent requests multiplexed over one connection)
+    - engine: 'hybrid' (HTTP, escalating to Selenium for pages without product containers in
+      the static HTML), 'http' (scraper.py only) or 'selenium' (scraper_selenium.py only)
+    - tier_memory_file/tier_escalate_after/tier_probe_every: Per-URL-pattern tier memory of the hybrid engine
+    - browser_mode: 'auto' (attach to browser_daemon.py if running, else launch Chrome),
+      'attach' (require the daemon) or 'launch' (always start a new Chrome)
+    - browser_state_file/browser_debug_port/browser_driver_port: Browser daemon settings
+    - selenium_tabs: Pages loaded concurrently as tabs of one browser (1 = one page at a time)
+    - tab_timeout/tab_scroll_settle: Per-tab product wait and lazy-load settle time in tab mode
+    - memory_budget_mb: Memory limit (MB) of the pages in flight; tab pools and worker
+      threads only start another page while the estimate stays below it (None = no limit)
+    - memory_page_factor: Memory of a page in flight per byte of its body (parse tree overhead)
+    - archive_path: Compressed, deduplicated archive of every fetched page body (None = off)
+    - pipeline_queue_size: Pages buffered between two pipeline stages before the earlier one waits
+    - pipeline_batch_size: Records per CSV append of the pipeline's persist stage
+    - stream_parse: Extract products while the page downloads (``stream_parser.py``)
+      instead of parsing the complete body with BeautifulSoup afterwards
+    - canary: Probe one page before the crawl and abort if the product selectors no
+      longer match (``canary.py``)
+    - canary_min_rates: Minimum share of product containers in which each field must be found
+    - extraction_strategy: Field selectors tried first, 'exact' (hashed class names) or
+      'prefix' (class names without their build hash); the canary may switch to the other
+    - profile_mode: Profiler used by ``--profile`` without a value ('sampling' or 'cprofile')
+    - profile_interval/profile_top: Seconds between stack samples; functions listed per stage
+    - profile_memory/profile_memory_frames: tracemalloc snapshots while profiling (True, False or
+      'auto' = with 'cprofile' only), frames per traced allocation
+    - chromedriver_path: Explicit chromedriver; otherwise resolved once per Chrome version and cached in driver_cache_file
     
     Returns:
         dict: Configuration dictionary with scraping parameters
@@ -33,14 +95,69 @@ def get_config():
         'ram_sizes': ['8', '12', '32'],  # RAM sizes: 8GB, 12GB, and 32GB
         'sleep_min': 5,  # Minimum seconds between requests (be respectful)
         'sleep_max': 8,  # Maximum seconds between requests
-        'max_requests': 65,  # Safety limit (3 RAM sizes × 20 pages = 60 requests + buffer)
+        'request_budget': 65,  # Requests per run (3 RAM sizes × 20 pages = 60 requests + buffer)
+        'crawl_plan': 'auto',  # Pages/filters above are what to cover; the planner picks the URLs
+        'site_page_size': 24,  # Products on a page without pageSize
+        'max_page_size': 100,  # Fewer, larger pages: 480 products per RAM size = 5 requests instead of 20
+        'crawl_plan_state_file': 'data/crawl_plan.json',  # Products per listing seen by the last runs
+        'recrawl_state_file': 'data/recrawl_state.json',  # Change statistics used to order/thin out runs
+        'recrawl_min_probability': 0.05,  # Pages <5% likely to have changed wait for a later run
         'output_file': 'data/laptops_bestbuy_2025.csv',  # New filename for new data
+        'dataset_dir': 'data/dataset',  # Partitioned shards: workers write in parallel, readers prune partitions
+        'aggregates_dir': 'data/aggregates',  # Reports merge these instead of rescanning every CSV row
+        'figure_cache_dir': 'data/figure_cache',  # visualize_existing_data.py redraws only changed figures
+        'figure_cache_max_mb': 50,  # ~0.1-0.2 MB per figure at figure_dpi
+        'figure_dpi': 100,
         'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-        'timeout': 30  # Request timeout in seconds
+        'timeout': 30,  # Request timeout in seconds
+        'base_url': BASE_URL,  # Category listing URL (see mock_server.py for offline runs)
+        'runs_dir': 'runs',  # Per-run reports (metrics, profiles) go to runs/<timestamp>/
+        'log_mode': 'default',  # 'fast' = enqueued sinks + JSON file records (see logger.py)
+        'queue_url': 'sqlite:///data/crawl_queue.db',  # Shared queue for distributed workers
+        'lease_seconds': 120,  # Re-queue a URL if its worker has not acknowledged it by then
+        'max_attempts': 3,  # Give up on a URL after this many leases
+        'global_min_interval': 5,  # Seconds between requests across all workers
+        'timeout_multiplier': 3.0,  # Timeout = p99 latency x 3 once enough samples exist...
+        'min_timeout': 2.0,  # ...but never below 2 s or above 'timeout'
+        'max_retries': 3,  # Retries for connection errors, timeouts, 429 and 5xx
+        'backoff_base': 1.0,  # Backoff ~ uniform(0, base * 2^attempt) seconds
+        'backoff_max': 30.0,
+        'hedge_requests': False,  # Duplicate slow requests (p95) - doubles load on slow pages
+        'retry_budget_ratio': 0.2,  # At most ~20% extra requests from retries and hedges
+        'request_interval': None,  # Spacing kept by retries and hedges too (crawl workers: global_min_interval)
+        'transport': 'http1',  # 'http2' needs: pip install 'httpx[http2]' (falls back to 'keepalive')
+        'engine': 'hybrid',  # HTTP first, browser only for pages rendered by JavaScript
+        'tier_memory_file': 'data/fetch_tiers.json',  # Which tier worked per URL pattern
+        'tier_escalate_after': 2,  # HTTP pages only the browser found products on, before a pattern goes straight to the browser
+        'tier_probe_every': 10,  # Browser pages between two HTTP re-probes of such a pattern
+        'browser_mode': 'auto',  # Reuse the warm browser of browser_daemon.py when it is running
+        'browser_state_file': 'data/browser_daemon.json',
+        'browser_debug_port': 9222,  # Chrome remote-debugging port of the daemon
+        'browser_driver_port': 9515,  # chromedriver server port of the daemon
+        'selenium_tabs': 1,  # >1 = tab pool in one Chrome (benchmark_crawl.py --tabs for memory/page)
+        'tab_timeout': 15,  # Seconds a tab may take to show products
+        'tab_scroll_settle': 2.0,  # Seconds after scrolling before a tab is parsed
+        'memory_budget_mb': None,  # e.g. 1500 on small crawl boxes
+        'memory_page_factor': 10,  # A parsed page takes ~10x its HTML
+        'archive_path': 'data/html_archive.db',  # Raw HTML for replay (see html_archive.py)
+        'archive_level': 9,  # zstd/zlib level; chunks are compressed once, read many times
+        'pipeline_queue_size': 4,  # Bounded hand-off between fetch, extract and persist (see pipeline.py)
+        'pipeline_batch_size': 500,  # Records per CSV append while the crawl is running
+        'stream_parse': False,  # True = tokenise chunks as they arrive, no tree and no full body string
+        'canary': True,  # One probe request before the crawl; a site redeploy aborts instead of crawling empty pages
+        'canary_min_rates': {'name': 0.9, 'price': 0.9, 'rating': 0.1},  # Not every product has reviews
+        'extraction_strategy': 'exact',  # 'prefix' survives class-hash changes at some matching cost
+        'profile_mode': 'sampling',  # --profile: low-overhead stack sampling ('cprofile' adds exact call counts)
+        'profile_interval': 0.01,  # 100 Hz; stack samples are attributed to the current metrics stage
+        'profile_top': 25,  # Hot functions per stage in runs/<timestamp>/profile/summary.txt
+        'profile_memory': 'auto',  # tracemalloc at checkpoints; 'auto' = cprofile mode only (slows parsing ~5x)
+        'profile_memory_frames': 1,  # Frames kept per allocation; more = better attribution, slower
+        'chromedriver_path': None,  # None = PATH, /usr/bin/chromedriver, then WebDriver Manager
+        'driver_cache_file': '~/.cache/bestbuy-scraper/chromedriver.json'  # Resolved driver path
     }
 
 
-def build_url(page_number, ram_size):
+def build_url(page_number, ram_size, base_url=BASE_URL, page_size=None):
     """
     Builds the URL for BestBuy Windows laptop search with specific page and RAM size.
     
@@ -49,6 +166,8 @@ def build_url(page_number, ram_size):
     Args:
         page_number (str): Page number to scrape
         ram_size (str): RAM size filter (in GB)
+        base_url (str): Category listing URL, defaults to the live Best Buy site
+        page_size (int): Products per page (None = the site default)
     
     Returns:
         str: Complete URL for the search
@@ -62,20 +181,23 @@ def build_url(page_number, ram_size):
         - custom0ramsize is the RAM filter parameter
         - The path includes the full category hierarchy
     """
-    base_url = 'https://www.bestbuy.ca/en-ca/category/windows-laptops/36711'
     params = f'?page={page_number}'
+    if page_size:
+        params += f'&pageSize={page_size}'
     # URL-encoded path: category:Computers+&+Tablets;category:Laptops+&+MacBooks;category:Windows+Laptops;custom0ramsize:{ram_size}
     filters = f'&path=category%3AComputers%2B%2526%2BTablets%3Bcategory%3ALaptops%2B%2526%2BMacBooks%3Bcategory%3AWindows%2BLaptops%3Bcustom0ramsize%3A{ram_size}'
     return base_url + params + filters
 
 
-def get_alternative_url_no_ram_filter(page_number):
+def get_alternative_url_no_ram_filter(page_number, base_url=BASE_URL, page_size=None):
     """
     Alternative URL builder without RAM filtering.
     Use this if RAM filtering causes issues or for broader data collection.
     
     Args:
         page_number (str): Page number to scrape
+        base_url (str): Category listing URL, defaults to the live Best Buy site
+        page_size (int): Products per page (None = the site default)
     
     Returns:
         str: URL without RAM filter
@@ -84,5 +206,32 @@ def get_alternative_url_no_ram_filter(page_number):
         >>> get_alternative_url_no_ram_filter('1')
         'https://www.bestbuy.ca/en-ca/category/windows-laptops/36711?page=1'
     """
-    base_url = 'https://www.bestbuy.ca/en-ca/category/windows-laptops/36711'
+    if page_size:
+        return f'{base_url}?page={page_number}&pageSize={page_size}'
     return f'{base_url}?page={page_number}'
+
+
+def make_url_builder(config):
+    """
+    Returns a ``build_url`` bound to the configured base URL.
+    
+    The scrapers call ``build_url_func(page, ram_size)``, so this is how a
+    config pointing at a different host (e.g. the local mock server) reaches them.
+    Pages are requested with ``max_page_size`` products, and ``UNFILTERED``
+    targets of the crawl planner get the listing without a RAM filter.
+    
+    Args:
+        config (dict): Configuration dictionary
+    
+    Returns:
+        function: ``build_url_func(page_number, ram_size)``
+    """
+    base_url = config.get('base_url', BASE_URL)
+    page_size = config.get('max_page_size')
+    
+    def build_url_func(page_number, ram_size):
+        if ram_size == UNFILTERED:
+            return get_alternative_url_no_ram_filter(page_number, base_url=base_url, page_size=page_size)
+        return build_url(page_number, ram_size, base_url=base_url, page_size=page_size)
+    
+    return build_url_func
@@ -0,0 +1,476 @@
+"""
+Request-minimising crawl planning over listing filters and page sizes.
+
+The configured sweep requests every page of every RAM filter at the site's
+default page size (``ram_sizes`` x ``pages`` requests, one politeness sleep
+each), although a product's RAM is already in its name. The planner picks
+the cheaper of two ways to cover the same facets, both at the largest page
+size the site accepts (``max_page_size``):
+
+- 'filtered': each RAM filter's listing (``config.build_url``), as before;
+- 'unfiltered': the listing without filters
+  (``config.get_alternative_url_no_ram_filter``) crawled once, with each
+  product's facet derived locally from its name (``ram_from_name``) and
+  products of other facets dropped.
+
+Nothing guarantees that the site honours ``pageSize``: it may clamp or
+ignore it. The page size a request actually gets is learned from the pages
+themselves and kept per requested size: a page holding the requested number
+of products, or one followed by a non-empty page of its listing, shows how
+many products a full page holds. Until then, plans are computed with the
+site's default page size (``site_page_size``) and only an empty page ends a
+listing, so a site serving fewer products per page than asked for costs
+requests, never products.
+
+Listing sizes are learned from the crawl too: a listing ends at its first
+page that is empty or holds clearly fewer products than a full page,
+which also makes the crawl skip its remaining pages. A short page of a
+listing whose recorded size says it goes on is taken for extraction
+failures and does not end it. A listing whose last planned page is still
+full has grown (or its stored size was wrong): at least that many products
+are recorded and the next page is added to the running plan, within the
+products the listing may cover and the request budget. Sizes are kept in
+``crawl_plan_state_file``, so the planner compares exact request counts. Until a run of the
+'unfiltered' plan has learned the catalogue size, 'auto' keeps to the
+filtered listings, whose cost is bounded by the configured sweep.
+
+    plan = plan_listings(config)
+    plan.targets      # [(ram_size or UNFILTERED, page), ...] in page_size units
+"""
+
+import json
+import math
+import os
+import re
+from urllib.parse import unquote
+
+from loguru import logger
+
+from config import UNFILTERED
+
+PLAN_MODES = ('auto', 'filtered', 'unfiltered')
+
+# Plausible laptop memory sizes in GB (tells a bare "8GB" RAM from "256GB" storage)
+RAM_SIZES_GB = {4, 6, 8, 12, 16, 18, 24, 32, 36, 40, 48, 64, 96, 128}
+
+# "16GB RAM", "8 GB DDR4 RAM", "16GB LPDDR5X Memory", "12G RAM", "32 RAM", "12GBDDR4"
+_RAM_PATTERNS = (
+    re.compile(r'\b(\d+)\s*(?:GB?\s*)?(?:(?:LP)?DDR\d\w*\s*|Unified\s*)?(?:RAM|Memory)\b', re.IGNORECASE),
+    re.compile(r'\b(\d+)\s*GB?\s*(?:LP)?DDR\d', re.IGNORECASE),
+)
+# Last resort: a bare "16GB" that is not storage or video memory ("..., 16GB, 512GB SSD")
+_BARE_GB = re.compile(r'\b(\d+)\s*GB\b(?!\s*(?:SSD|eMMC|HDD|Storage|PCIe|NVMe|UFS|Flash|GDDR|VRAM))',
+                      re.IGNORECASE)
+
+# A page this much short of the page size ends its listing (a few products may fail extraction)
+END_PAGE_TOLERANCE = 0.05
+
+
+def ram_from_name(name):
+    """
+    RAM size stated in a product name.
+
+    Args:
+        name (str): Product name
+
+    Returns:
+        str: RAM in GB (as in ``config['ram_sizes']``), or None if the name does not say
+
+    Example:
+        >>> ram_from_name('HP 14" Laptop - Jet Black (Intel N100/8GB RAM/256GB SSD/Windows 11)')
+        '8'
+    """
+    for pattern in _RAM_PATTERNS:
+        match = pattern.search(name)
+        if match:
+            return match.group(1)
+    for match in _BARE_GB.finditer(name):
+        if int(match.group(1)) in RAM_SIZES_GB:
+            return match.group(1)
+    return None
+
+
+def page_size(config):
+    """
+    Products per requested page.
+
+    Args:
+        config (dict): Configuration dictionary
+
+    Returns:
+        int: ``max_page_size``, or the site default when no page size is requested
+    """
+    return config.get('max_page_size') or config.get('site_page_size', 24)
+
+
+class PlannerState:
+    """
+    Listing sizes (products per filter, ``UNFILTERED`` for the whole catalogue) and
+    effective page sizes (per requested ``pageSize``) seen by earlier runs.
+    """
+
+    def __init__(self, state_file=None):
+        """
+        Args:
+            state_file (str): JSON file holding the sizes (None = not persisted)
+        """
+        self.state_file = state_file
+        self.sizes = {}
+        self.page_sizes = {}
+        if state_file and os.path.exists(state_file):
+            with open(state_file) as f:
+                state = json.load(f)
+            self.sizes = state.get('sizes', {})
+            self.page_sizes = state.get('page_sizes', {})
+
+    def record_size(self, listing, size):
+        """
+        Stores a listing's size and persists the state.
+
+        Args:
+            listing (str): RAM size or ``UNFILTERED``
+            size (int): Products in the listing
+        """
+        if self.sizes.get(listing) == size:
+            return
+        self.sizes[listing] = size
+        self._save()
+
+    def record_page_size(self, requested, served):
+        """
+        Stores the products per page the site serves when asked for ``requested``.
+
+        Args:
+            requested (int): Requested page size
+            served (int): Largest page seen at that requested size
+        """
+        if self.page_sizes.get(str(requested)) == served:
+            return
+        self.page_sizes[str(requested)] = served
+        self._save()
+
+    def _save(self):
+        """Persists the state (atomically replaces the file)."""
+        if not self.state_file:
+            return
+        os.makedirs(os.path.dirname(self.state_file) or '.', exist_ok=True)
+        temp_file = self.state_file + '.tmp'
+        with open(temp_file, 'w') as f:
+            json.dump({'sizes': self.sizes, 'page_sizes': self.page_sizes}, f)
+        os.replace(temp_file, self.state_file)
+
+
+class CrawlPlan:
+    """
+    Targets of one run; pages past a listing's end are skipped while iterating.
+
+    The engines iterate the plan like the target list it replaces (or take
+    targets one at a time with ``take``) and pass each page's records
+    through ``accept``, which notes where listings end, extends listings
+    that turn out longer than planned and keeps only products of the
+    requested facets.
+    """
+
+    def __init__(self, targets, mode, page_size, ram_sizes, state=None, covers=None, budget=None,
+                 served_page_size=None):
+        """
+        Args:
+            targets (list): (ram_size or ``UNFILTERED``, page) tuples
+            mode (str): 'filtered' or 'unfiltered'
+            page_size (int): Products per requested page (``pageSize`` of the URLs)
+            ram_sizes (list): Requested RAM facets
+            state (PlannerState): Receives the listing and page sizes found by this run
+            covers (dict): Listing -> products it may be extended to (None = no limit;
+                listings not in the dict are never extended)
+            budget (int): Requests the plan may grow to (None = unlimited)
+            served_page_size (int): Products per page the site is known to serve at
+                ``page_size`` (None = not seen yet; learned from the pages)
+        """
+        self.targets = list(targets)
+        self.mode = mode
+        self.page_size = page_size
+        self.served_page_size = served_page_size
+        self.ram_sizes = list(ram_sizes)
+        self.state = state
+        self.covers = dict(covers or {})
+        self.budget = budget
+        self.ends = {}
+        self._counts = {}
+        self.skipped = 0
+        self.dropped = 0
+        self.extended = 0
+        self._cursor = 0
+
+    def __len__(self):
+        return len(self.targets)
+
+    def __iter__(self):
+        while True:
+            target = self.take()
+            if target is None:
+                return
+            yield target
+
+    def take(self):
+        """
+        Next target to crawl, skipping pages past known listing ends and covers.
+
+        Unlike an exhausted iterator, ``take`` returns pages that ``accept``
+        appended after it last returned None (crawls with pages in flight).
+
+        Returns:
+            tuple: (ram_size, page), or None if no planned page is left for now
+        """
+        while self._cursor < len(self.targets):
+            ram_size, page = self.targets[self._cursor]
+            self._cursor += 1
+            if self.past_end(ram_size, page):
+                self.skipped += 1
+                continue
+            return ram_size, page
+        return None
+
+    def past_end(self, ram_size, page):
+        """
+        Whether a page lies past its listing's known end or past the pages covering it.
+
+        Args:
+            ram_size (str): RAM filter of the page
+            page (str): Page number
+
+        Returns:
+            bool: True if the page need not be crawled
+        """
+        end = self.ends.get(ram_size)
+        if end is None and self.covers.get(ram_size) and self.served_page_size:
+            # Planned at the default page size: larger pages reach the listing's cover sooner
+            end = math.ceil(self.covers[ram_size] / self.served_page_size)
+        return end is not None and int(page) > end
+
+    def remaining(self):
+        """
+        Returns:
+            int: Planned targets not yet taken (pages past listing ends included)
+        """
+        return len(self.targets) - self._cursor
+
+    def log_summary(self):
+        """
+        Logs the pages skipped past listing ends, the pages added to growing listings
+        and the products of other facets dropped.
+        """
+        logger.info("Crawl plan ({}): {} planned pages skipped past listing ends, {} added to "
+                    "listings longer than planned, {} products of other RAM sizes dropped",
+                    self.mode, self.skipped, self.extended, self.dropped)
+
+    def accept(self, ram_size, page, records):
+        """
+        Records the outcome of one page and returns the products to keep.
+
+        Args:
+            ram_size (str): RAM filter of the page (``UNFILTERED`` for the plain listing)
+            page (str): Page number
+            records (list): Extracted records (None if the request failed)
+
+        Returns:
+            list: Records of the requested facets (None if the request failed)
+        """
+        if records is None:
+            return None
+        page = int(page)
+        served = self._learn_page_size(ram_size, page, len(records))
+        if self._ends_listing(ram_size, page, len(records), served):
+            end = self.ends.get(ram_size)
+            if end is None or page < end:
+                self.ends[ram_size] = page
+                size = self._listing_size(ram_size, page, served)
+                if self.state is not None and size is not None:
+                    self.state.record_size(ram_size, size)
+        elif ram_size not in self.ends:
+            # Not yet knowing what a full page holds, this page counts as one
+            self._grow(ram_size, page, served or len(records))
+        kept = filter_facets(records, ram_size, self.ram_sizes)
+        self.dropped += len(records) - len(kept)
+        return kept
+
+    def _learn_page_size(self, ram_size, page, count):
+        """
+        Products per full page (None until a page has shown it).
+
+        A page is known to be full when it holds the requested number of
+        products or when the next page of its listing is not empty.
+        """
+        counts = self._counts.setdefault(ram_size, {})
+        counts[page] = count
+        full = [count] if count >= self.page_size else []
+        if count and counts.get(page - 1):
+            full.append(counts[page - 1])
+        if counts.get(page + 1) and count:
+            full.append(count)
+        if full and max(full) > (self.served_page_size or 0):
+            self.served_page_size = min(max(full), self.page_size)
+            if self.served_page_size < self.page_size:
+                logger.warning("Pages asked for {} products hold {}: planning with the smaller size",
+                               self.page_size, self.served_page_size)
+            if self.state is not None:
+                self.state.record_page_size(self.page_size, self.served_page_size)
+        return self.served_page_size
+
+    def _listing_size(self, ram_size, page, served):
+        """Products of a listing ending at ``page`` (None if it cannot be told yet)."""
+        counts = self._counts[ram_size]
+        if all(earlier in counts for earlier in range(1, page)):
+            return sum(counts[earlier] for earlier in range(1, page + 1))
+        if served is None:
+            return None
+        return (page - 1) * served + counts[page]
+
+    def _ends_listing(self, ram_size, page, count, served):
+        """True if a page is the end of its listing: empty, or short without extraction failures."""
+        if count == 0:
+            return True
+        if served is None or count >= served * (1 - END_PAGE_TOLERANCE):
+            return False
+        # A listing recorded as going on past this page lost products to extraction, not its end
+        known = self.state.sizes.get(ram_size) if self.state is not None else None
+        return known is None or known <= page * served
+
+    def _grow(self, ram_size, page, served):
+        """Records a full page; if it was its listing's last planned page, plans the next one."""
+        last = max(int(planned) for listing, planned in self.targets if listing == ram_size)
+        if page < last:
+            return
+        if self.state is not None:
+            known = self.state.sizes.get(ram_size)
+            if known is None or known < page * served:
+                self.state.record_size(ram_size, page * served)
+        if ram_size not in self.covers:
+            return
+        cover = self.covers[ram_size]
+        if cover is not None and page >= math.ceil(cover / served):
+            return
+        if self.budget is not None and len(self.targets) >= self.budget:
+            logger.warning("Listing {} continues past page {}, but the request budget ({}) is spent",
+                           ram_size, page, self.budget)
+            return
+        self.targets.append((ram_size, str(page + 1)))
+        self.extended += 1
+
+
+def listing_pages(size, cover, size_per_page):
+    """
+    Pages of one listing needed to reach ``cover`` products (or its end).
+
+    A known listing shorter than ``cover`` is crawled up to the page that
+    shows its end; if that page is full, the listing has grown and
+    ``CrawlPlan.accept`` extends the crawl past it.
+
+    Args:
+        size (int): Known listing size (None = unknown)
+        cover (int): Products wanted from the listing (None = all)
+        size_per_page (int): Products per page
+
+    Returns:
+        int: Pages to request (None if unknown and unbounded)
+    """
+    if size is not None and (cover is None or size < cover):
+        return size // size_per_page + 1
+    if cover is None:
+        return None
+    return math.ceil(cover / size_per_page)
+
+
+def plan_listings(config):
+    """
+    Chooses the listings and pages covering the configured RAM facets with the fewest requests.
+
+    Args:
+        config (dict): Configuration dictionary ('crawl_plan': 'auto', 'filtered' or 'unfiltered')
+
+    Returns:
+        CrawlPlan: Planned targets (ordered by listing, then page)
+    """
+    mode = config.get('crawl_plan', 'auto')
+    if mode not in PLAN_MODES:
+        raise ValueError(f"Unknown crawl plan '{mode}' (expected one of {PLAN_MODES})")
+    state = PlannerState(config.get('crawl_plan_state_file'))
+    requested = page_size(config)
+    served = state.page_sizes.get(str(requested))
+    # Pages are counted at the site's default size until a page has shown that the larger one is served
+    size_per_page = served or min(requested, config.get('site_page_size', 24))
+    budget = config.get('request_budget', config.get('max_requests'))
+    ram_sizes = config['ram_sizes']
+    # Products per facet the configured sweep reaches
+    cover = len(config['pages']) * config.get('site_page_size', 24)
+
+    filtered = {ram_size: listing_pages(state.sizes.get(ram_size), cover, size_per_page)
+                for ram_size in ram_sizes}
+    filtered_requests = sum(filtered.values())
+    unfiltered_requests = listing_pages(state.sizes.get(UNFILTERED), None, size_per_page)
+
+    if mode == 'auto':
+        if unfiltered_requests is not None and unfiltered_requests < filtered_requests:
+            mode = 'unfiltered'
+        else:
+            mode = 'filtered'
+    if mode == 'filtered':
+        targets = [(ram_size, str(page)) for ram_size in ram_sizes for page in range(1, filtered[ram_size] + 1)]
+        # A filtered listing is never crawled past the products the sweep covers
+        covers = {ram_size: cover for ram_size in ram_sizes}
+    else:
+        pages = unfiltered_requests
+        if pages is None:
+            # Unknown catalogue size: crawl until the listing ends, within the budget
+            pages = budget or len(ram_sizes) * len(config['pages'])
+        targets = [(UNFILTERED, str(page)) for page in range(1, pages + 1)]
+        covers = {UNFILTERED: None}
+
+    sweep = len(ram_sizes) * len(config['pages'])
+    planned = f"{len(targets)}" if mode == 'filtered' or unfiltered_requests is not None \
+        else f"up to {len(targets)} (until the listing ends; size learned for the next run)"
+    logger.info("Crawl plan: {} listing{} at {} products per page ({}), {} requests "
+                "(filtered: {}, unfiltered: {}, configured sweep: {})",
+                mode, 's' if mode == 'filtered' else '', size_per_page,
+                'served' if served else f'pageSize={requested} not seen served yet', planned, filtered_requests,
+                unfiltered_requests if unfiltered_requests is not None else 'unknown size', sweep)
+    return CrawlPlan(targets, mode, requested, ram_sizes, state, covers, budget, served)
+
+
+# RAM filter of a listing URL (``config.build_url``), URL-encoded once or twice
+_URL_RAM_FACET = re.compile(r'custom0ramsize(?::|%3A)(\d+)', re.IGNORECASE)
+
+
+def ram_size_from_url(url):
+    """
+    RAM filter a listing URL was requested with.
+
+    Args:
+        url (str): Listing URL built by ``config.make_url_builder``
+
+    Returns:
+        str: RAM size in GB, or ``UNFILTERED`` for the listing without a RAM filter
+
+    Example:
+        >>> ram_size_from_url('https://www.bestbuy.ca/en-ca/category/windows-laptops/36711?page=2&pageSize=100')
+        'all'
+    """
+    match = _URL_RAM_FACET.search(unquote(url))
+    return match.group(1) if match else UNFILTERED
+
+
+def filter_facets(records, ram_size, ram_sizes):
+    """
+    Keeps the records of the requested facets (used where no ``CrawlPlan`` is at hand).
+
+    Args:
+        records (list): Extracted records (None if the request failed)
+        ram_size (str): RAM filter of the page
+        ram_sizes (list): Requested RAM facets
+
+    Returns:
+        list: ``records`` itself for a filtered page, else its products of ``ram_sizes``
+    """
+    if records is None or ram_size != UNFILTERED:
+        return records
+    ram_sizes = set(ram_sizes)
+    return [record for record in records if ram_from_name(record.name) in ram_sizes]
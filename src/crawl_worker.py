@@ -0,0 +1,265 @@
+"""
+Distributed crawl coordinator and workers on top of ``work_queue``.
+
+Instead of running several copies of ``webscraping.main`` (which all scrape
+the same pages), seed the shared queue once and start any number of workers,
+on any machine that can reach the queue:
+
+    python src/crawl_worker.py seed
+    python src/crawl_worker.py work --threads 4      # on each node
+    python src/crawl_worker.py status
+    python src/crawl_worker.py export
+
+Requests from all workers share one global rate limit
+(``config['global_min_interval']`` seconds between requests) kept in the queue.
+Before ``work`` starts its threads, the selector canary (``canary.py``)
+probes one page and picks the extraction strategy; if no strategy finds the
+product fields, the process exits without leasing anything.
+With ``config['dataset_dir']`` set, each worker also commits every page as
+shards of the partitioned dataset (``dataset.py``) under its own manifest,
+before acknowledging it: a worker that crashes loses no acknowledged page.
+The shards carry the page's lease and are read once the worker confirms the
+acknowledged lease in its manifest; a worker dying between the ack and the
+confirmation is caught up by ``confirm_acked_shards`` (run by ``work`` and
+``export``), and shards of a lease the queue never accepted stay hidden.
+"""
+
+import argparse
+import os
+import socket
+import threading
+from time import time
+
+from loguru import logger
+
+from canary import SelectorDriftError, preflight
+from config import get_config, make_url_builder
+from crawl_planner import filter_facets, plan_listings
+from data_cleaner import save_data
+from dataset import DatasetWriter, unconfirmed_leases
+from field_selectors import log_field_rates, set_strategy
+from metrics import registry
+from memory_budget import memory_budget
+from records import RecordBuffer
+from scraper import scrape_page
+from work_queue import open_queue, wait_for_slot
+
+
+def seed_queue(config, build_url_func):
+    """
+    Seeds the queue with the planned (page, RAM size) URLs (see ``crawl_planner.py``).
+
+    Args:
+        config (dict): Configuration dictionary
+        build_url_func (function): Function to build URLs
+
+    Returns:
+        int: Number of newly queued URLs
+    """
+    queue = open_queue(config)
+    try:
+        # Workers cannot stop at a listing's end, so the plan must not depend on finding it
+        tasks = [
+            (build_url_func(page, ram_size), page, ram_size)
+            for ram_size, page in plan_listings(config).targets
+        ]
+        added = queue.seed(tasks)
+        logger.info("Seeded {} new URLs ({} already queued)", added, len(tasks) - added)
+        return added
+    finally:
+        queue.close()
+
+
+def check_selectors(config, build_url_func):
+    """
+    Selects the extraction strategy of this process's workers (see ``canary.py``).
+
+    Args:
+        config (dict): Configuration dictionary
+        build_url_func (function): Function to build URLs
+
+    Returns:
+        bool: False if no strategy finds the product fields (workers must not start)
+    """
+    if not config.get('canary', True):
+        set_strategy(config.get('extraction_strategy', 'exact'))
+        return True
+
+    queue = open_queue(config)
+    try:
+        # The probe takes a slot under the global rate limit like any worker request
+        wait_for_slot(queue, config.get('global_min_interval', config['sleep_min']))
+    finally:
+        queue.close()
+    try:
+        # Workers space their requests through the queue, not with the politeness sleep
+        preflight(dict(config, sleep_max=0), build_url_func)
+    except SelectorDriftError as e:
+        logger.error("Not starting workers: {}", e)
+        return False
+    return True
+
+
+def run_worker(config, worker_id, max_tasks=None, stop_event=None, budget=None):
+    """
+    Leases and scrapes URLs until the queue is drained.
+
+    Args:
+        config (dict): Configuration dictionary
+        worker_id (str): Identifier recorded on leases
+        max_tasks (int): Stop after this many tasks (None = until drained)
+        stop_event (threading.Event): Set to stop after the current task
+        budget (MemoryBudget): Shared by the worker threads of a process, so
+            pages are only started while their estimate is under ``memory_budget_mb``
+
+    Returns:
+        int: Number of pages acknowledged by this worker
+    """
+    queue = open_queue(config)
+    budget = budget or memory_budget(config)
+    lease_seconds = config.get('lease_seconds', 120)
+    min_interval = config.get('global_min_interval', config['sleep_min'])
+    if config.get('request_interval') is None:
+        # Retries and hedges of this worker are spaced like its own requests
+        config = dict(config, request_interval=min_interval)
+    start_time = time()
+    processed = 0
+    # Each worker commits its own shards: no lock shared with the other workers
+    dataset = None
+    if config.get('dataset_dir'):
+        dataset = DatasetWriter(config['dataset_dir'])
+
+    try:
+        while max_tasks is None or processed < max_tasks:
+            if stop_event is not None and stop_event.is_set():
+                break
+
+            with budget:
+                # Wait for the rate slot before leasing, so the lease runs from the request
+                # rather than expiring while many workers queue up for their slots
+                wait_for_slot(queue, min_interval)
+                lease = queue.lease(worker_id, lease_seconds)
+                if lease is None:
+                    logger.info("Worker {} | queue drained", worker_id)
+                    break
+                records = filter_facets(scrape_page(lease.url, processed + 1, start_time, config),
+                                        lease.ram_size, config['ram_sizes'])
+            if records is None:
+                queue.nack(lease, 'request failed', retry_delay=min_interval)
+                registry.counter('queue_nacks_total', 'Tasks given back after a failure').inc()
+                continue
+
+            if dataset is not None:
+                # Shards are committed before the ack; a page whose lease is gone belongs to another worker
+                if not queue.extend(lease, lease_seconds):
+                    logger.warning("Lease lost for {}, discarding {} records", lease.url, len(records))
+                    continue
+                dataset.add(records, lease.ram_size)
+                dataset.flush(lease)
+
+            if queue.ack(lease, records):
+                if dataset is not None:
+                    dataset.confirm([lease.token])
+                processed += 1
+                registry.counter('scrape_products_total', 'Products extracted').inc(len(records))
+                logger.info("Worker {} | RAM={}GB Page={} | {} laptops", worker_id,
+                            lease.ram_size, lease.page, len(records))
+    finally:
+        queue.close()
+
+    return processed
+
+
+def confirm_acked_shards(config):
+    """
+    Confirms dataset shards whose lease the queue acknowledged but whose worker
+    died before confirming it.
+
+    Args:
+        config (dict): Configuration dictionary
+
+    Returns:
+        int: Number of leases confirmed
+    """
+    if not config.get('dataset_dir'):
+        return 0
+    pending = unconfirmed_leases(config['dataset_dir'])
+    if not pending:
+        return 0
+    queue = open_queue(config)
+    try:
+        acked = queue.acked_leases()
+    finally:
+        queue.close()
+    tokens = [token for token, url in pending.items() if acked.get(url) == token]
+    if tokens:
+        DatasetWriter(config['dataset_dir']).confirm(tokens)
+        logger.info("Dataset: confirmed {} acknowledged pages of crashed workers", len(tokens))
+    return len(tokens)
+
+
+def export_results(config, filename=None):
+    """
+    Writes all records in the shared sink to the normal CSV output.
+
+    Args:
+        config (dict): Configuration dictionary
+        filename (str): Output CSV (defaults to ``config['output_file']``)
+
+    Returns:
+        pd.DataFrame: Saved dataframe
+    """
+    confirm_acked_shards(config)
+    queue = open_queue(config)
+    try:
+        records = queue.results()
+    finally:
+        queue.close()
+
+    return save_data(RecordBuffer(records), filename or config['output_file'],
+                     aggregates_dir=config.get('aggregates_dir'))
+
+
+def main():
+    """
+    Command-line entry point: seed, work, status or export.
+    """
+    parser = argparse.ArgumentParser(description='Distributed Best Buy crawl using a shared lease-based queue')
+    parser.add_argument('command', choices=['seed', 'work', 'status', 'export'])
+    parser.add_argument('--queue-url', help="Queue location, e.g. sqlite:///data/crawl_queue.db")
+    parser.add_argument('--threads', type=int, default=1, help='Worker threads in this process')
+    parser.add_argument('--max-tasks', type=int, help='Stop each worker after this many pages')
+    parser.add_argument('--output', help='CSV written by export')
+    args = parser.parse_args()
+
+    config = get_config()
+    if args.queue_url:
+        config['queue_url'] = args.queue_url
+
+    if args.command == 'seed':
+        seed_queue(config, make_url_builder(config))
+    elif args.command == 'work':
+        if not check_selectors(config, make_url_builder(config)):
+            raise SystemExit(1)
+        confirm_acked_shards(config)
+        prefix = f'{socket.gethostname()}-{os.getpid()}'
+        budget = memory_budget(config)
+        threads = [
+            threading.Thread(target=run_worker, args=(config, f'{prefix}-{i}', args.max_tasks, None, budget))
+            for i in range(args.threads)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        log_field_rates()
+    elif args.command == 'status':
+        queue = open_queue(config)
+        logger.info("Queue {} | {}", config['queue_url'], queue.stats())
+        queue.close()
+    else:
+        export_results(config, args.output)
+
+
+if __name__ == '__main__':
+    main()
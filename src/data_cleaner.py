@@ -2,23 +2,31 @@
 Data cleaning module for processing scraped laptop data.
 """
 
+import io
+import os
 import pandas as pd
 from loguru import logger
 
+from metrics import timer
+from normalize import MANIFEST as NORMALIZED_MANIFEST, normalize_values
+from records import RecordBuffer, parse_price_cents
+
 
 def clean_price(price_str):
     """
     Cleans price string and converts to float.
+    Handles both old format '$1,234.56' and new format where it's already a number.
     
     Args:
-        price_str (str): Price string (e.g., '$1,234.56')
+        price_str (str or float): Price string (e.g., '$1,234.56') or number
     
     Returns:
-        float: Cleaned price value
+        float: Cleaned price value (NaN if unreadable)
     """
-    if ',' in price_str:
-        price_str = price_str.replace(',', '')
-    return float(price_str[1:])
+    if isinstance(price_str, (int, float)):
+        return float(price_str)
+    cents = parse_price_cents(price_str)
+    return cents / 100 if cents is not None else float('nan')
 
 
 def clean_votes(vote_str):
@@ -47,7 +55,12 @@ def clean_votes(vote_str):
 
 def clean_dataframe(df):
     """
-    Cleans the dataframe by processing prices and votes columns.
+    Cleans the dataframe by processing prices, ratings and votes columns.
+    
+    The file's schema version is detected (see ``normalize.py``), so legacy
+    files with 0-100 ratings and "(n)" votes end up on the same 0-5 scale as
+    current ones. Columns are converted vectorised; columns that are already
+    numeric (files written from a ``RecordBuffer``) are only cast.
     
     Args:
         df (pd.DataFrame): Raw dataframe
@@ -55,45 +68,115 @@ def clean_dataframe(df):
     Returns:
         pd.DataFrame: Cleaned dataframe
     """
-    df['prices'] = df['prices'].apply(clean_price)
-    df['votes'] = df['votes'].apply(clean_votes)
-    return df
+    return normalize_values(df)
 
 
-def save_data(data, filename):
+def _dataframe_info(df):
+    """
+    Returns ``df.info()`` as a string (``df.info()`` itself prints and returns None).
+    """
+    buffer = io.StringIO()
+    df.info(buf=buffer)
+    return buffer.getvalue()
+
+
+def save_data(data, filename, append=False, aggregates_dir=None, crawl_date=None, dataset_dir=None):
     """
     Saves scraped data to CSV file.
     
     Args:
-        data (dict): Dictionary containing laptop data
+        data (RecordBuffer or dict): Typed records, or a dictionary of
+            names/prices/ratings/reviews lists
         filename (str): Output filename
+        append (bool): Append to an existing file instead of replacing it,
+            so large batches can be written as they are produced
+        aggregates_dir (str): Also fold the rows into the summary of their crawl
+            date in this directory (see ``aggregates.py``); a replaced file
+            replaces the date's summary, an append is merged into it
+        crawl_date (str): ISO date of the crawl (defaults to today)
+        dataset_dir (str): Also commit the rows as shards of the partitioned
+            dataset in this directory (see ``dataset.py``); like the summary,
+            a replaced file replaces the date's rows, an append adds to them
     
     Returns:
         pd.DataFrame: Created dataframe
     """
-    df = pd.DataFrame({
-        'laptops': data['names'],
-        'prices': data['prices'],
-        'ratings': data['ratings'],
-        'votes': data.get('reviews', data.get('votes', None))  # Support both new ('reviews') and old ('votes') format
-    })
+    if isinstance(data, RecordBuffer):
+        df = data.to_dataframe()
+    else:
+        df = pd.DataFrame({
+            'laptops': data['names'],
+            'prices': data['prices'],
+            'ratings': data['ratings'],
+            'votes': data.get('reviews', data.get('votes', None))  # Support both new ('reviews') and old ('votes') format
+        })
     
     logger.info(f"DataFrame created with {len(df)} rows and {len(df.columns)} columns")
-    logger.debug(f"DataFrame info:\n{df.info()}")
-    df.to_csv(filename)
+    logger.opt(lazy=True).debug("DataFrame info:\n{}", lambda: _dataframe_info(df))
+    with timer('write'):
+        if append and os.path.exists(filename):
+            df.to_csv(filename, mode='a', header=False)
+        else:
+            df.to_csv(filename)
     logger.success(f"Data saved to {filename}")
+    if aggregates_dir or dataset_dir:
+        cleaned = clean_dataframe(df)
+        if aggregates_dir:
+            from aggregates import AggregateStore
+            AggregateStore(aggregates_dir).update(cleaned, crawl_date, replace=not append)
+        if dataset_dir:
+            from dataset import get_writer
+            writer = get_writer(dataset_dir, crawl_date, source=os.path.normpath(filename))
+            if not append:
+                writer.replace()
+            writer.write(cleaned)
+            # Commits the replacement even when the run has no rows
+            writer.finish()
     return df
 
 
-def load_and_process_data(filename):
+def load_and_process_data(filename, match_products=False, start=None, end=None, ram_sizes=None, workers=None):
     """
-    Loads data from CSV and processes it.
+    Loads data from CSV (or the partitioned dataset) and processes it.
     
     Args:
-        filename (str): Input CSV filename
+        filename (str): Input CSV filename, or a dataset directory: a crawl dataset
+            (``dataset.py``) or a normalised one (``normalize.py``)
+        match_products (bool): Add a ``family_id`` column grouping near-duplicate
+            names (colour variants, open-box and refurbished listings; see
+            ``product_matching.py``)
+        start (str): Dataset only: first crawl date to read (None = the oldest;
+            a normalised dataset is read from this date's year)
+        end (str): Dataset only: last crawl date to read (None = the newest;
+            a normalised dataset is read up to this date's year)
+        ram_sizes (list): Crawl dataset only: RAM partitions to read (None = all)
+        workers (int): Crawl dataset only: reader processes (defaults to all cores)
     
     Returns:
         pd.DataFrame: Cleaned dataframe
+
+    Raises:
+        ValueError: If a directory is neither kind of dataset
     """
-    df = pd.read_csv(filename)
-    return clean_dataframe(df)
+    with timer('load'):
+        if os.path.exists(os.path.join(filename, NORMALIZED_MANIFEST)):
+            from normalize import load_dataset
+            if ram_sizes:
+                logger.warning("{} is a normalised dataset without RAM partitions; reading all RAM sizes",
+                               filename)
+            df = load_dataset(filename)
+            if start or end:
+                df = df[df['year'].between(int(start[:4]) if start else 0, int(end[:4]) if end else 9999)]
+        elif os.path.isdir(filename):
+            from dataset import load_dataset
+            # Only the shards of the requested partitions are opened
+            df = load_dataset(filename, start, end, ram_sizes, workers)
+        else:
+            df = pd.read_csv(filename)
+    with timer('clean'):
+        df = clean_dataframe(df)
+    if match_products:
+        from product_matching import add_product_families
+        with timer('match'):
+            df = add_product_families(df)
+    return df
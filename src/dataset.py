@@ -0,0 +1,440 @@
+"""
+Partitioned, sharded dataset of scraped products.
+
+``save_data`` writes one CSV file that concurrent writers cannot share and
+that every reader loads in full. Next to it, products are now written to a
+dataset directory partitioned by crawl date and RAM size:
+
+    data/dataset/
+        crawl_date=2025-06-15/ram_size=8/part-host-4711-a1b2c3-00001.csv
+        crawl_date=2025-06-15/ram_size=16/part-host-4711-a1b2c3-00001.csv
+        _manifests/host-4711-a1b2c3.json
+
+Every writer (a ``DatasetWriter``: one per crawl worker, pipeline or
+``save_data`` caller process) has its own id, names its shards after it and
+keeps its own manifest, so parallel writers never touch the same file and
+need no locks. A shard is written under a temporary name and renamed into
+place, then listed in its writer's manifest (replaced atomically); that
+manifest update commits it. Readers merge the manifests (``read_manifest``)
+and ignore shards no manifest lists, such as those of a writer that died
+between the two steps.
+
+Crawl workers write a page's shards before they acknowledge its lease in the
+work queue, so a worker dying in between leaves shards of a page that another
+worker scrapes again. Such shards carry their lease (URL and token), and
+readers keep them only once a manifest lists the token as acknowledged
+(``DatasetWriter.confirm``): the page's rows are read from the one lease the
+queue accepted.
+
+A product's ``ram_size`` partition is the RAM stated in its name
+(``crawl_planner.ram_from_name``), else the RAM filter of the page it was
+found on, else 'unknown'. Crawl dates follow the rule of the aggregate
+summaries (``aggregates.py``): appended rows add shards to their date, while a
+crawl that replaces its output calls ``DatasetWriter.replace``. Every shard
+names its source (the output a crawl writes, e.g. its CSV file), and the
+replacement lists the date's shards of the same source committed so far;
+readers ignore the listed shards. The list is committed with the run's first
+shard (or by ``finish`` at the end of a run without rows), so a run that
+fails before writing anything hides nothing, and shards of other sources,
+such as crawl workers writing the same day, are never superseded.
+
+``load_dataset`` prunes partitions through the manifest before opening any
+file and reads the remaining shards in parallel processes:
+
+    python src/dataset.py                                # partitions and row counts
+    python src/dataset.py --from 2025-06-01 --ram-sizes 16 32 --head 5
+"""
+
+import argparse
+import json
+import os
+import socket
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+
+import pandas as pd
+from loguru import logger
+
+from config import UNFILTERED
+from crawl_planner import ram_from_name
+from metrics import timer
+from records import RecordBuffer
+
+# Column dtypes of the shards (partition values live in the paths)
+COLUMNS = {
+    'laptops': 'string',
+    'prices': 'float64',
+    'ratings': 'float64',
+    'votes': 'int64'
+}
+
+PARTITION_KEYS = ('crawl_date', 'ram_size')
+
+MANIFEST_DIR = '_manifests'
+
+UNKNOWN_RAM = 'unknown'
+
+
+def partition_path(crawl_date, ram_size):
+    """
+    Args:
+        crawl_date (str): ISO date
+        ram_size (str): RAM size in GB (or 'unknown')
+
+    Returns:
+        str: Partition directory relative to the dataset root
+    """
+    return os.path.join(f'crawl_date={crawl_date}', f'ram_size={ram_size}')
+
+
+def partition_ram_sizes(names, page_ram_size=None):
+    """
+    RAM partition of each product.
+
+    Args:
+        names (iterable): Product names
+        page_ram_size (str): RAM filter of the page the products come from
+            (None or ``UNFILTERED`` if not known)
+
+    Returns:
+        list: RAM size per name
+    """
+    fallback = page_ram_size if page_ram_size and page_ram_size != UNFILTERED else UNKNOWN_RAM
+    return [ram_from_name(name) or fallback for name in names]
+
+
+class DatasetWriter:
+    """
+    Writes shards and commits them through its own manifest.
+    """
+
+    def __init__(self, directory, writer_id=None, crawl_date=None, batch_rows=500, source=None):
+        """
+        Args:
+            directory (str): Dataset root
+            writer_id (str): Name of shards and manifest (default: host, process and a random suffix)
+            crawl_date (str): ISO date of the rows (defaults to today at each write)
+            batch_rows (int): Rows buffered by ``add`` before they are written
+            source (str): Output the rows belong to; ``replace`` only supersedes
+                shards of the same source
+        """
+        self.directory = directory
+        self.writer_id = writer_id or f'{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}'
+        self.crawl_date = crawl_date
+        self.batch_rows = batch_rows
+        self.source = source
+        self.shards = []
+        self.superseded = []
+        self.acked = []
+        self._pending_replace = set()
+        self._sequence = 0
+        self._buffers = {}
+        self._buffered = 0
+        self._manifest_path = os.path.join(directory, MANIFEST_DIR, f'{self.writer_id}.json')
+        if os.path.exists(self._manifest_path):
+            with open(self._manifest_path) as f:
+                manifest = json.load(f)
+            self.shards = manifest['shards']
+            self.superseded = manifest.get('superseded', [])
+            self.acked = manifest.get('acked', [])
+            self._sequence = len(self.shards)
+
+    def replace(self, crawl_date=None):
+        """
+        Supersedes the date's shards of this writer's source, from the next commit on.
+
+        Args:
+            crawl_date (str): ISO date (defaults to the writer's date, else today)
+        """
+        self._pending_replace.add(crawl_date or self.crawl_date or date.today().isoformat())
+
+    def finish(self):
+        """
+        Writes the buffered records and commits a pending replacement even if no rows
+        were written (a run that succeeded without products replaces the date with none).
+        """
+        self.flush()
+        if self._pending_replace:
+            self._commit([])
+
+    def add(self, records, ram_size=None):
+        """
+        Buffers the records of one page; writes once ``batch_rows`` rows are buffered.
+
+        Args:
+            records (iterable): ``LaptopRecord`` objects
+            ram_size (str): RAM filter of the page (see ``partition_ram_sizes``)
+        """
+        records = list(records)
+        for record, partition in zip(records, partition_ram_sizes((r.name for r in records), ram_size)):
+            self._buffers.setdefault(partition, RecordBuffer()).append(record)
+        self._buffered += len(records)
+        if self._buffered >= self.batch_rows:
+            self.flush()
+
+    def flush(self, lease=None):
+        """
+        Writes and commits the buffered records.
+
+        Args:
+            lease (Lease): Work queue lease the buffered page was scraped under
+                (its shards are read once the lease is confirmed)
+
+        Returns:
+            list: Manifest entries of the new shards
+        """
+        buffers, self._buffers, self._buffered = self._buffers, {}, 0
+        frames = [buffer.to_dataframe().assign(ram_size=partition)
+                  for partition, buffer in buffers.items() if len(buffer)]
+        if not frames:
+            return []
+        return self.write(pd.concat(frames, ignore_index=True), lease)
+
+    def confirm(self, tokens):
+        """
+        Records leases as acknowledged by the work queue, making their shards visible.
+
+        Args:
+            tokens (iterable): Tokens of acknowledged leases
+        """
+        new = [token for token in tokens if token not in self.acked]
+        if new:
+            self.acked.extend(new)
+            self._commit([])
+
+    def write(self, df, lease=None):
+        """
+        Writes a frame as one shard per partition and commits them.
+
+        Args:
+            df (pd.DataFrame): Typed rows (``COLUMNS``); an optional ``ram_size``
+                column overrides the RAM partition derived from the names
+            lease (Lease): Work queue lease the rows were scraped under (see ``flush``)
+
+        Returns:
+            list: Manifest entries of the new shards
+        """
+        if not len(df):
+            return []
+        crawl_date = self.crawl_date or date.today().isoformat()
+        if 'ram_size' in df.columns:
+            ram_sizes = df['ram_size'].astype(str)
+        else:
+            ram_sizes = pd.Series(partition_ram_sizes(df['laptops']), index=df.index)
+        entries = []
+        with timer('write'):
+            for ram_size, rows in df[list(COLUMNS)].groupby(ram_sizes, sort=True):
+                entries.append(self._write_shard(rows, crawl_date, ram_size, lease))
+            self._commit(entries)
+        logger.debug("Dataset: {} rows committed in {} shards ({})", len(df), len(entries), self.writer_id)
+        return entries
+
+    def _write_shard(self, rows, crawl_date, ram_size, lease=None):
+        self._sequence += 1
+        relative = os.path.join(partition_path(crawl_date, ram_size),
+                                f'part-{self.writer_id}-{self._sequence:05d}.csv')
+        target = os.path.join(self.directory, relative)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        temp_file = f'{target}.tmp'
+        rows.to_csv(temp_file, index=False)
+        os.replace(temp_file, target)
+        entry = {
+            'path': relative,
+            'crawl_date': crawl_date,
+            'ram_size': ram_size,
+            'rows': len(rows),
+            'bytes': os.path.getsize(target),
+            'source': self.source
+        }
+        if lease is not None:
+            entry['lease'] = {'url': lease.url, 'token': lease.token}
+        return entry
+
+    def _commit(self, entries):
+        if self._pending_replace:
+            # Listed in the same manifest update as the replacing run's first shards
+            dates, self._pending_replace = self._pending_replace, set()
+            self.superseded.extend(shard['path'] for shard in read_manifest(self.directory)
+                                   if shard['crawl_date'] in dates and shard.get('source') == self.source)
+            logger.debug("Dataset: crawl dates {} of {} replaced ({})", sorted(dates), self.source, self.writer_id)
+        self.shards.extend(entries)
+        os.makedirs(os.path.dirname(self._manifest_path), exist_ok=True)
+        temp_file = self._manifest_path + '.tmp'
+        with open(temp_file, 'w') as f:
+            json.dump({'writer': self.writer_id, 'updated': datetime.now().isoformat(),
+                       'columns': COLUMNS, 'shards': self.shards, 'superseded': self.superseded,
+                       'acked': self.acked}, f)
+        os.replace(temp_file, self._manifest_path)
+
+
+_writers = {}
+
+
+def get_writer(directory, crawl_date=None, source=None):
+    """
+    Process-wide writer of a dataset (shard numbering continues across calls).
+
+    Args:
+        directory (str): Dataset root
+        crawl_date (str): ISO date of the rows (None = today)
+        source (str): Output the rows belong to (see ``DatasetWriter``)
+
+    Returns:
+        DatasetWriter: Writer of this process
+    """
+    key = (directory, crawl_date, source)
+    if key not in _writers:
+        _writers[key] = DatasetWriter(directory, crawl_date=crawl_date, source=source)
+    return _writers[key]
+
+
+def _merge_manifests(directory):
+    """All writers' shard entries, superseded shard paths and acknowledged lease tokens."""
+    shards = []
+    superseded = set()
+    acked = set()
+    manifest_dir = os.path.join(directory, MANIFEST_DIR)
+    if os.path.isdir(manifest_dir):
+        for name in sorted(os.listdir(manifest_dir)):
+            if name.endswith('.json'):
+                with open(os.path.join(manifest_dir, name)) as f:
+                    manifest = json.load(f)
+                shards.extend(manifest['shards'])
+                superseded.update(manifest.get('superseded', ()))
+                acked.update(manifest.get('acked', ()))
+    return shards, superseded, acked
+
+
+def read_manifest(directory):
+    """
+    Committed shards of all writers, without those superseded by a replacement
+    or written under a lease that is not confirmed as acknowledged.
+
+    Args:
+        directory (str): Dataset root
+
+    Returns:
+        list: Manifest entries (path, crawl_date, ram_size, rows, bytes, source, lease)
+    """
+    shards, superseded, acked = _merge_manifests(directory)
+    return [shard for shard in shards if shard['path'] not in superseded
+            and ('lease' not in shard or shard['lease']['token'] in acked)]
+
+
+def unconfirmed_leases(directory):
+    """
+    Leases of committed shards that no manifest confirms as acknowledged yet.
+
+    Args:
+        directory (str): Dataset root
+
+    Returns:
+        dict: Lease token -> URL
+    """
+    shards, _, acked = _merge_manifests(directory)
+    return {shard['lease']['token']: shard['lease']['url'] for shard in shards
+            if 'lease' in shard and shard['lease']['token'] not in acked}
+
+
+def select_shards(shards, start=None, end=None, ram_sizes=None):
+    """
+    Shards of the partitions a query needs.
+
+    Args:
+        shards (list): Manifest entries
+        start (str): First crawl date (None = the oldest)
+        end (str): Last crawl date (None = the newest)
+        ram_sizes (iterable): RAM sizes to read (None = all)
+
+    Returns:
+        list: Matching entries
+    """
+    ram_sizes = {str(ram_size) for ram_size in ram_sizes} if ram_sizes else None
+    return [shard for shard in shards
+            if (start is None or shard['crawl_date'] >= start)
+            and (end is None or shard['crawl_date'] <= end)
+            and (ram_sizes is None or shard['ram_size'] in ram_sizes)]
+
+
+def _read_shard(job):
+    """Worker: read one shard and add its partition columns."""
+    directory, shard = job
+    df = pd.read_csv(os.path.join(directory, shard['path']), dtype=COLUMNS)
+    return df.assign(crawl_date=shard['crawl_date'], ram_size=shard['ram_size'])
+
+
+def load_dataset(directory, start=None, end=None, ram_sizes=None, workers=None):
+    """
+    Loads the shards of the requested partitions, in parallel processes.
+
+    Args:
+        directory (str): Dataset root
+        start (str): First crawl date (None = the oldest)
+        end (str): Last crawl date (None = the newest)
+        ram_sizes (iterable): RAM sizes to read (None = all)
+        workers (int): Processes (defaults to all cores; 1 = read in this process)
+
+    Returns:
+        pd.DataFrame: ``COLUMNS`` plus ``crawl_date`` and ``ram_size``
+
+    Raises:
+        ValueError: If ``directory`` holds no dataset manifests
+    """
+    if not os.path.isdir(os.path.join(directory, MANIFEST_DIR)):
+        raise ValueError(f"{directory} is not a partitioned dataset (no {MANIFEST_DIR}/ directory)")
+    shards = read_manifest(directory)
+    selected = select_shards(shards, start, end, ram_sizes)
+    logger.info("Dataset {}: reading {} of {} shards ({} rows)", directory, len(selected), len(shards),
+                sum(shard['rows'] for shard in selected))
+    jobs = [(directory, shard) for shard in selected]
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            frames = list(executor.map(_read_shard, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+    else:
+        frames = [_read_shard(job) for job in jobs]
+    if not frames:
+        columns = dict(COLUMNS, crawl_date='string', ram_size='string')
+        return pd.DataFrame({name: pd.Series(dtype=dtype) for name, dtype in columns.items()})
+    return pd.concat(frames, ignore_index=True)
+
+
+def partition_summary(shards):
+    """
+    Args:
+        shards (list): Manifest entries
+
+    Returns:
+        pd.DataFrame: Shards, rows and bytes per (crawl_date, ram_size)
+    """
+    if not shards:
+        return pd.DataFrame(columns=['shards', 'rows', 'bytes'])
+    return (pd.DataFrame(shards).groupby(list(PARTITION_KEYS))
+            .agg(shards=('path', 'size'), rows=('rows', 'sum'), bytes=('bytes', 'sum')))
+
+
+def main():
+    """
+    Command-line entry point: list the partitions, or load a selection of them.
+    """
+    from config import get_config
+
+    parser = argparse.ArgumentParser(description='Inspect or query the partitioned product dataset')
+    parser.add_argument('directory', nargs='?', default=get_config()['dataset_dir'])
+    parser.add_argument('--from', dest='start', help='First crawl date (YYYY-MM-DD)')
+    parser.add_argument('--to', dest='end', help='Last crawl date (YYYY-MM-DD)')
+    parser.add_argument('--ram-sizes', nargs='+', help='RAM partitions to read')
+    parser.add_argument('--workers', type=int, help='Reader processes (default: all cores)')
+    parser.add_argument('--head', type=int, help='Load the selection and print its first rows')
+    args = parser.parse_args()
+
+    shards = select_shards(read_manifest(args.directory), args.start, args.end, args.ram_sizes)
+    logger.info(f"\n{partition_summary(shards)}")
+    if args.head is not None:
+        df = load_dataset(args.directory, args.start, args.end, args.ram_sizes, args.workers)
+        logger.info(f"{len(df)} rows\n{df.head(args.head)}")
+
+
+if __name__ == '__main__':
+    main()
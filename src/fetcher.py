@@ -0,0 +1,665 @@
+"""
+HTTP fetch layer with latency-aware timeouts, retries and hedged requests.
+
+- Timeouts are derived per host from a rolling latency window
+  (p99 x ``timeout_multiplier``), falling back to ``config['timeout']`` until
+  enough samples exist.
+- Failed requests (connection errors, timeouts, 429 and 5xx) are retried with
+  full-jitter exponential backoff, honouring ``Retry-After``.
+- Optionally, when a request is still running after the host's p95, a hedged
+  duplicate is sent and whichever answers first wins.
+- Requests go through the transport of ``config['transport']``: a new
+  HTTP/1.1 connection per request ('http1'), reused HTTP/1.1 connections
+  ('keepalive') or HTTP/2 through httpx ('http2'), which multiplexes
+  concurrent requests over one connection.
+
+Retries and hedges are extra load on the site, so both draw from a retry
+budget that only grows with normal requests (``retry_budget_ratio`` extra
+requests per request). They also take their turn in the process-wide
+``RequestSpacer``: no request of any kind (first attempt, retry, hedge or an
+escalated browser load) starts less than ``request_interval`` seconds after
+the previous one.
+"""
+
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from random import uniform
+from time import sleep, perf_counter, monotonic
+from urllib.parse import urlsplit
+
+from requests import Session
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from loguru import logger
+
+from metrics import registry
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# Bytes read per chunk when a body is streamed into a parser
+STREAM_CHUNK_SIZE = 16384
+
+# Threads of the hedging pool; started on demand, so the cap only has to exceed
+# the attempts in flight (two per fetching thread) for none to queue
+HEDGE_POOL_SIZE = 64
+
+# Duration of the last connection set-up (DNS lookup + TCP/TLS connect) on this thread
+_connect_timing = threading.local()
+
+
+def _connection_opened(seconds):
+    _connect_timing.seconds = seconds
+    registry.counter('fetch_connections_total', 'Connections opened (DNS + TCP/TLS set-up)').inc()
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        started = perf_counter()
+        super().connect()
+        _connection_opened(perf_counter() - started)
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        started = perf_counter()
+        super().connect()
+        _connection_opened(perf_counter() - started)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class TimingHTTPAdapter(HTTPAdapter):
+    """
+    Transport adapter whose connections record their connect time,
+    so DNS/connect can be separated from time-to-first-byte.
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _TimedHTTPConnectionPool,
+            'https': _TimedHTTPSConnectionPool
+        }
+
+
+def timed_session():
+    """
+    Creates a requests Session instrumented with ``TimingHTTPAdapter``.
+
+    Returns:
+        requests.Session: Session whose connect times are recorded
+    """
+    session = Session()
+    adapter = TimingHTTPAdapter()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def fetch_timed(session, url, headers, timeout, sink_factory=None, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Fetches a URL and records connect, time-to-first-byte and download stages.
+
+    With a ``sink_factory``, a successful body is not read into one string:
+    its decoded chunks are fed to a new sink (e.g. ``StreamingPageParser``)
+    as they arrive, so parsing overlaps the transfer. The time spent in the
+    sink is recorded as the 'parse' stage and excluded from 'download'.
+
+    Args:
+        session (requests.Session): Session from ``timed_session()``
+        url (str): URL to fetch
+        headers (dict): Request headers
+        timeout (float): Request timeout in seconds
+        sink_factory (function): Creates an object with ``feed(str)`` and ``close()``
+        chunk_size (int): Bytes per streamed chunk
+
+    Returns:
+        tuple: (response, body text), or (response, closed sink) when a sink
+               was requested and the status is 200
+    """
+    _connect_timing.seconds = 0.0
+    started = perf_counter()
+    response = session.get(url, headers=headers, timeout=timeout, stream=True)
+    headers_received = perf_counter()
+
+    connect = _connect_timing.seconds
+    registry.observe_stage('connect', connect)
+    registry.observe_stage('ttfb', headers_received - started - connect)
+
+    if sink_factory is not None and response.status_code == 200 and response.encoding is None:
+        # No charset header: requests would guess from the complete body, which a stream never has
+        response.encoding = 'utf-8'
+    body = _read_body(response, lambda: response.text,
+                      lambda: response.iter_content(chunk_size, decode_unicode=True),
+                      sink_factory, headers_received)
+    return response, body
+
+
+def _read_body(response, read_text, iter_text, sink_factory, headers_received):
+    """
+    Reads a response body as text, or streams it into a new sink (see ``fetch_timed``).
+
+    Args:
+        response: Response whose headers have been received
+        read_text (function): Returns the complete body text
+        iter_text (function): Returns an iterator of decoded body chunks
+        sink_factory (function): Creates the sink, or None to read the text
+        headers_received (float): ``perf_counter()`` when the headers arrived
+
+    Returns:
+        str or sink: Body text, or the closed sink for a streamed 200 response
+    """
+    if sink_factory is None or response.status_code != 200:
+        body = read_text()
+        registry.observe_stage('download', perf_counter() - headers_received)
+    else:
+        body = sink_factory()
+        parsing = 0.0
+        for chunk in iter_text():
+            fed = perf_counter()
+            body.feed(chunk)
+            parsing += perf_counter() - fed
+        fed = perf_counter()
+        body.close()
+        parsing += perf_counter() - fed
+        registry.observe_stage('parse', parsing)
+        registry.observe_stage('download', perf_counter() - headers_received - parsing)
+    registry.counter('scrape_responses_total', 'HTTP responses by status code',
+                     status=response.status_code).inc()
+    return body
+
+
+class RequestsTransport:
+    """
+    HTTP/1.1 through requests: a new connection per request, or kept-alive
+    connections reused by later requests of the same thread.
+    """
+
+    def __init__(self, keep_alive=False):
+        """
+        Args:
+            keep_alive (bool): Reuse connections (one pooled session per thread)
+        """
+        self.keep_alive = keep_alive
+        self.name = 'keepalive' if keep_alive else 'http1'
+        self._local = threading.local()
+        self._sessions = []
+        self._lock = threading.Lock()
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = timed_session()
+            with self._lock:
+                self._sessions.append(session)
+        return session
+
+    def fetch(self, url, headers, timeout, sink_factory=None):
+        """
+        Args:
+            url (str): URL to fetch
+            headers (dict): Request headers
+            timeout (float): Request timeout in seconds
+            sink_factory (function): Stream a successful body into a new sink
+
+        Returns:
+            tuple: (response, body text or closed sink), see ``fetch_timed``
+        """
+        if self.keep_alive:
+            return fetch_timed(self._session(), url, headers, timeout, sink_factory)
+        session = timed_session()
+        try:
+            return fetch_timed(session, url, headers, timeout, sink_factory)
+        finally:
+            session.close()
+
+    def close(self):
+        """
+        Closes the kept-alive connections.
+        """
+        with self._lock:
+            sessions, self._sessions = self._sessions, []
+        for session in sessions:
+            session.close()
+
+
+# Connection-specific headers are not allowed in HTTP/2
+_HOP_BY_HOP_HEADERS = {'connection', 'keep-alive', 'proxy-connection', 'transfer-encoding', 'upgrade'}
+
+
+class HTTPXTransport:
+    """
+    HTTP/2 through httpx (optional dependency, ``pip install 'httpx[http2]'``).
+
+    One client is shared by all threads, so concurrent requests to the host
+    are multiplexed as streams over a single connection, with HPACK-compressed
+    headers, instead of each needing its own connection. HTTP/2 is negotiated
+    through TLS (ALPN); plain ``http://`` URLs such as the mock server's stay
+    on HTTP/1.1 over the client's pooled connections.
+    """
+
+    name = 'http2'
+
+    def __init__(self, max_connections=10):
+        """
+        Args:
+            max_connections (int): Connection pool limit of the client
+
+        Raises:
+            ImportError: If httpx or its h2 extra is not installed
+        """
+        import httpx
+        import h2  # noqa: F401  (httpx only negotiates HTTP/2 with it installed)
+
+        self.client = httpx.Client(http2=True, follow_redirects=True,
+                                   limits=httpx.Limits(max_connections=max_connections))
+
+    def fetch(self, url, headers, timeout, sink_factory=None, chunk_size=STREAM_CHUNK_SIZE):
+        """
+        Args:
+            url (str): URL to fetch
+            headers (dict): Request headers
+            timeout (float): Request timeout in seconds
+            sink_factory (function): Stream a successful body into a new sink
+            chunk_size (int): Characters per streamed chunk
+
+        Returns:
+            tuple: (httpx.Response, body text or closed sink)
+        """
+        connect = {}
+
+        def trace(event, info):
+            # httpcore connection events: TCP connect and TLS handshake, only on new connections
+            if event in ('connection.connect_tcp.started', 'connection.start_tls.started'):
+                connect[event.rsplit('.', 2)[1]] = perf_counter()
+            elif event in ('connection.connect_tcp.complete', 'connection.start_tls.complete'):
+                step = event.rsplit('.', 2)[1]
+                connect[step] = perf_counter() - connect[step]
+
+        headers = {key: value for key, value in headers.items() if key.lower() not in _HOP_BY_HOP_HEADERS}
+        started = perf_counter()
+        with self.client.stream('GET', url, headers=headers, timeout=timeout,
+                                extensions={'trace': trace}) as response:
+            headers_received = perf_counter()
+            seconds = connect.get('connect_tcp', 0.0) + connect.get('start_tls', 0.0)
+            if 'connect_tcp' in connect:
+                _connection_opened(seconds)
+            registry.observe_stage('connect', seconds)
+            registry.observe_stage('ttfb', headers_received - started - seconds)
+
+            def read_text():
+                response.read()
+                return response.text
+
+            body = _read_body(response, read_text, lambda: response.iter_text(chunk_size),
+                              sink_factory, headers_received)
+        registry.counter('fetch_http_version_total', 'Responses by HTTP version',
+                         version=response.http_version).inc()
+        return response, body
+
+    def close(self):
+        """
+        Closes the client and its connection.
+        """
+        self.client.close()
+
+
+TRANSPORTS = ('http1', 'keepalive', 'http2')
+
+
+def make_transport(name):
+    """
+    Creates the transport selected by ``config['transport']``.
+
+    Args:
+        name (str): 'http1' (new connection per request), 'keepalive'
+            (reused HTTP/1.1 connections) or 'http2' (multiplexed, needs httpx[http2])
+
+    Returns:
+        RequestsTransport or HTTPXTransport: Transport; 'http2' falls back to
+            'keepalive' with a warning when httpx[http2] is not installed
+    """
+    if name not in TRANSPORTS:
+        raise ValueError(f"Unknown transport '{name}' (expected one of {TRANSPORTS})")
+    if name == 'http2':
+        try:
+            return HTTPXTransport()
+        except ImportError as e:
+            logger.warning("HTTP/2 transport unavailable ({}); using kept-alive HTTP/1.1 connections. "
+                           "Install it with: pip install 'httpx[http2]'", e)
+            name = 'keepalive'
+    return RequestsTransport(keep_alive=name == 'keepalive')
+
+
+class LatencyTracker:
+    """
+    Rolling window of request latencies per host.
+    """
+
+    def __init__(self, window=200):
+        """
+        Args:
+            window (int): Samples kept per host
+        """
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, host, seconds):
+        """
+        Add one latency sample for ``host``.
+        """
+        with self._lock:
+            self._samples.setdefault(host, deque(maxlen=self.window)).append(seconds)
+
+    def count(self, host):
+        """
+        Returns:
+            int: Number of samples held for ``host``
+        """
+        return len(self._samples.get(host, ()))
+
+    def quantile(self, host, q):
+        """
+        Nearest-rank quantile of the window.
+
+        Args:
+            host (str): Host name
+            q (float): Quantile in [0, 1]
+
+        Returns:
+            float: Latency in seconds, or None without samples
+        """
+        with self._lock:
+            samples = sorted(self._samples.get(host, ()))
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+class RetryBudget:
+    """
+    Token bucket bounding retries and hedges to a fraction of normal traffic.
+    """
+
+    def __init__(self, ratio=0.2, initial=3.0, maximum=10.0):
+        """
+        Args:
+            ratio (float): Tokens earned per normal request
+            initial (float): Tokens available at start
+            maximum (float): Bucket capacity
+        """
+        self.ratio = ratio
+        self.maximum = maximum
+        self.tokens = initial
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        """
+        Credit one normal request.
+        """
+        with self._lock:
+            self.tokens = min(self.maximum, self.tokens + self.ratio)
+
+    def withdraw(self):
+        """
+        Take one token for a retry or hedge.
+
+        Returns:
+            bool: False if the budget is exhausted
+        """
+        with self._lock:
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                return True
+            return False
+
+
+class RequestSpacer:
+    """
+    Minimum spacing between the starts of all requests of this process.
+    """
+
+    def __init__(self, interval=0.0):
+        """
+        Args:
+            interval (float): Seconds between two request starts
+        """
+        self.interval = interval
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def pending(self):
+        """
+        Returns:
+            float: Seconds until the next free slot
+        """
+        with self._lock:
+            return max(0.0, self._next - monotonic())
+
+    def wait(self):
+        """
+        Reserves the next slot and sleeps until it starts.
+
+        Returns:
+            float: Seconds waited
+        """
+        with self._lock:
+            now = monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            registry.observe_stage('request_spacing', delay)
+            sleep(delay)
+        return delay
+
+
+def _close_response(future):
+    """Done callback releasing the connection of a hedged attempt that lost."""
+    if not future.cancelled() and future.exception() is None:
+        response, _ = future.result()
+        response.close()
+
+
+class FetchError(Exception):
+    """
+    Raised when a URL could not be fetched after all retries.
+    """
+
+
+class Fetcher:
+    """
+    Fetches pages with adaptive timeouts, retries and optional hedging.
+    """
+
+    def __init__(self, config):
+        """
+        Args:
+            config (dict): Configuration dictionary
+        """
+        self.tracker = LatencyTracker()
+        self.budget = RetryBudget(config.get('retry_budget_ratio', 0.2))
+        self.spacer = RequestSpacer()
+        self._executor = ThreadPoolExecutor(max_workers=HEDGE_POOL_SIZE, thread_name_prefix='fetch')
+        self.transport = None
+        self.transport_setting = None
+        self.configure(config)
+
+    def configure(self, config):
+        """
+        Apply fetch settings from the configuration.
+
+        Args:
+            config (dict): Configuration dictionary
+        """
+        self.default_timeout = config.get('timeout', 30)
+        self.timeout_multiplier = config.get('timeout_multiplier', 3.0)
+        self.min_timeout = config.get('min_timeout', 2.0)
+        self.min_samples = config.get('latency_min_samples', 20)
+        self.max_retries = config.get('max_retries', 3)
+        self.backoff_base = config.get('backoff_base', 1.0)
+        self.backoff_max = config.get('backoff_max', 30.0)
+        self.hedge = config.get('hedge_requests', False)
+        self.budget.ratio = config.get('retry_budget_ratio', 0.2)
+        interval = config.get('request_interval')
+        self.spacer.interval = interval if interval is not None else config.get('sleep_min', 0)
+
+        transport = config.get('transport', 'http1')
+        if transport != self.transport_setting:
+            if self.transport is not None:
+                self.transport.close()
+            self.transport = make_transport(transport)
+            self.transport_setting = transport
+
+    def timeout_for(self, host):
+        """
+        Request timeout for ``host``: p99 x multiplier, clamped to [min_timeout, timeout].
+
+        Args:
+            host (str): Host name
+
+        Returns:
+            float: Timeout in seconds
+        """
+        if self.tracker.count(host) < self.min_samples:
+            return self.default_timeout
+        p99 = self.tracker.quantile(host, 0.99)
+        return max(self.min_timeout, min(self.default_timeout, p99 * self.timeout_multiplier))
+
+    def backoff(self, attempt, response=None):
+        """
+        Full-jitter exponential backoff, at least the server's ``Retry-After``.
+
+        Args:
+            attempt (int): Zero-based retry number
+            response: Failed response, if any
+
+        Returns:
+            float: Seconds to wait
+        """
+        delay = uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if response is not None and response.headers.get('Retry-After', '').isdigit():
+            delay = max(delay, float(response.headers['Retry-After']))
+        return delay
+
+    def _attempt(self, host, url, headers, timeout, sink_factory=None, started_event=None):
+        if started_event is not None:
+            started_event.set()
+        started = perf_counter()
+        response, body = self.transport.fetch(url, headers, timeout, sink_factory)
+        if response.status_code not in RETRYABLE_STATUS:
+            self.tracker.record(host, perf_counter() - started)
+        return response, body
+
+    def _hedged_attempt(self, host, url, headers, timeout, sink_factory=None):
+        p95 = self.tracker.quantile(host, 0.95)
+        started = threading.Event()
+        primary = self._executor.submit(self._attempt, host, url, headers, timeout, sink_factory, started)
+        # The p95 runs from the request's start, not from its submission to the pool
+        started.wait()
+        # The hedge is a request like any other: not before the next slot of the spacer
+        done, _ = wait([primary], timeout=max(p95, self.spacer.pending()))
+        if done or not self.budget.withdraw():
+            return primary.result()
+        self.spacer.wait()
+
+        registry.counter('fetch_hedges_total', 'Hedged duplicate requests sent').inc()
+        logger.debug("Hedging request after {:.2f}s (p95): {}", p95, url[:80])
+        hedge = self._executor.submit(self._attempt, host, url, headers, timeout, sink_factory)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        registry.counter('fetch_hedge_wins_total', 'Hedged requests answering first').inc()
+                    for loser in pending:
+                        loser.add_done_callback(_close_response)
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def fetch(self, url, headers, sink_factory=None):
+        """
+        Fetch ``url``, retrying transient failures.
+
+        Args:
+            url (str): URL to fetch
+            headers (dict): Request headers
+            sink_factory (function): Stream successful bodies into a new sink
+                per attempt (see ``fetch_timed``)
+
+        Returns:
+            tuple: (response, body text or closed sink) of the last attempt; the
+                   response may still carry an error status if retries ran out
+
+        Raises:
+            FetchError: If every attempt failed without a response
+        """
+        host = urlsplit(url).netloc
+        self.budget.deposit()
+        last_error = None
+
+        for attempt in range(self.max_retries + 1):
+            timeout = self.timeout_for(host)
+            response = None
+            self.spacer.wait()
+            try:
+                if self.hedge and self.tracker.count(host) >= self.min_samples:
+                    response, body = self._hedged_attempt(host, url, headers, timeout, sink_factory)
+                else:
+                    response, body = self._attempt(host, url, headers, timeout, sink_factory)
+                if response.status_code not in RETRYABLE_STATUS:
+                    return response, body
+                last_error = f'status {response.status_code}'
+            except Exception as e:
+                last_error = e
+
+            if attempt == self.max_retries or not self.budget.withdraw():
+                break
+            delay = self.backoff(attempt, response)
+            registry.counter('fetch_retries_total', 'Retried requests').inc()
+            logger.info("Retry {}/{} in {:.1f}s after {} (timeout {:.1f}s)",
+                        attempt + 1, self.max_retries, delay, last_error, timeout)
+            registry.observe_stage('retry_backoff', delay)
+            sleep(delay)
+
+        if response is not None:
+            return response, body
+        raise FetchError(f'{url[:80]}: {last_error}')
+
+
+_fetcher = None
+_fetcher_lock = threading.Lock()
+
+
+def get_fetcher(config):
+    """
+    Returns the process-wide ``Fetcher``, configured from ``config``.
+
+    The fetcher is shared so latency history and the retry budget carry over
+    between pages and runs in the same process.
+
+    Args:
+        config (dict): Configuration dictionary
+
+    Returns:
+        Fetcher: Shared fetcher
+    """
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is None:
+            _fetcher = Fetcher(config)
+        else:
+            _fetcher.configure(config)
+        return _fetcher
@@ -0,0 +1,181 @@
+"""
+Class selectors of the product fields and their per-field match counters.
+
+The extractors locate the name, price and rating of a product through
+build-hashed class names (``productItemName_3IZ3c``). When the site is
+redeployed the hash suffix changes and every lookup silently fails, so the
+selectors are resolved through an extraction strategy:
+
+- 'exact': the class names as captured (fast, the default);
+- 'prefix': any class starting with the stable part of the name
+  (``productItemName_``), which survives a new build hash.
+
+``canary.py`` picks the strategy before a crawl; the extractors
+(``scraper.py``, ``scraper_selenium.py``, ``stream_parser.py``) read it
+through ``class_filter`` / ``token_matcher`` and report, per product
+container, which fields they found (``count_container``), so match rates
+are available in the run metrics while the crawl is running.
+"""
+
+from loguru import logger
+
+from metrics import registry
+
+# Hashed class of each product field, as captured from the live site
+FIELD_CLASSES = {
+    'name': 'productItemName_3IZ3c',
+    'price': 'style-module_screenReaderOnly__4QmbS',
+    'fallback_price': 'style-module_price__ql4Q1',
+    'rating': 'style-module_reviewCountContainer__HQlM5'
+}
+
+STRATEGIES = ('exact', 'prefix')
+
+# Fields whose hit rates are counted (a fallback price counts as a price hit)
+MATCHED_FIELDS = ('name', 'price', 'rating')
+
+CONTAINERS_METRIC = 'extract_containers_total'
+FIELD_METRIC = 'extract_field_hits_total'
+
+_strategy = 'exact'
+
+
+def stable_prefix(class_name):
+    """
+    Part of a hashed class name that stays the same across builds.
+
+    Args:
+        class_name (str): Hashed class name
+
+    Returns:
+        str: Name up to and including its last underscore
+
+    Example:
+        >>> stable_prefix('style-module_screenReaderOnly__4QmbS')
+        'style-module_screenReaderOnly__'
+    """
+    return class_name[:class_name.rindex('_') + 1]
+
+
+def _prefix_filter(prefix):
+    return lambda value: value is not None and value.startswith(prefix)
+
+
+def _prefix_tokens(prefix):
+    return lambda classes: any(name.startswith(prefix) for name in classes)
+
+
+def _exact_tokens(class_name):
+    return lambda classes: class_name in classes
+
+
+# Precomputed per strategy, so extraction does not build a closure per lookup
+_FILTERS = {
+    'exact': dict(FIELD_CLASSES),
+    'prefix': {field: _prefix_filter(stable_prefix(name)) for field, name in FIELD_CLASSES.items()}
+}
+_TOKEN_MATCHERS = {
+    'exact': {field: _exact_tokens(name) for field, name in FIELD_CLASSES.items()},
+    'prefix': {field: _prefix_tokens(stable_prefix(name)) for field, name in FIELD_CLASSES.items()}
+}
+
+
+def get_strategy():
+    """
+    Returns:
+        str: Extraction strategy in use
+    """
+    return _strategy
+
+
+def set_strategy(strategy):
+    """
+    Selects the extraction strategy of all extractors in this process.
+
+    Args:
+        strategy (str): One of ``STRATEGIES``
+    """
+    global _strategy
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown extraction strategy '{strategy}' (expected one of {STRATEGIES})")
+    _strategy = strategy
+
+
+def class_filter(field, strategy=None):
+    """
+    BeautifulSoup ``class_`` argument matching a field's element.
+
+    Args:
+        field (str): Key of ``FIELD_CLASSES``
+        strategy (str): Strategy to use (None = the current one)
+
+    Returns:
+        str or function: Class name or predicate on a class value
+
+    Example:
+        >>> container.find('h3', class_=class_filter('name'))
+    """
+    return _FILTERS[strategy or _strategy][field]
+
+
+def token_matcher(field, strategy=None):
+    """
+    Predicate on an element's list of classes (used by the streaming parser).
+
+    Args:
+        field (str): Key of ``FIELD_CLASSES``
+        strategy (str): Strategy to use (None = the current one)
+
+    Returns:
+        function: ``matches(classes) -> bool``
+    """
+    return _TOKEN_MATCHERS[strategy or _strategy][field]
+
+
+def count_container(name, price, rating):
+    """
+    Records which fields were found in one product container.
+
+    Args:
+        name (bool): Name element found
+        price (bool): Price element (or fallback price) found
+        rating (bool): Rating and review count found
+    """
+    registry.counter(CONTAINERS_METRIC, 'Product containers seen by the extractors').inc()
+    for field, found in (('name', name), ('price', price), ('rating', rating)):
+        if found:
+            registry.counter(FIELD_METRIC, 'Product containers in which a field was found', field=field).inc()
+
+
+def field_rates():
+    """
+    Match rate of each field over the containers counted so far.
+
+    Returns:
+        dict: ``containers`` count and the hit rate (0-1) of each of ``MATCHED_FIELDS``
+    """
+    containers = registry.counter(CONTAINERS_METRIC).value
+    rates = {'containers': containers}
+    for field in MATCHED_FIELDS:
+        hits = registry.counter(FIELD_METRIC, field=field).value
+        rates[field] = hits / containers if containers else 0.0
+    return rates
+
+
+def format_rates(rates):
+    """
+    Args:
+        rates (dict): Output of ``field_rates`` or ``canary.measure_fields``
+
+    Returns:
+        str: e.g. ``'24 containers | name 100.0%, price 100.0%, rating 79.2%'``
+    """
+    fields = ', '.join(f"{field} {rates[field]:.1%}" for field in MATCHED_FIELDS)
+    return f"{rates['containers']} containers | {fields}"
+
+
+def log_field_rates():
+    """
+    Logs the run's field match rates (strategy included).
+    """
+    logger.info("Field match rates ({} selectors): {}", _strategy, format_rates(field_rates()))
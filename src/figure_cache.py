@@ -0,0 +1,254 @@
+"""
+On-disk cache of rendered figures, keyed by what they are drawn from.
+
+``visualize_data`` used to redraw all of its figures on every run, although
+the CSV behind them rarely changes between two invocations of
+``visualize_existing_data.py``. Each figure is now stored as a PNG named by
+a content hash of:
+
+- the values of the columns the figure plots (``pd.util.hash_pandas_object``);
+- the source code of the module defining the function drawing it, so an
+  edited plot, or an edited helper it calls, is redrawn;
+- the style settings (``visualizer.STYLE``, matplotlib version, DPI).
+
+An unchanged figure is served from its PNG without running the plotting
+code; only figures whose inputs changed are rendered (and stored). The
+cache is bounded by ``figure_cache_max_mb``: after each store the least
+recently used files (by modification time, refreshed on every hit) are
+evicted until it fits.
+
+Hashing the data needs the data, which can take longer to load and prepare
+(cleaning, product matching) than to plot. A whole run is therefore also
+recorded under a ``run_key`` computed before anything is loaded: the
+input file's (or directory's) size and modification times, the run's
+parameters and the source of the modules preparing and plotting the data.
+A run whose key is recorded and whose figures are all still cached is
+replayed without loading anything.
+
+    cache = get_figure_cache(config)
+    path = cache.get(key) or cache.put(key, fig)
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import threading
+
+import pandas as pd
+from loguru import logger
+
+from metrics import registry
+
+
+def source_digest(modules):
+    """
+    Hash of the source code of ``modules``.
+
+    Args:
+        modules (list): Modules (or functions and classes, hashed with their module)
+
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256()
+    for module in modules:
+        module = inspect.getmodule(module)
+        digest.update(f"{module.__name__}\x1f".encode('utf-8'))
+        digest.update(inspect.getsource(module).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def run_key(path, params, modules, style):
+    """
+    Key of a whole visualisation run, computed without reading the data.
+
+    Args:
+        path (str): Input file, or directory (every file below it counts)
+        params (dict): Run parameters changing what is loaded (JSON-serialisable)
+        modules (list): Modules loading, preparing and plotting the data
+        style (dict): Style settings applied to the figures
+
+    Returns:
+        str: Hex digest
+
+    Raises:
+        FileNotFoundError: If ``path`` does not exist
+    """
+    if os.path.isdir(path):
+        files = sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+    else:
+        files = [path]
+    stats = []
+    for name in files:
+        stat = os.stat(name)
+        stats.append((os.path.relpath(name, path) if name != path else name, stat.st_size, stat.st_mtime_ns))
+    digest = hashlib.sha256()
+    digest.update(json.dumps([stats, params, style], sort_keys=True, default=str).encode('utf-8'))
+    digest.update(source_digest(modules).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def figure_key(df, columns, plot_func, style):
+    """
+    Content hash identifying one rendered figure.
+
+    Args:
+        df (pd.DataFrame): Data the figure is drawn from
+        columns (list): Columns the figure reads (the others do not affect it)
+        plot_func (function): Function drawing the figure (its whole module is hashed,
+            so helpers it calls there are covered)
+        style (dict): Style settings applied to the figure (JSON-serialisable)
+
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256()
+    digest.update(f"{plot_func.__module__}.{plot_func.__qualname__}\x1f".encode('utf-8'))
+    digest.update(source_digest([plot_func]).encode('utf-8'))
+    digest.update(json.dumps(style, sort_keys=True, default=str).encode('utf-8'))
+    digest.update(json.dumps(list(columns)).encode('utf-8'))
+    # Row order matters to some plots (scatter overdraw), so the index-free row hashes are hashed in order
+    digest.update(pd.util.hash_pandas_object(df[list(columns)], index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+class FigureCache:
+    """
+    Directory of PNG files named by ``figure_key``, bounded in size (least recently used out).
+    """
+
+    def __init__(self, directory, max_bytes=50 * 2 ** 20, dpi=100):
+        """
+        Args:
+            directory (str): Cache directory
+            max_bytes (int): Size the cache is trimmed to after each store
+            dpi (int): Resolution of stored figures
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.dpi = dpi
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, f'{key}.png')
+
+    def get(self, key):
+        """
+        Looks a figure up and marks it as recently used.
+
+        Args:
+            key (str): ``figure_key`` of the figure
+
+        Returns:
+            str: PNG path, or None if the figure is not cached
+        """
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            registry.counter('figure_cache_misses_total', 'Figures rendered because they were not cached').inc()
+            return None
+        registry.counter('figure_cache_hits_total', 'Figures served from the figure cache').inc()
+        return path
+
+    def put(self, key, fig):
+        """
+        Stores a rendered figure (atomically), then evicts down to ``max_bytes``.
+
+        Args:
+            key (str): ``figure_key`` of the figure
+            fig (matplotlib.figure.Figure): Rendered figure
+
+        Returns:
+            str: PNG path
+        """
+        path = self.path(key)
+        temp_file = f'{path}.{os.getpid()}.tmp'
+        fig.savefig(temp_file, format='png', dpi=self.dpi, bbox_inches='tight')
+        os.replace(temp_file, path)
+        self.evict()
+        return path
+
+    def get_run(self, key):
+        """
+        Looks a recorded run up.
+
+        Args:
+            key (str): ``run_key`` of the run
+
+        Returns:
+            dict: Run entry ('figures': PNG paths in order, 'report': logged
+                statistics), or None unless the run and all its figures are cached
+        """
+        try:
+            with open(os.path.join(self.directory, f'{key}.run.json')) as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        paths = [self.get(figure) for figure in entry['figures']]
+        if None in paths:
+            return None
+        return dict(entry, figures=paths)
+
+    def put_run(self, key, figures, report):
+        """
+        Records the figures of a run (atomically).
+
+        Args:
+            key (str): ``run_key`` of the run
+            figures (list): ``figure_key`` of each figure, in display order
+            report (str): Statistics logged by the run
+        """
+        path = os.path.join(self.directory, f'{key}.run.json')
+        temp_file = f'{path}.{os.getpid()}.tmp'
+        with open(temp_file, 'w') as f:
+            json.dump({'figures': figures, 'report': report}, f)
+        os.replace(temp_file, path)
+
+    def evict(self):
+        """
+        Deletes the least recently used figures until the cache fits in ``max_bytes``.
+
+        Returns:
+            int: Number of files deleted
+        """
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith('.png'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            deleted = 0
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                deleted += 1
+        if deleted:
+            logger.debug("Figure cache: evicted {} figures ({:.1f} MB kept)", deleted, total / 2 ** 20)
+        return deleted
+
+
+def get_figure_cache(config):
+    """
+    Figure cache named by ``config['figure_cache_dir']``.
+
+    Args:
+        config (dict): Configuration dictionary
+
+    Returns:
+        FigureCache: Cache, or None if figure caching is disabled
+    """
+    directory = config.get('figure_cache_dir')
+    if not directory:
+        return None
+    return FigureCache(directory,
+                       max_bytes=int(config.get('figure_cache_max_mb', 50) * 2 ** 20),
+                       dpi=config.get('figure_dpi', 100))
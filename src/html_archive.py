@@ -0,0 +1,497 @@
+"""
+Compressed, deduplicated archive of raw fetched HTML for offline replay.
+
+Every fetched page body is split into content-defined chunks (boundaries
+depend only on the bytes around them, so an inserted product card only
+changes the chunks it touches). Chunks are stored once, addressed by their
+hash, and compressed with zstd using a dictionary trained on earlier chunks
+(listing pages are mostly identical markup). Without the ``zstandard``
+package, zlib with a preset dictionary built the same way is used instead.
+
+Pages are indexed by URL and fetch time:
+
+    python src/html_archive.py stats
+    python src/html_archive.py history "<url>"
+    python src/html_archive.py show "<url>" --at 2025-06-01T12:00 > page.html
+    python src/html_archive.py train
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from collections import Counter, OrderedDict
+from datetime import datetime
+from time import time
+
+from loguru import logger
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from metrics import timer
+
+# Chunk boundary candidates: ends of tags, lines, script statements and JSON members
+_BOUNDARY = re.compile(rb'[>\n;},]')
+
+
+def chunk_boundaries(data, min_size=2048, avg_bits=6, max_size=65536, window=48):
+    """
+    Content-defined chunk end offsets of ``data``.
+
+    A candidate position (after ``>``, newline, ``;``, ``}`` or ``,``) ends a
+    chunk when the CRC of the ``window`` bytes before it has its low
+    ``avg_bits`` bits clear. Candidates are hashed instead of every byte to
+    keep this fast in Python; on Best Buy markup (a candidate every ~60 bytes)
+    chunks average about 5 KB. Chunks never exceed ``max_size``.
+
+    Args:
+        data (bytes): Page body
+        min_size (int): Smallest chunk (except the last)
+        avg_bits (int): Mask bits controlling the average chunk size
+        max_size (int): Largest chunk
+        window (int): Bytes hashed before each candidate
+
+    Returns:
+        list: Increasing end offsets, the last one ``len(data)``
+    """
+    mask = (1 << avg_bits) - 1
+    ends = []
+    start = 0
+    crc32 = zlib.crc32
+    for match in _BOUNDARY.finditer(data):
+        end = match.end()
+        while end - start > max_size:
+            start += max_size
+            ends.append(start)
+        if end - start < min_size:
+            continue
+        if crc32(data[end - window:end]) & mask == 0:
+            ends.append(end)
+            start = end
+    while len(data) - start > max_size:
+        start += max_size
+        ends.append(start)
+    if start < len(data) or not ends:
+        ends.append(len(data))
+    return ends
+
+
+def chunk_hash(chunk):
+    """
+    Returns:
+        bytes: Content address of a chunk
+    """
+    return hashlib.blake2b(chunk, digest_size=20).digest()
+
+
+def build_zlib_dictionary(samples, size=32768):
+    """
+    Preset dictionary for zlib from the most frequent markup segments.
+
+    zlib finds matches closest to the end of the dictionary cheapest, so the
+    most frequent segments are placed last.
+
+    Args:
+        samples (list): Chunk bytes to learn from
+        size (int): Dictionary size (zlib uses at most 32 KB)
+
+    Returns:
+        bytes: Dictionary
+    """
+    counts = Counter()
+    for sample in samples:
+        counts.update(segment for segment in re.split(rb'(?<=>)', sample) if 8 <= len(segment) <= 512)
+    picked, total = [], 0
+    for segment, count in counts.most_common():
+        if count < 2 or total + len(segment) > size:
+            continue
+        picked.append(segment)
+        total += len(segment)
+    return b''.join(reversed(picked))
+
+
+class HtmlArchive:
+    """
+    Content-addressed store of page bodies with a URL/timestamp index.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS dictionaries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            codec TEXT NOT NULL,
+            data BLOB NOT NULL,
+            created_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS chunks (
+            hash BLOB PRIMARY KEY,
+            codec TEXT NOT NULL,
+            dict_id INTEGER REFERENCES dictionaries (id),
+            raw_size INTEGER NOT NULL,
+            data BLOB NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS pages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            url TEXT NOT NULL,
+            fetched_at REAL NOT NULL,
+            status INTEGER,
+            size INTEGER NOT NULL,
+            content_hash BLOB NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS pages_url_time ON pages (url, fetched_at);
+        CREATE INDEX IF NOT EXISTS pages_time ON pages (fetched_at);
+        CREATE TABLE IF NOT EXISTS page_chunks (
+            page_id INTEGER NOT NULL REFERENCES pages (id),
+            position INTEGER NOT NULL,
+            chunk_hash BLOB NOT NULL,
+            PRIMARY KEY (page_id, position)
+        ) WITHOUT ROWID;
+    """
+
+    def __init__(self, path, level=9, train_after=256, cache_chunks=4096):
+        """
+        Open (and create if needed) the archive database.
+
+        Args:
+            path (str): SQLite file path
+            level (int): Compression level
+            train_after (int): Chunks stored without a dictionary before one is trained
+            cache_chunks (int): Decompressed chunks kept in memory for replay
+        """
+        self.path = path
+        self.level = level
+        self.train_after = train_after
+        self.cache_chunks = cache_chunks
+        self.codec = 'zstd' if zstandard is not None else 'zlib'
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(self.SCHEMA)
+        self._lock = threading.RLock()
+        self._dictionaries = {}
+        self._chunk_cache = OrderedDict()
+        self.dict_id = self._latest_dictionary()
+
+    # -- compression ---------------------------------------------------------
+
+    def _latest_dictionary(self):
+        row = self.conn.execute(
+            'SELECT MAX(id) FROM dictionaries WHERE codec = ?', (self.codec,)
+        ).fetchone()
+        return row[0]
+
+    def _dictionary(self, dict_id):
+        if dict_id not in self._dictionaries:
+            codec, data = self.conn.execute(
+                'SELECT codec, data FROM dictionaries WHERE id = ?', (dict_id,)
+            ).fetchone()
+            if codec == 'zstd':
+                self._dictionaries[dict_id] = zstandard.ZstdCompressionDict(data)
+            else:
+                self._dictionaries[dict_id] = data
+        return self._dictionaries[dict_id]
+
+    def _compress(self, chunk):
+        if self.codec == 'zstd':
+            dictionary = self._dictionary(self.dict_id) if self.dict_id else None
+            return zstandard.ZstdCompressor(level=self.level, dict_data=dictionary).compress(chunk)
+        if self.dict_id:
+            compressor = zlib.compressobj(self.level, zdict=self._dictionary(self.dict_id))
+        else:
+            compressor = zlib.compressobj(self.level)
+        return compressor.compress(chunk) + compressor.flush()
+
+    def _decompress(self, codec, dict_id, data):
+        if codec == 'zstd':
+            if zstandard is None:
+                raise RuntimeError('Archive chunk needs the zstandard package')
+            dictionary = self._dictionary(dict_id) if dict_id else None
+            return zstandard.ZstdDecompressor(dict_data=dictionary).decompress(data)
+        if dict_id:
+            decompressor = zlib.decompressobj(zdict=self._dictionary(dict_id))
+        else:
+            decompressor = zlib.decompressobj()
+        return decompressor.decompress(data) + decompressor.flush()
+
+    def train_dictionary(self, sample_limit=2000, size=65536):
+        """
+        Trains a new dictionary from recently stored chunks.
+
+        Chunks written afterwards use it; existing chunks keep theirs.
+
+        Args:
+            sample_limit (int): Most recent chunks to learn from
+            size (int): Dictionary size in bytes (zlib uses at most 32 KB)
+
+        Returns:
+            int: New dictionary id, or None if there are too few samples
+        """
+        with self._lock:
+            rows = self.conn.execute(
+                'SELECT codec, dict_id, data FROM chunks ORDER BY rowid DESC LIMIT ?', (sample_limit,)
+            ).fetchall()
+            samples = [self._decompress(codec, dict_id, data) for codec, dict_id, data in rows]
+            if len(samples) < 8:
+                return None
+            if self.codec == 'zstd':
+                try:
+                    data = zstandard.train_dictionary(size, samples).as_bytes()
+                except zstandard.ZstdError as e:
+                    logger.warning("Dictionary training failed: {}", e)
+                    return None
+            else:
+                data = build_zlib_dictionary(samples, min(size, 32768))
+            cursor = self.conn.execute(
+                'INSERT INTO dictionaries (codec, data, created_at) VALUES (?, ?, ?)',
+                (self.codec, data, time())
+            )
+            self.conn.commit()
+            self.dict_id = cursor.lastrowid
+            logger.info("Trained {} archive dictionary #{} ({} bytes, {} samples)",
+                        self.codec, self.dict_id, len(data), len(samples))
+            return self.dict_id
+
+    # -- writing -------------------------------------------------------------
+
+    def put(self, url, body, fetched_at=None, status=200):
+        """
+        Archives one fetched page body.
+
+        Args:
+            url (str): Page URL
+            body (str or bytes): Page body
+            fetched_at (float): Fetch timestamp (defaults to now)
+            status (int): HTTP status, if known
+
+        Returns:
+            int: Page id
+        """
+        data = body.encode('utf-8') if isinstance(body, str) else body
+        fetched_at = time() if fetched_at is None else fetched_at
+
+        with timer('archive'), self._lock:
+            start = 0
+            hashes = []
+            new_chunks = []
+            for end in chunk_boundaries(data):
+                chunk = data[start:end]
+                start = end
+                digest = chunk_hash(chunk)
+                hashes.append(digest)
+                if digest not in self._chunk_cache and self.conn.execute(
+                        'SELECT 1 FROM chunks WHERE hash = ?', (digest,)).fetchone() is None:
+                    new_chunks.append((digest, self.codec, self.dict_id, len(chunk), self._compress(chunk)))
+
+            self.conn.executemany('INSERT OR IGNORE INTO chunks VALUES (?, ?, ?, ?, ?)', new_chunks)
+            cursor = self.conn.execute(
+                'INSERT INTO pages (url, fetched_at, status, size, content_hash) VALUES (?, ?, ?, ?, ?)',
+                (url, fetched_at, status, len(data), chunk_hash(data))
+            )
+            page_id = cursor.lastrowid
+            self.conn.executemany(
+                'INSERT INTO page_chunks (page_id, position, chunk_hash) VALUES (?, ?, ?)',
+                [(page_id, position, digest) for position, digest in enumerate(hashes)]
+            )
+            self.conn.commit()
+
+            if self.dict_id is None and self.train_after:
+                stored = self.conn.execute('SELECT COUNT(*) FROM chunks').fetchone()[0]
+                if stored >= self.train_after:
+                    self.train_dictionary()
+
+        return page_id
+
+    # -- reading -------------------------------------------------------------
+
+    def _chunk(self, digest):
+        cached = self._chunk_cache.get(digest)
+        if cached is not None:
+            self._chunk_cache.move_to_end(digest)
+            return cached
+        codec, dict_id, data = self.conn.execute(
+            'SELECT codec, dict_id, data FROM chunks WHERE hash = ?', (digest,)
+        ).fetchone()
+        chunk = self._decompress(codec, dict_id, data)
+        self._chunk_cache[digest] = chunk
+        if len(self._chunk_cache) > self.cache_chunks:
+            self._chunk_cache.popitem(last=False)
+        return chunk
+
+    def get_page(self, page_id):
+        """
+        Reassembles an archived body.
+
+        Args:
+            page_id (int): Page id
+
+        Returns:
+            str: Page HTML
+        """
+        with self._lock:
+            digests = [row[0] for row in self.conn.execute(
+                'SELECT chunk_hash FROM page_chunks WHERE page_id = ? ORDER BY position', (page_id,)
+            )]
+            return b''.join(self._chunk(digest) for digest in digests).decode('utf-8')
+
+    def find(self, url, at=None):
+        """
+        Id of the latest capture of ``url`` at or before ``at``.
+
+        Args:
+            url (str): Page URL
+            at (float): Timestamp (defaults to now)
+
+        Returns:
+            int: Page id, or None if never captured by then
+        """
+        row = self.conn.execute(
+            'SELECT id FROM pages WHERE url = ? AND fetched_at <= ? ORDER BY fetched_at DESC LIMIT 1',
+            (url, time() if at is None else at)
+        ).fetchone()
+        return row[0] if row else None
+
+    def get(self, url, at=None):
+        """
+        Body of the latest capture of ``url`` at or before ``at``.
+
+        Returns:
+            str: Page HTML, or None if never captured by then
+        """
+        page_id = self.find(url, at)
+        return self.get_page(page_id) if page_id is not None else None
+
+    def history(self, url):
+        """
+        Returns:
+            list: (page_id, fetched_at, status, size) of every capture of ``url``
+        """
+        return self.conn.execute(
+            'SELECT id, fetched_at, status, size FROM pages WHERE url = ? ORDER BY fetched_at', (url,)
+        ).fetchall()
+
+    def iter_pages(self, since=None, until=None):
+        """
+        Captures in fetch order, for replaying extraction over the archive.
+
+        Args:
+            since (float): Earliest fetch timestamp
+            until (float): Latest fetch timestamp
+
+        Returns:
+            list: (page_id, url, fetched_at) tuples
+        """
+        return self.conn.execute(
+            'SELECT id, url, fetched_at FROM pages WHERE fetched_at >= ? AND fetched_at <= ? ORDER BY fetched_at, id',
+            (since or 0, until if until is not None else float('inf'))
+        ).fetchall()
+
+    def stats(self):
+        """
+        Returns:
+            dict: Page and chunk counts, raw and stored bytes and the overall ratio
+        """
+        pages, raw_bytes = self.conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages').fetchone()
+        chunks, stored_bytes = self.conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM chunks').fetchone()
+        dictionary_bytes = self.conn.execute(
+            'SELECT COALESCE(SUM(LENGTH(data)), 0) FROM dictionaries').fetchone()[0]
+        stored_bytes += dictionary_bytes
+        return {
+            'codec': self.codec,
+            'pages': pages,
+            'chunks': chunks,
+            'raw_bytes': raw_bytes,
+            'stored_bytes': stored_bytes,
+            'ratio': round(raw_bytes / stored_bytes, 1) if stored_bytes else 0.0
+        }
+
+    def close(self):
+        """
+        Close the database connection.
+        """
+        self.conn.close()
+
+
+_archive = None
+_archive_lock = threading.Lock()
+
+
+def get_archive(config):
+    """
+    Returns the process-wide archive named by ``config['archive_path']``.
+
+    Args:
+        config (dict): Configuration dictionary
+
+    Returns:
+        HtmlArchive: Shared archive, or None if archiving is disabled
+    """
+    global _archive
+    path = config.get('archive_path')
+    if not path:
+        return None
+    with _archive_lock:
+        if _archive is None or _archive.path != path:
+            _archive = HtmlArchive(path, level=config.get('archive_level', 9))
+        return _archive
+
+
+def archive_page(config, url, body, status=200):
+    """
+    Archives a fetched body if archiving is enabled; never raises.
+
+    Args:
+        config (dict): Configuration dictionary
+        url (str): Page URL
+        body (str): Page body
+        status (int): HTTP status
+    """
+    try:
+        archive = get_archive(config)
+        if archive is not None:
+            archive.put(url, body, status=status)
+    except Exception as e:
+        logger.warning("Could not archive {}: {}", url[:80], e)
+
+
+def main():
+    """
+    Command-line entry point: stats, history, show or train.
+    """
+    from config import get_config
+
+    parser = argparse.ArgumentParser(description='Inspect the raw HTML archive')
+    parser.add_argument('command', choices=['stats', 'history', 'show', 'train'])
+    parser.add_argument('url', nargs='?')
+    parser.add_argument('--at', help='ISO timestamp for show (default: latest)')
+    parser.add_argument('--archive', help='Archive database (default: config archive_path)')
+    args = parser.parse_args()
+
+    archive = HtmlArchive(args.archive or get_config()['archive_path'])
+    try:
+        if args.command == 'stats':
+            logger.info("Archive {} | {}", archive.path, archive.stats())
+        elif args.command == 'train':
+            archive.train_dictionary()
+        elif args.command == 'history':
+            for page_id, fetched_at, status, size in archive.history(args.url):
+                print(f'{page_id}\t{datetime.fromtimestamp(fetched_at).isoformat()}\t{status}\t{size}')
+        else:
+            at = datetime.fromisoformat(args.at).timestamp() if args.at else None
+            body = archive.get(args.url, at)
+            if body is None:
+                logger.error("No capture of {}", args.url)
+            else:
+                print(body)
+    finally:
+        archive.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,291 @@
+"""
+Tiered page fetching: plain HTTP first, a real browser only when needed.
+
+Each page is fetched with the cheap ``scraper.scrape_page`` path. Only when
+the static HTML holds no product containers (content rendered by JavaScript)
+is the page loaded again in the Selenium engine; containers whose fields do
+not match are an extraction problem that rendering would not fix. Which tier
+worked is remembered per URL pattern (host, path and query parameter names),
+so once a listing is known to need rendering its pages go straight to the
+browser, with an occasional HTTP probe in case the static HTML starts
+carrying the products again. An empty HTTP page only counts as a miss when
+the browser finds products on it, so empty pages past a listing's end never
+move a pattern to the browser. The browser is only started on the first
+escalation.
+"""
+
+import json
+import os
+from urllib.parse import urlsplit, parse_qsl
+
+from loguru import logger
+
+from fetcher import get_fetcher
+from metrics import registry
+from scraper import CrawlRun, extract_fetched_page, fetch_page, has_product_containers
+
+HTTP = 'http'
+BROWSER = 'browser'
+
+
+def url_pattern(url):
+    """
+    Reduces a URL to the pattern its tier is remembered under.
+
+    Args:
+        url (str): Page URL
+
+    Returns:
+        str: ``host/path?name&name`` with query values dropped
+
+    Example:
+        >>> url_pattern('https://www.bestbuy.ca/en-ca/category/windows-laptops/36711?page=2&path=x')
+        'www.bestbuy.ca/en-ca/category/windows-laptops/36711?page&path'
+    """
+    parts = urlsplit(url)
+    names = sorted({name for name, _ in parse_qsl(parts.query, keep_blank_values=True)})
+    return f"{parts.netloc}{parts.path}?{'&'.join(names)}"
+
+
+class TierMemory:
+    """
+    Persistent per-pattern record of which fetch tier yields products.
+    """
+
+    def __init__(self, state_file=None, escalate_after=2, probe_every=10):
+        """
+        Args:
+            state_file (str): JSON file to persist to (None = in memory only)
+            escalate_after (int): Consecutive empty HTTP pages before a pattern
+                is served by the browser directly
+            probe_every (int): Browser pages between two HTTP probes
+        """
+        self.state_file = state_file
+        self.escalate_after = escalate_after
+        self.probe_every = probe_every
+        self.state = {}
+        if state_file and os.path.exists(state_file):
+            with open(state_file) as f:
+                self.state = json.load(f)
+
+    def _entry(self, pattern):
+        return self.state.setdefault(pattern, {'tier': HTTP, 'http_misses': 0, 'since_probe': 0})
+
+    def first_tier(self, pattern):
+        """
+        Tier to try first for a page of ``pattern``.
+
+        Args:
+            pattern (str): URL pattern
+
+        Returns:
+            str: 'http' or 'browser'
+        """
+        entry = self._entry(pattern)
+        if entry['tier'] == BROWSER and entry['since_probe'] < self.probe_every:
+            return BROWSER
+        return HTTP
+
+    def record(self, pattern, tier, found_products):
+        """
+        Record the outcome of one fetch.
+
+        Args:
+            pattern (str): URL pattern
+            tier (str): Tier that was used
+            found_products (bool): Whether the tier yielded products
+        """
+        entry = self._entry(pattern)
+        if tier == HTTP:
+            entry['since_probe'] = 0
+            if found_products:
+                entry['http_misses'] = 0
+                entry['tier'] = HTTP
+            else:
+                entry['http_misses'] += 1
+                if entry['http_misses'] >= self.escalate_after:
+                    entry['tier'] = BROWSER
+        elif found_products:
+            entry['since_probe'] += 1
+
+    def save(self):
+        """
+        Persist the tier memory (atomically replaces the state file).
+        """
+        if not self.state_file:
+            return
+        os.makedirs(os.path.dirname(self.state_file) or '.', exist_ok=True)
+        temp_file = self.state_file + '.tmp'
+        with open(temp_file, 'w') as f:
+            json.dump(self.state, f)
+        os.replace(temp_file, self.state_file)
+
+
+class HybridScraper:
+    """
+    Fetches pages over HTTP and escalates to Selenium for rendered-only pages.
+    """
+
+    def __init__(self, config, headless=True):
+        """
+        Args:
+            config (dict): Configuration dictionary
+            headless (bool): Run the escalation browser headless
+        """
+        self.config = config
+        self.headless = headless
+        self.memory = TierMemory(config.get('tier_memory_file'),
+                                 escalate_after=config.get('tier_escalate_after', 2),
+                                 probe_every=config.get('tier_probe_every', 10))
+        self.browser = None
+        self.browser_failed = False
+
+    def _browser(self):
+        """Starts the Selenium engine on first use (None if it cannot start)."""
+        if self.browser is None and not self.browser_failed:
+            try:
+                # Imported lazily: HTTP-only runs never need selenium installed
+                from scraper_selenium import BestBuySeleniumScraper
+            except ImportError as e:
+                logger.error("Browser tier unavailable ({}), continuing with HTTP only", e)
+                self.browser_failed = True
+                return None
+            browser = BestBuySeleniumScraper(self.config, headless=self.headless)
+            if browser.setup_driver():
+                self.browser = browser
+            else:
+                self.browser_failed = True
+                logger.error("Browser tier unavailable, continuing with HTTP only")
+        return self.browser
+
+    def _fetch_browser(self, url, request_num, start_time):
+        browser = self._browser()
+        if browser is None:
+            return None
+        registry.counter('fetch_tier_total', 'Pages fetched per tier', tier=BROWSER).inc()
+        # An escalation loads the page again right after its HTTP fetch: keep the request spacing
+        get_fetcher(self.config).spacer.wait()
+        return browser.scrape_page(url, request_num, start_time)
+
+    def fetch(self, url, request_num, start_time):
+        """
+        Network half of ``scrape_page``: the HTTP tier, unless the pattern
+        is served by the browser.
+
+        Never touches the browser, so it can run ahead of ``extract`` in
+        another thread (see ``pipeline.py``).
+
+        Args:
+            url (str): URL to scrape
+            request_num (int): Current request number
+            start_time (float): Start time of scraping session
+
+        Returns:
+            str: Page HTML, ``BROWSER`` if the page must be rendered, or None on failure
+        """
+        if self.memory.first_tier(url_pattern(url)) == BROWSER:
+            return BROWSER
+        registry.counter('fetch_tier_total', 'Pages fetched per tier', tier=HTTP).inc()
+        return fetch_page(url, request_num, start_time, self.config)
+
+    def extract(self, url, fetched, request_num, start_time):
+        """
+        Extraction half of ``scrape_page``, escalating pages without product containers to the browser.
+
+        Args:
+            url (str): URL the page was fetched from
+            fetched: Result of ``fetch``
+            request_num (int): Current request number
+            start_time (float): Start time of scraping session
+
+        Returns:
+            list: ``LaptopRecord`` objects, or None if the page failed on every tier
+        """
+        pattern = url_pattern(url)
+
+        if fetched == BROWSER:
+            records = self._fetch_browser(url, request_num, start_time)
+            self.memory.record(pattern, BROWSER, bool(records))
+            if records or self.browser is not None:
+                return records
+            # No browser available: fall back to the static HTML
+            registry.counter('fetch_tier_total', 'Pages fetched per tier', tier=HTTP).inc()
+            fetched = fetch_page(url, request_num, start_time, self.config)
+
+        if fetched is None:
+            # Request failed (status/network); rendering would not help
+            return None
+        records = extract_fetched_page(fetched, request_num)
+        if records is None:
+            return None
+        if records:
+            self.memory.record(pattern, HTTP, True)
+            return records
+        if isinstance(fetched, str) and has_product_containers(fetched):
+            # Products are in the static HTML but their fields did not match: rendering would not help
+            return records
+
+        logger.info('Request #{} | No products in static HTML, escalating to browser', request_num)
+        registry.counter('fetch_escalations_total', 'Pages escalated from HTTP to the browser').inc()
+        rendered = self._fetch_browser(url, request_num, start_time)
+        if rendered:
+            # Only a page the browser proves rendered-only is an HTTP miss (a page past the end is empty in both)
+            self.memory.record(pattern, HTTP, False)
+            self.memory.record(pattern, BROWSER, True)
+        if self.browser is None:
+            # No browser available: the static page is all there is
+            return records
+        return rendered
+
+    def scrape_page(self, url, request_num, start_time):
+        """
+        Fetches a page with the cheapest tier that yields products.
+
+        Args:
+            url (str): URL to scrape
+            request_num (int): Current request number
+            start_time (float): Start time of scraping session
+
+        Returns:
+            list: ``LaptopRecord`` objects, or None if the page failed on every tier
+        """
+        return self.extract(url, self.fetch(url, request_num, start_time), request_num, start_time)
+
+    def close(self):
+        """
+        Closes the browser (if one was started) and saves the tier memory.
+        """
+        if self.browser is not None:
+            self.browser.close_driver()
+            self.browser = None
+        self.memory.save()
+
+    def scrape_all_laptops(self, build_url_func):
+        """
+        Scrapes all planned pages, escalating to the browser per page.
+
+        Args:
+            build_url_func: Function to build URLs
+
+        Returns:
+            RecordBuffer: Extracted records
+        """
+        crawl = CrawlRun(self.config, 'HTTP first, browser on demand')
+        try:
+            return crawl.run(build_url_func, self.scrape_page)
+        finally:
+            self.close()
+
+
+def scrape_all_laptops(config, build_url_func):
+    """
+    Hybrid counterpart of ``scraper.scrape_all_laptops``.
+
+    Args:
+        config (dict): Configuration dictionary
+        build_url_func: Function to build URLs
+
+    Returns:
+        RecordBuffer: Extracted records
+    """
+    return HybridScraper(config).scrape_all_laptops(build_url_func)
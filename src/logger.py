@@ -1,29 +1,254 @@
 """
 Logging configuration module using loguru.
+
+Two modes are available:
+- ``default``: synchronous, human-readable console and file sinks (the original setup)
+- ``fast``: the file sink is queued to a background thread so hot paths never
+  block on disk I/O, and it writes structured JSON records instead of formatted
+  strings. (loguru's own ``enqueue=True`` pickles every record through a
+  multiprocessing queue, which costs the caller more than a synchronous write.)
+
+Hot loops (per product, per container) should log through ``sampled`` so that
+repeated messages are thinned out before loguru ever sees them.
 """
 
+import json
+import os
+import queue
 import sys
+import threading
+from datetime import datetime
+from time import monotonic
 from loguru import logger
 
-# Remove default logger
-logger.remove()
-
-# Add custom logger with formatting
-logger.add(
-    sys.stdout,
-    colorize=True,
-    format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
-    level="INFO"
-)
-
-# Add file logger for persistent logs
-logger.add(
-    "logs/webscraping_{time:YYYY-MM-DD}.log",
-    rotation="500 MB",
-    retention="10 days",
-    compression="zip",
-    format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}",
-    level="DEBUG"
-)
-
-__all__ = ['logger']
+CONSOLE_FORMAT = "<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>"
+FILE_FORMAT = "{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}"
+
+
+class BackgroundJSONSink:
+    """
+    Loguru sink that hands records to a writer thread as JSON lines.
+
+    The logging call only pays for building the record and a queue put;
+    serialisation and file I/O happen on the writer thread. Files are named
+    ``webscraping_<date>.jsonl`` and rotated when they exceed ``max_bytes``.
+    """
+
+    def __init__(self, log_dir='logs', max_bytes=500 * 1024 * 1024):
+        """
+        Start the writer thread.
+
+        Args:
+            log_dir (str): Directory for the JSON log files
+            max_bytes (int): Size at which the current file is rotated
+        """
+        self.log_dir = log_dir
+        self.max_bytes = max_bytes
+        self._queue = queue.SimpleQueue()
+        self._file = None
+        self._path = None
+        self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+        self._thread.start()
+
+    def __call__(self, message):
+        self._queue.put(message.record)
+
+    def drain(self):
+        """
+        Block until every queued record has been written.
+        """
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+
+    def stop(self):
+        """
+        Flush, stop the writer thread and close the file.
+        """
+        self._queue.put(None)
+        self._thread.join()
+        if self._file:
+            self._file.close()
+
+    def _open(self, day):
+        path = os.path.join(self.log_dir, f'webscraping_{day}.jsonl')
+        if self._file:
+            self._file.close()
+        if os.path.exists(path) and os.path.getsize(path) >= self.max_bytes:
+            os.replace(path, path[:-len('.jsonl')] + datetime.now().strftime('.%H%M%S.jsonl'))
+        os.makedirs(self.log_dir, exist_ok=True)
+        self._path = path
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def _run(self):
+        while True:
+            record = self._queue.get()
+            if record is None:
+                return
+            if isinstance(record, threading.Event):
+                if self._file:
+                    self._file.flush()
+                record.set()
+                continue
+
+            day = record['time'].strftime('%Y-%m-%d')
+            if self._path is None or not self._path.endswith(f'{day}.jsonl') or self._file.tell() >= self.max_bytes:
+                self._open(day)
+            self._file.write(json.dumps({
+                'time': record['time'].isoformat(),
+                'level': record['level'].name,
+                'name': record['name'],
+                'function': record['function'],
+                'line': record['line'],
+                'message': record['message'],
+                'extra': record['extra'],
+                'exception': str(record['exception']) if record['exception'] else None
+            }, default=str) + '\n')
+
+
+# Writer thread of the current 'fast' mode file sink, if any
+_background_sink = None
+
+_LEVEL_NUMBERS = {'TRACE': 5, 'DEBUG': 10, 'INFO': 20, 'SUCCESS': 25, 'WARNING': 30, 'ERROR': 40, 'CRITICAL': 50}
+
+# Lowest level accepted by any configured sink
+_min_level = 0
+
+
+def setup_logging(mode='default', console_level='INFO', file_level='DEBUG', log_dir='logs'):
+    """
+    (Re)configures the loguru sinks.
+
+    Args:
+        mode (str): 'default' for synchronous text sinks, 'fast' for queued
+            sinks with a JSON file sink
+        console_level (str): Minimum level printed to stdout
+        file_level (str): Minimum level written to the log file
+        log_dir (str): Directory for the log files
+    """
+    global _background_sink, _min_level
+    if mode not in ('default', 'fast'):
+        raise ValueError(f"Unknown logging mode: {mode}")
+
+    # Remove default logger (and any sinks from a previous call)
+    logger.remove()
+    if _background_sink is not None:
+        _background_sink.stop()
+        _background_sink = None
+
+    _min_level = min(logger.level(console_level).no, logger.level(file_level).no)
+
+    # Add custom logger with formatting
+    logger.add(
+        sys.stdout,
+        colorize=True,
+        format=CONSOLE_FORMAT,
+        level=console_level
+    )
+
+    if mode == 'fast':
+        # Structured JSON records, written off the calling thread
+        _background_sink = BackgroundJSONSink(log_dir)
+        logger.add(_background_sink, format="{message}", level=file_level, catch=True)
+        return
+
+    # Add file logger for persistent logs
+    logger.add(
+        f"{log_dir}/webscraping_{{time:YYYY-MM-DD}}.log",
+        rotation="500 MB",
+        retention="10 days",
+        compression="zip",
+        format=FILE_FORMAT,
+        level=file_level
+    )
+
+
+def flush_logging():
+    """
+    Wait until queued log records have reached disk (no-op in default mode).
+    """
+    logger.complete()
+    if _background_sink is not None:
+        _background_sink.drain()
+
+
+class LogSampler:
+    """
+    Thins out repeated log messages from hot loops.
+
+    For each key, the first ``first`` occurrences are logged, then one in every
+    ``every``, and never more than one per ``interval`` seconds. Logged records
+    carry the number of suppressed occurrences in ``extra['suppressed']``.
+    Arguments are only formatted when a record is actually emitted.
+    """
+
+    def __init__(self, first=5, every=100, interval=1.0):
+        """
+        Initialize the sampler.
+
+        Args:
+            first (int): Occurrences always logged per key
+            every (int): Afterwards, log one occurrence out of ``every``
+            interval (float): Minimum seconds between two records of the same key
+        """
+        self.first = first
+        self.every = every
+        self.interval = interval
+        self._counts = {}
+        self._last = {}
+        self._suppressed = {}
+        self._lock = threading.Lock()
+
+    def log(self, level, key, message, *args, **fields):
+        """
+        Log ``message`` unless this occurrence of ``key`` is sampled out.
+
+        Args:
+            level (str): Loguru level name
+            key (str): Identifies the kind of message (e.g. 'missing_price')
+            message (str): Message with ``{}`` placeholders, formatted lazily
+            *args: Placeholder values
+            **fields: Structured fields bound to the record
+
+        Returns:
+            bool: True if the record was emitted
+        """
+        return self._log(level, key, message, args, fields, depth=2)
+
+    def _log(self, level, key, message, args, fields, depth):
+        # Cheap early exit when no sink accepts this level
+        if _LEVEL_NUMBERS.get(level, 0) < _min_level:
+            return False
+
+        with self._lock:
+            count = self._counts.get(key, 0) + 1
+            self._counts[key] = count
+            if count > self.first:
+                if count % self.every or monotonic() - self._last.get(key, 0.0) < self.interval:
+                    self._suppressed[key] = self._suppressed.get(key, 0) + 1
+                    return False
+            self._last[key] = monotonic()
+            suppressed = self._suppressed.pop(key, 0)
+
+        logger.opt(depth=depth).bind(key=key, suppressed=suppressed, **fields).log(level, message, *args)
+        return True
+
+    def debug(self, key, message, *args, **fields):
+        """Sampled ``logger.debug``."""
+        return self._log('DEBUG', key, message, args, fields, depth=2)
+
+    def info(self, key, message, *args, **fields):
+        """Sampled ``logger.info``."""
+        return self._log('INFO', key, message, args, fields, depth=2)
+
+    def warning(self, key, message, *args, **fields):
+        """Sampled ``logger.warning``."""
+        return self._log('WARNING', key, message, args, fields, depth=2)
+
+
+# Shared sampler for the extraction loops
+sampled = LogSampler()
+
+setup_logging()
+
+__all__ = ['logger', 'setup_logging', 'flush_logging', 'LogSampler', 'sampled']
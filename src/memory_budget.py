@@ -0,0 +1,171 @@
+"""
+Memory budget that throttles concurrent page processing.
+
+Pages in flight (browser tabs, worker threads) each hold a page in memory, so
+instead of a fixed concurrency the number of pages started is limited by what
+they are estimated to cost: a new page may only start while the pages in
+flight plus the new one stay under ``config['memory_budget_mb']``. A page is
+estimated at ``config['memory_page_factor']`` times the largest recently
+parsed body (``observe_page``, reported by the extraction step), since a
+parse tree takes several times the size of its HTML. One page is always
+allowed, so a crawl never stalls on a budget that is smaller than a single
+page.
+
+RSS is not a usable signal here: the allocator rarely hands freed memory back
+to the OS, so after its first peak a process stays at that RSS and a budget
+below it would admit one page at a time for the rest of the run.
+``process_tree_rss`` is kept for reporting (``profiling.py``).
+"""
+
+import os
+import threading
+from collections import deque
+
+from loguru import logger
+
+from metrics import registry
+
+# Body size assumed until the first page has been parsed
+DEFAULT_PAGE_BYTES = 2 * 2 ** 20
+
+# Sizes of the last parsed page bodies (appends are atomic; shared by all threads)
+_recent_pages = deque(maxlen=20)
+
+
+def process_tree_rss(root_pid):
+    """
+    Resident memory of a process and all its descendants (Linux /proc).
+
+    Args:
+        root_pid (int): Root process id
+
+    Returns:
+        int: Summed VmRSS in bytes (0 where /proc is unavailable)
+    """
+    children = {}
+    rss = {}
+    for entry in os.listdir('/proc') if os.path.isdir('/proc') else ():
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/status') as f:
+                fields = dict(line.split(':', 1) for line in f if ':' in line)
+        except OSError:
+            continue
+        pid = int(entry)
+        children.setdefault(int(fields.get('PPid', '0').strip()), []).append(pid)
+        rss[pid] = int(fields.get('VmRSS', '0 kB').split()[0]) * 1024
+
+    total, stack = 0, [root_pid]
+    while stack:
+        pid = stack.pop()
+        total += rss.get(pid, 0)
+        stack.extend(children.get(pid, ()))
+    return total
+
+
+def observe_page(size):
+    """
+    Reports the size of a page body about to be parsed.
+
+    Args:
+        size (int): Body size in bytes (characters of the HTML)
+    """
+    _recent_pages.append(size)
+    registry.histogram('page_body_bytes', 'Size of parsed page bodies',
+                       buckets=tuple(2 ** n * 2 ** 10 for n in range(4, 16))).observe(size)
+
+
+def page_size_estimate():
+    """
+    Returns:
+        int: Largest of the recently parsed page bodies in bytes (``DEFAULT_PAGE_BYTES`` before any)
+    """
+    return max(list(_recent_pages), default=DEFAULT_PAGE_BYTES)
+
+
+class MemoryBudget:
+    """
+    Admits new in-flight pages while their estimated memory stays under a limit.
+    """
+
+    def __init__(self, limit_mb=None, page_factor=10):
+        """
+        Args:
+            limit_mb (float): Memory limit in MB for the pages in flight (None = unlimited)
+            page_factor (float): Memory of a page in flight per byte of its body
+        """
+        self.limit = limit_mb * 2 ** 20 if limit_mb else None
+        self.page_factor = page_factor
+        self.in_flight = 0
+        self._condition = threading.Condition()
+
+    def page_cost(self):
+        """
+        Returns:
+            float: Estimated memory of one page in flight, in bytes
+        """
+        return self.page_factor * page_size_estimate()
+
+    def has_room(self):
+        """
+        Returns:
+            bool: True if another page may start now
+        """
+        if self.limit is None or self.in_flight == 0:
+            return True
+        return (self.in_flight + 1) * self.page_cost() <= self.limit
+
+    def acquire(self, block=True, poll=0.2):
+        """
+        Reserve room for one more in-flight page.
+
+        Args:
+            block (bool): Wait for room instead of returning False
+            poll (float): Seconds between checks while waiting
+
+        Returns:
+            bool: True once the page may start
+        """
+        with self._condition:
+            waited = False
+            while not self.has_room():
+                if not block:
+                    return False
+                if not waited:
+                    waited = True
+                    registry.counter('memory_budget_waits_total', 'Pages delayed by the memory budget').inc()
+                    logger.debug("Memory budget reached ({} pages in flight at ~{:.0f} MB each), waiting",
+                                 self.in_flight, self.page_cost() / 2 ** 20)
+                self._condition.wait(poll)
+            self.in_flight += 1
+            return True
+
+    def release(self):
+        """
+        A page reserved with ``acquire`` has finished.
+        """
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+
+def memory_budget(config):
+    """
+    Budget configured by ``config['memory_budget_mb']`` and ``config['memory_page_factor']``.
+
+    Args:
+        config (dict): Configuration dictionary
+
+    Returns:
+        MemoryBudget: Budget (unlimited when not configured)
+    """
+    return MemoryBudget(config.get('memory_budget_mb'), config.get('memory_page_factor', 10))
@@ -0,0 +1,349 @@
+"""
+In-process metrics registry for per-stage timings.
+
+Histograms use fixed buckets so they are cheap to update from the scraping
+loops, and the registry can be exported as a JSON run report or in the
+Prometheus text exposition format.
+
+Example:
+    >>> from metrics import registry, timer
+    >>> with timer('parse'):
+    ...     soup = BeautifulSoup(html, 'html.parser')
+    >>> registry.write_report('runs/2025-01-01/report.json')
+"""
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+
+# Seconds; covers sub-millisecond extraction up to slow page loads
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGE_METRIC = 'scrape_stage_seconds'
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels) + list(extra or [])
+    if not items:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in items) + '}'
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram with count, sum, min and max.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        Initialize an empty histogram.
+
+        Args:
+            buckets (tuple): Sorted upper bounds; an implicit +Inf bucket is added
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        """
+        Record one observation.
+
+        Args:
+            value (float): Observed value
+        """
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+            if self.min is None or value < self.min:
+                self.min = value
+            if self.max is None or value > self.max:
+                self.max = value
+
+    def quantile(self, q):
+        """
+        Estimate a quantile by linear interpolation inside the matching bucket.
+
+        Args:
+            q (float): Quantile in [0, 1]
+
+        Returns:
+            float: Estimated value, or None if the histogram is empty
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                lower = max(lower, self.min)
+                upper = min(upper, self.max)
+                fraction = (rank - seen) / bucket_count
+                return lower + (upper - lower) * fraction
+            seen += bucket_count
+        return self.max
+
+    def to_dict(self):
+        """
+        Summary of the histogram for JSON reports.
+
+        Returns:
+            dict: count, sum, mean, min, max, p50/p95/p99 and bucket counts
+        """
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'mean': round(self.sum / self.count, 6) if self.count else None,
+            'min': self.min,
+            'max': self.max,
+            'p50': self.quantile(0.50),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+            'buckets': dict(zip([str(b) for b in self.buckets] + ['+Inf'], self.counts))
+        }
+
+
+class Counter:
+    """
+    Monotonic counter.
+    """
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        """
+        Increase the counter.
+
+        Args:
+            amount (int or float): Increment
+        """
+        with self._lock:
+            self.value += amount
+
+
+class MetricsRegistry:
+    """
+    Registry of named, labelled histograms and counters.
+    """
+
+    def __init__(self):
+        self._histograms = {}
+        self._counters = {}
+        self._help = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def add_stage_listener(self, listener):
+        """
+        Register an object notified when a ``timer`` block starts and ends.
+
+        ``listener.stage_started(stage)`` and ``listener.stage_finished(stage)``
+        run in the thread executing the block (used by ``profiling.py`` to
+        attribute samples to stages).
+
+        Args:
+            listener: Object with ``stage_started`` and ``stage_finished`` methods
+        """
+        with self._lock:
+            self._listeners = self._listeners + [listener]
+
+    def remove_stage_listener(self, listener):
+        """
+        Unregister a listener added with ``add_stage_listener``.
+
+        Args:
+            listener: Registered listener
+        """
+        with self._lock:
+            self._listeners = [item for item in self._listeners if item is not listener]
+
+    def histogram(self, name, help_text='', buckets=DEFAULT_BUCKETS, **labels):
+        """
+        Get or create a histogram.
+
+        Args:
+            name (str): Metric name
+            help_text (str): Description used in the Prometheus output
+            buckets (tuple): Bucket upper bounds (only used on creation)
+            **labels: Label values, e.g. ``stage='parse'``
+
+        Returns:
+            Histogram: The histogram for this name and label set
+        """
+        key = (name, _label_key(labels))
+        metric = self._histograms.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._histograms.setdefault(key, Histogram(buckets))
+                if help_text:
+                    self._help.setdefault(name, help_text)
+        return metric
+
+    def counter(self, name, help_text='', **labels):
+        """
+        Get or create a counter.
+
+        Args:
+            name (str): Metric name
+            help_text (str): Description used in the Prometheus output
+            **labels: Label values
+
+        Returns:
+            Counter: The counter for this name and label set
+        """
+        key = (name, _label_key(labels))
+        metric = self._counters.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._counters.setdefault(key, Counter())
+                if help_text:
+                    self._help.setdefault(name, help_text)
+        return metric
+
+    def observe_stage(self, stage, seconds):
+        """
+        Record a duration for a pipeline stage.
+
+        Args:
+            stage (str): Stage name (connect, ttfb, download, parse, extract, sleep, write, ...)
+            seconds (float): Duration
+        """
+        self.histogram(STAGE_METRIC, 'Time spent per scraping stage', stage=stage).observe(seconds)
+
+    @contextmanager
+    def timer(self, stage):
+        """
+        Context manager timing a block as one observation of ``stage``.
+
+        Args:
+            stage (str): Stage name
+        """
+        # The list is replaced, never mutated, so this snapshot is safe to iterate
+        listeners = self._listeners
+        for listener in listeners:
+            listener.stage_started(stage)
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_stage(stage, perf_counter() - started)
+            for listener in reversed(listeners):
+                listener.stage_finished(stage)
+
+    def reset(self):
+        """
+        Drop all metrics (e.g. between benchmark runs).
+        """
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def to_dict(self):
+        """
+        All metrics as plain data.
+
+        Returns:
+            dict: ``{'histograms': {...}, 'counters': {...}}`` keyed by
+                  ``name{label="value"}``
+        """
+        return {
+            'histograms': {
+                name + _format_labels(labels): metric.to_dict()
+                for (name, labels), metric in sorted(self._histograms.items())
+            },
+            'counters': {
+                name + _format_labels(labels): metric.value
+                for (name, labels), metric in sorted(self._counters.items())
+            }
+        }
+
+    def to_prometheus(self):
+        """
+        Render all metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: Exposition text
+        """
+        lines = []
+        seen = set()
+        for (name, labels), metric in sorted(self._counters.items()):
+            if name not in seen:
+                seen.add(name)
+                if name in self._help:
+                    lines.append(f'# HELP {name} {self._help[name]}')
+                lines.append(f'# TYPE {name} counter')
+            lines.append(f'{name}{_format_labels(labels)} {metric.value}')
+
+        for (name, labels), metric in sorted(self._histograms.items()):
+            if name not in seen:
+                seen.add(name)
+                if name in self._help:
+                    lines.append(f'# HELP {name} {self._help[name]}')
+                lines.append(f'# TYPE {name} histogram')
+            cumulative = 0
+            for bound, bucket_count in zip(list(metric.buckets) + ['+Inf'], metric.counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{_format_labels(labels, [("le", bound)])} {cumulative}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {metric.sum}')
+            lines.append(f'{name}_count{_format_labels(labels)} {metric.count}')
+        return '\n'.join(lines) + '\n'
+
+    def write_report(self, path, run_info=None):
+        """
+        Write a machine-readable JSON run report.
+
+        Args:
+            path (str): Output JSON file
+            run_info (dict): Extra run metadata (engine, totals, timestamps)
+        """
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        report = {'run': run_info or {}}
+        report.update(self.to_dict())
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2, default=str)
+
+    def write_prometheus(self, path):
+        """
+        Write the Prometheus text exposition to a file (e.g. for node_exporter's textfile collector).
+
+        Args:
+            path (str): Output file
+        """
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(self.to_prometheus())
+
+
+# Process-wide default registry used by the scrapers
+registry = MetricsRegistry()
+
+
+def timer(stage):
+    """
+    Time a block as one observation of ``stage`` in the default registry.
+
+    Args:
+        stage (str): Stage name
+    """
+    return registry.timer(stage)
@@ -0,0 +1,495 @@
+"""
+Local mock Best Buy Canada server for offline load testing.
+
+Serves the same URL space as ``config.build_url`` (pages x ``custom0ramsize``
+filters) from product cards templated out of ``debug_page.html``, with
+configurable latency, error and 429 rates. A ``js`` variant ships an empty
+product grid that is filled in by a script, so only a real browser sees products.
+
+Usage:
+    python src/mock_server.py --port 8765 --variant static
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import re
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from time import sleep
+from urllib.parse import urlsplit, parse_qs, unquote
+
+from bs4 import BeautifulSoup
+from loguru import logger
+
+from field_selectors import FIELD_CLASSES, stable_prefix
+
+CATEGORY_PATH = '/en-ca/category/windows-laptops/36711'
+DEFAULT_TEMPLATE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'debug_page.html')
+
+NAME_MARK = '@@NAME@@'
+PRICE_MARK = '@@PRICE@@'
+RATING_MARK = '@@RATING@@'
+REVIEWS_MARK = '@@REVIEWS@@'
+PRODUCTS_MARK = '<!--@@PRODUCTS@@-->'
+COUNT_MARK = '@@COUNT@@'
+
+# The RAM size in a template name ("8GB RAM", "8 GB RAM", "8GB DDR4 RAM", "8GB Memory", "8GB, 256GB SSD")
+RAM_MENTION = re.compile(r'\b\d+(?=\s*GB(?:\s*DDR\d\w*)?\s*(?:RAM|Memory)\b|GB,)')
+
+
+def get_mock_server_config():
+    """
+    Returns default parameters for the mock server.
+
+    Configuration includes:
+    - host/port: Bind address (port 0 picks a free port)
+    - variant: 'static' (products in the HTML) or 'js' (products injected by script)
+    - latency: Response delay distribution, see ``sample_latency``
+    - error_rate: Fraction of requests answered with HTTP 500
+    - rate_429: Fraction of requests answered with HTTP 429 and a Retry-After header
+    - ram_sizes: RAM facets present in the fake catalogue
+    - items_per_ram: Number of products per RAM facet
+    - page_size: Products per page unless the URL asks for ``pageSize``
+    - max_page_size: Largest ``pageSize`` honoured (larger requests are clamped)
+    - js_render_delay: Seconds the js variant waits before injecting products
+    - bandwidth: Bytes per second bodies are sent at, in 16 KB pieces (None = all at once)
+    - handshake_delay: Seconds each new connection waits before its first request is
+      read, like the TCP/TLS round trips to a remote host (keep-alive skips it)
+    - class_hash: Build hash replacing the suffix of the hashed product classes, like a
+      redeploy of the site (None = the captured class names)
+    - seed: Random seed for reproducible catalogues and fault injection
+
+    Returns:
+        dict: Mock server configuration
+    """
+    return {
+        'host': '127.0.0.1',
+        'port': 0,
+        'variant': 'static',
+        'latency': {'distribution': 'lognormal', 'median': 0.05, 'sigma': 0.5},
+        'error_rate': 0.0,
+        'rate_429': 0.0,
+        'ram_sizes': ['8', '12', '16', '32'],
+        'items_per_ram': 480,
+        'page_size': 24,
+        'max_page_size': 100,
+        'js_render_delay': 0.2,
+        'bandwidth': None,
+        'handshake_delay': 0.0,
+        'class_hash': None,
+        'seed': 42,
+        'template': DEFAULT_TEMPLATE
+    }
+
+
+def sample_latency(latency, rng):
+    """
+    Draws one response delay in seconds.
+
+    Supported distributions:
+    - fixed: ``{'distribution': 'fixed', 'value': 0.1}``
+    - uniform: ``{'distribution': 'uniform', 'low': 0.05, 'high': 0.2}``
+    - exponential: ``{'distribution': 'exponential', 'mean': 0.1}``
+    - lognormal: ``{'distribution': 'lognormal', 'median': 0.05, 'sigma': 0.5}``
+
+    Args:
+        latency (dict or None): Distribution parameters
+        rng (random.Random): Random generator
+
+    Returns:
+        float: Delay in seconds
+    """
+    if not latency:
+        return 0.0
+
+    distribution = latency.get('distribution', 'fixed')
+    if distribution == 'fixed':
+        return latency.get('value', 0.0)
+    if distribution == 'uniform':
+        return rng.uniform(latency.get('low', 0.0), latency.get('high', 0.0))
+    if distribution == 'exponential':
+        return rng.expovariate(1.0 / latency['mean']) if latency.get('mean') else 0.0
+    if distribution == 'lognormal':
+        return rng.lognormvariate(math.log(latency['median']), latency.get('sigma', 0.5))
+    raise ValueError(f"Unknown latency distribution: {distribution}")
+
+
+def parse_latency_spec(spec):
+    """
+    Parses a command-line latency spec such as ``lognormal:0.05:0.5``.
+
+    Args:
+        spec (str): ``fixed:V``, ``uniform:LOW:HIGH``, ``exponential:MEAN``
+            or ``lognormal:MEDIAN:SIGMA``
+
+    Returns:
+        dict: Latency parameters for ``sample_latency``
+    """
+    parts = spec.split(':')
+    name, values = parts[0], [float(v) for v in parts[1:]]
+    keys = {
+        'fixed': ['value'],
+        'uniform': ['low', 'high'],
+        'exponential': ['mean'],
+        'lognormal': ['median', 'sigma']
+    }
+    if name not in keys:
+        raise ValueError(f"Unknown latency distribution: {name}")
+    return dict({'distribution': name}, **dict(zip(keys[name], values)))
+
+
+class PageTemplate:
+    """
+    Product-card and page skeleton extracted from a captured Best Buy page.
+    """
+
+    def __init__(self, path):
+        """
+        Load and templatise a captured page.
+
+        Args:
+            path (str): Path to a saved Best Buy listing page (``debug_page.html``)
+        """
+        with open(path, encoding='utf-8') as f:
+            soup = BeautifulSoup(f.read(), 'html.parser')
+
+        # Drop scripts and external resources so browsers load the page offline
+        for tag in soup.find_all(['script', 'noscript', 'iframe']):
+            tag.decompose()
+        for tag in soup.find_all('link'):
+            tag.decompose()
+
+        containers = soup.find_all('div', {'itemtype': lambda x: x and 'Product' in x})
+        if not containers:
+            raise ValueError(f"No product containers found in template {path}")
+
+        grid = containers[0].find_parent('ul')
+        self.cards = []
+        self.base_names = []
+        self.base_prices = []
+        for item in grid.find_all('li', recursive=False):
+            container = item.find('div', {'itemtype': lambda x: x and 'Product' in x})
+            if container is None:
+                continue
+            name_span = container.find('h3', class_='productItemName_3IZ3c').find('span')
+            self.base_names.append(name_span.get_text(strip=True))
+            name_span.string = NAME_MARK
+
+            price_span = container.find('span', class_='style-module_screenReaderOnly__4QmbS')
+            self.base_prices.append(float(price_span.get_text(strip=True)[1:].replace(',', '')))
+            price_span.string = PRICE_MARK
+
+            rating_meta = container.find('meta', {'itemprop': 'ratingValue'})
+            review_meta = container.find('meta', {'itemprop': 'reviewCount'})
+            if rating_meta is not None and review_meta is not None:
+                rating_meta['content'] = RATING_MARK
+                review_meta['content'] = REVIEWS_MARK
+            self.cards.append(str(item))
+
+        grid.clear()
+        grid.append(BeautifulSoup(PRODUCTS_MARK, 'html.parser'))
+
+        count = soup.find('h2', {'data-testid': 'PRODUCT_LIST_RESULT_COUNT_DATA_AUTOMATION'})
+        if count is not None:
+            count.string = f'{COUNT_MARK} results'
+
+        self.page = str(soup)
+
+    def rehash(self, class_hash):
+        """
+        Renames the hashed product classes as a new build of the site would.
+
+        Args:
+            class_hash (str): New suffix, e.g. 'x7Kp2'
+        """
+        for class_name in FIELD_CLASSES.values():
+            renamed = stable_prefix(class_name) + class_hash
+            self.page = self.page.replace(class_name, renamed)
+            self.cards = [card.replace(class_name, renamed) for card in self.cards]
+
+    def render_card(self, product):
+        """
+        Renders one product card.
+
+        Args:
+            product (dict): Product with name, price, rating and reviews
+
+        Returns:
+            str: HTML for the ``<li>`` product card
+        """
+        card = self.cards[product['template']]
+        return (card.replace(NAME_MARK, product['name'])
+                    .replace(PRICE_MARK, f"${product['price']:,.2f}")
+                    .replace(RATING_MARK, f"{product['rating']:.2f}")
+                    .replace(REVIEWS_MARK, str(product['reviews'])))
+
+    def render_page(self, products, total, variant='static', render_delay=0.0):
+        """
+        Renders a full listing page.
+
+        Args:
+            products (list): Products on this page
+            total (int): Result count shown in the page header
+            variant (str): 'static' or 'js'
+            render_delay (float): Seconds before the js variant injects products
+
+        Returns:
+            str: Page HTML
+        """
+        cards = ''.join(self.render_card(product) for product in products)
+        page = self.page.replace(COUNT_MARK, f'{total:,}')
+
+        if variant == 'static':
+            return page.replace(PRODUCTS_MARK, cards)
+
+        # JS variant: the grid is empty until the script runs, like the live React site
+        script = (
+            '<script>setTimeout(function () {'
+            'var grid = document.getElementById("mock-grid").parentNode;'
+            f'grid.innerHTML = {json.dumps(cards)};'
+            f'}}, {int(render_delay * 1000)});</script>'
+        )
+        page = page.replace(PRODUCTS_MARK, '<template id="mock-grid"></template>')
+        return page.replace('</body>', script + '</body>')
+
+
+class MockCatalogue:
+    """
+    Deterministic fake catalogue keyed by RAM facet.
+    """
+
+    def __init__(self, template, ram_sizes, items_per_ram, seed=42):
+        """
+        Build the catalogue.
+
+        Args:
+            template (PageTemplate): Page template providing base names and prices
+            ram_sizes (list): RAM facets in GB (strings)
+            items_per_ram (int): Products per facet
+            seed (int): Random seed
+        """
+        rng = random.Random(seed)
+        self.by_ram = {}
+        for ram_size in ram_sizes:
+            products = []
+            for index in range(items_per_ram):
+                slot = index % len(template.cards)
+                base_name = RAM_MENTION.sub(ram_size, template.base_names[slot])
+                products.append({
+                    'template': slot,
+                    'name': f'{base_name} - SKU {ram_size}{index:05d}',
+                    'price': round(template.base_prices[slot] * rng.uniform(0.8, 1.6), 2),
+                    'rating': round(rng.uniform(3.0, 5.0), 2),
+                    'reviews': rng.randint(0, 2000)
+                })
+            self.by_ram[ram_size] = products
+
+        # Unfiltered listing interleaves the facets the way a relevance sort would
+        self.all_products = [
+            product
+            for group in zip(*self.by_ram.values())
+            for product in group
+        ]
+
+    def listing(self, ram_size=None):
+        """
+        Returns the product list for a facet, or all products when unfiltered.
+        """
+        if ram_size is None:
+            return self.all_products
+        return self.by_ram.get(ram_size, [])
+
+
+class MockRequestHandler(BaseHTTPRequestHandler):
+    """
+    Request handler serving the mock listing pages.
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        logger.debug(f"mock-server: {format % args}")
+
+    def setup(self):
+        super().setup()
+        delay = self.server.settings.get('handshake_delay')
+        with self.server.lock:
+            self.server.stats['connections'] += 1
+        if delay:
+            sleep(delay)
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            delay = sample_latency(server.settings['latency'], server.rng)
+            roll = server.rng.random()
+            server.stats['requests'] += 1
+
+        if delay > 0:
+            sleep(delay)
+
+        parts = urlsplit(self.path)
+        if parts.path.rstrip('/') != CATEGORY_PATH:
+            return self.send_body(404, 'Not found')
+
+        if roll < server.settings['rate_429']:
+            with server.lock:
+                server.stats['429'] += 1
+            return self.send_body(429, 'Too many requests', {'Retry-After': '1'})
+        if roll < server.settings['rate_429'] + server.settings['error_rate']:
+            with server.lock:
+                server.stats['500'] += 1
+            return self.send_body(500, 'Internal server error')
+
+        query = parse_qs(parts.query)
+        page = int(query.get('page', ['1'])[0])
+        page_size = min(int(query.get('pageSize', [server.settings['page_size']])[0]),
+                        server.settings['max_page_size'])
+        match = re.search(r'custom0ramsize:(\d+)', unquote(unquote(query.get('path', [''])[0])))
+        products = server.catalogue.listing(match.group(1) if match else None)
+
+        start = (page - 1) * page_size
+        body = server.template.render_page(
+            products[start:start + page_size],
+            len(products),
+            variant=server.settings['variant'],
+            render_delay=server.settings['js_render_delay']
+        )
+        with server.lock:
+            server.stats['200'] += 1
+        self.send_body(200, body)
+
+    def send_body(self, status, body, headers=None):
+        payload = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        bandwidth = self.server.settings.get('bandwidth')
+        if not bandwidth:
+            self.wfile.write(payload)
+            return
+        # Trickle the body out so clients see a transfer that takes time
+        for start in range(0, len(payload), 16384):
+            piece = payload[start:start + 16384]
+            self.wfile.write(piece)
+            self.wfile.flush()
+            sleep(len(piece) / bandwidth)
+
+
+class MockBestBuyServer:
+    """
+    Threaded HTTP server imitating the Best Buy Canada category listing.
+    """
+
+    def __init__(self, settings=None):
+        """
+        Initialize the mock server.
+
+        Args:
+            settings (dict): Overrides for ``get_mock_server_config()``
+        """
+        self.settings = get_mock_server_config()
+        self.settings.update(settings or {})
+        self.httpd = None
+        self.thread = None
+
+    @property
+    def base_url(self):
+        """Category listing URL to put in ``config['base_url']``."""
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}{CATEGORY_PATH}'
+
+    @property
+    def stats(self):
+        """Response counters by status code."""
+        return dict(self.httpd.stats)
+
+    def start(self):
+        """
+        Start serving in a background thread.
+
+        Returns:
+            MockBestBuyServer: self, for chaining
+        """
+        template = PageTemplate(self.settings['template'])
+        if self.settings.get('class_hash'):
+            template.rehash(self.settings['class_hash'])
+        httpd = ThreadingHTTPServer((self.settings['host'], self.settings['port']), MockRequestHandler)
+        httpd.daemon_threads = True
+        httpd.settings = self.settings
+        httpd.template = template
+        httpd.catalogue = MockCatalogue(
+            template, self.settings['ram_sizes'], self.settings['items_per_ram'], self.settings['seed']
+        )
+        httpd.rng = random.Random(self.settings['seed'])
+        httpd.lock = threading.Lock()
+        httpd.stats = {'connections': 0, 'requests': 0, '200': 0, '429': 0, '500': 0}
+        self.httpd = httpd
+
+        self.thread = threading.Thread(target=httpd.serve_forever, name='mock-bestbuy', daemon=True)
+        self.thread.start()
+        logger.info(f"Mock Best Buy server ({self.settings['variant']}) listening on {self.base_url}")
+        return self
+
+    def stop(self):
+        """
+        Stop the server and wait for the serving thread.
+        """
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.thread.join()
+            logger.info(f"Mock server stopped | {self.stats}")
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    """
+    Run the mock server in the foreground.
+    """
+    defaults = get_mock_server_config()
+    parser = argparse.ArgumentParser(description='Local mock Best Buy Canada server')
+    parser.add_argument('--host', default=defaults['host'])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--variant', choices=['static', 'js'], default=defaults['variant'])
+    parser.add_argument('--latency', default='lognormal:0.05:0.5',
+                        help='fixed:V | uniform:LOW:HIGH | exponential:MEAN | lognormal:MEDIAN:SIGMA')
+    parser.add_argument('--error-rate', type=float, default=defaults['error_rate'])
+    parser.add_argument('--rate-429', type=float, default=defaults['rate_429'])
+    parser.add_argument('--bandwidth', type=float, default=defaults['bandwidth'],
+                        help='Send rate in bytes/s (default: unlimited)')
+    parser.add_argument('--handshake-delay', type=float, default=defaults['handshake_delay'],
+                        help='Seconds of simulated connection set-up per new connection')
+    parser.add_argument('--class-hash', help='Rename the hashed product classes (simulated redeploy)')
+    args = parser.parse_args()
+
+    server = MockBestBuyServer({
+        'host': args.host,
+        'port': args.port,
+        'variant': args.variant,
+        'latency': parse_latency_spec(args.latency),
+        'error_rate': args.error_rate,
+        'rate_429': args.rate_429,
+        'bandwidth': args.bandwidth,
+        'handshake_delay': args.handshake_delay,
+        'class_hash': args.class_hash
+    }).start()
+    try:
+        server.thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
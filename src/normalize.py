@@ -0,0 +1,298 @@
+"""
+Bulk normaliser of laptop CSV files into one typed, partitioned dataset.
+
+The CSV files written over the years differ in more than the votes format:
+
+- ``v1`` (``laptops_rating.csv``, ``laptops_rating2019.csv``): ratings on a
+  0-100 scale, votes as ``"(4)"``, prices as ``"$1,099.99"``
+- ``v2`` (``laptops_bestbuy_2025.csv``): ratings on a 0-5 scale, integer
+  votes, prices as text
+- ``v3`` (files written from a ``RecordBuffer``): numeric prices
+
+Each file's version is detected from its columns, the values are converted
+with vectorised pandas operations (ratings rescaled to 0-5, votes and prices
+parsed), and the rows are tagged with their source file and year (from the
+file name, else ``--year``; files with neither go to ``year=unknown`` with a
+warning rather than a year guessed from their modification time). Files are
+processed in a process pool and written as one partition file per source
+under ``year=<year>/``, each replaced atomically, next to a
+``_manifest.json`` describing all partitions:
+
+    python src/normalize.py data/ --output data/normalized
+    python src/normalize.py archive/**/*.csv --workers 8 --year 2018
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from time import time
+
+import pandas as pd
+from loguru import logger
+
+# Column dtypes of the normalised dataset
+COLUMNS = {
+    'laptops': 'string',
+    'prices': 'float64',
+    'ratings': 'float64',
+    'votes': 'int64',
+    'source': 'string',
+    'year': 'Int64',
+    'schema': 'string'
+}
+
+MANIFEST = '_manifest.json'
+
+_YEAR = re.compile(r'(?<!\d)(19|20)\d{2}(?!\d)')
+
+
+def detect_schema(df):
+    """
+    Detects the schema version of a raw laptop dataframe.
+
+    Args:
+        df (pd.DataFrame): Raw dataframe (laptops, prices, ratings, votes)
+
+    Returns:
+        str: 'v1' (0-100 ratings, "(n)" votes), 'v2' (0-5 ratings, text prices)
+            or 'v3' (0-5 ratings, numeric prices)
+    """
+    votes = df['votes']
+    paren_votes = (not pd.api.types.is_numeric_dtype(votes)
+                   and votes.astype('string').str.startswith('(').any())
+    ratings = pd.to_numeric(df['ratings'], errors='coerce')
+    if paren_votes or ratings.max() > 5:
+        return 'v1'
+    if pd.api.types.is_numeric_dtype(df['prices']):
+        return 'v3'
+    return 'v2'
+
+
+def _numbers(column):
+    """Vectorised parse of a text column such as "$1,099.99" or "(12)"."""
+    if pd.api.types.is_numeric_dtype(column):
+        return column.astype('float64')
+    digits = column.astype('string').str.replace(r'[^0-9.\-]', '', regex=True)
+    return pd.to_numeric(digits, errors='coerce').astype('float64')
+
+
+def normalize_values(df, schema=None):
+    """
+    Converts prices, ratings and votes of a raw dataframe to the unified scale.
+
+    Args:
+        df (pd.DataFrame): Raw dataframe
+        schema (str): Schema version (detected when omitted)
+
+    Returns:
+        pd.DataFrame: Dataframe with float prices, 0-5 float ratings and int votes
+    """
+    schema = schema or detect_schema(df)
+    ratings = _numbers(df['ratings'])
+    if schema == 'v1':
+        ratings = ratings / 20.0
+    return df.assign(
+        prices=_numbers(df['prices']),
+        ratings=ratings.fillna(0.0),
+        votes=_numbers(df['votes']).fillna(0).astype('int64')
+    )
+
+
+def source_year(path, default=None):
+    """
+    Year a file belongs to: from its name, else ``default``.
+
+    Args:
+        path (str): CSV file
+        default (int): Year for files without one in their name
+
+    Returns:
+        int: Year, or None if unknown
+    """
+    match = _YEAR.search(os.path.basename(path))
+    if match:
+        return int(match.group(0))
+    if default:
+        return default
+    logger.warning("No year in the name of {} and no --year given: tagged year=unknown", path)
+    return None
+
+
+def _year_partition(year):
+    return f"year={'unknown' if pd.isna(year) else year}"
+
+
+def normalize_file(path, year=None):
+    """
+    Reads and normalises one CSV file.
+
+    Args:
+        path (str): CSV file
+        year (int): Year for files without one in their name
+
+    Returns:
+        pd.DataFrame: Normalised rows with the ``COLUMNS`` dtypes
+    """
+    df = pd.read_csv(path)
+    df = df.drop(columns=[c for c in df.columns if c.startswith('Unnamed')])
+    schema = detect_schema(df)
+    df = normalize_values(df, schema)
+    df['source'] = os.path.splitext(os.path.basename(path))[0]
+    df['year'] = pd.array([source_year(path, year)] * len(df), dtype='Int64')
+    df['schema'] = schema
+    return df[list(COLUMNS)].astype(COLUMNS)
+
+
+def _write_partition(job):
+    """Worker: normalise one file and atomically write its partition."""
+    path, output_dir, part, year = job
+    df = normalize_file(path, year)
+    partition = _year_partition(df['year'].iat[0] if len(df) else source_year(path, year))
+    target = os.path.join(output_dir, partition, part)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    temp_file = f'{target}.{os.getpid()}.tmp'
+    df.to_csv(temp_file, index=False)
+    os.replace(temp_file, target)
+    return {
+        'path': os.path.join(partition, part),
+        'input': os.path.abspath(path),
+        'source': df['source'].iat[0] if len(df) else part[:-4],
+        'schema': df['schema'].iat[0] if len(df) else None,
+        'rows': len(df)
+    }
+
+
+def _read_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST)
+    if not os.path.exists(path):
+        return {'columns': COLUMNS, 'partitions': {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST)
+    temp_file = path + '.tmp'
+    with open(temp_file, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temp_file, path)
+
+
+def _part_names(paths):
+    """Partition file name per input: its stem, disambiguated when stems collide."""
+    stems = [os.path.splitext(os.path.basename(path))[0] for path in paths]
+    names = []
+    for path, stem in zip(paths, stems):
+        if stems.count(stem) > 1:
+            parent = os.path.basename(os.path.dirname(os.path.abspath(path)))
+            stem = f'{parent}-{stem}'
+        names.append(f'{stem}.csv')
+    return names
+
+
+def normalize_files(paths, output_dir, workers=None, year=None):
+    """
+    Normalises many CSV files in parallel into the partitioned dataset.
+
+    Args:
+        paths (list): Input CSV files
+        output_dir (str): Dataset directory
+        workers (int): Processes (defaults to all cores)
+        year (int): Year for files without one in their name
+
+    Returns:
+        dict: Updated manifest
+    """
+    workers = workers or os.cpu_count() or 1
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = _read_manifest(output_dir)
+    jobs = [(path, output_dir, part, year) for path, part in zip(paths, _part_names(paths))]
+
+    started = time()
+    failed = 0
+    with ProcessPoolExecutor(max_workers=min(workers, max(len(jobs), 1))) as executor:
+        futures = {executor.submit(_write_partition, job): job[0] for job in jobs}
+        for future, path in futures.items():
+            try:
+                entry = future.result()
+            except Exception as e:
+                failed += 1
+                logger.error("Could not normalise {}: {}", path, e)
+                continue
+            manifest['partitions'][entry['path']] = entry
+            logger.debug("{} -> {} ({} rows, schema {})", path, entry['path'], entry['rows'], entry['schema'])
+
+    manifest['columns'] = COLUMNS
+    manifest['updated'] = datetime.now().isoformat()
+    _write_manifest(output_dir, manifest)
+    rows = sum(entry['rows'] for entry in manifest['partitions'].values())
+    logger.success("Normalised {} files ({} failed) into {} in {:.1f}s; dataset holds {} rows",
+                   len(jobs) - failed, failed, output_dir, time() - started, rows)
+    return manifest
+
+
+def load_dataset(output_dir, years=None):
+    """
+    Loads the normalised dataset, optionally only some years.
+
+    Args:
+        output_dir (str): Dataset directory
+        years (iterable): Years to read (None = all; 'unknown' selects untagged files)
+
+    Returns:
+        pd.DataFrame: Rows with the ``COLUMNS`` dtypes
+    """
+    manifest = _read_manifest(output_dir)
+    wanted = {_year_partition(None if year == 'unknown' else year) for year in years} if years else None
+    frames = [
+        pd.read_csv(os.path.join(output_dir, entry['path']), dtype=COLUMNS)
+        for entry in manifest['partitions'].values()
+        if wanted is None or entry['path'].split(os.sep)[0] in wanted
+    ]
+    if not frames:
+        return pd.DataFrame({name: pd.Series(dtype=dtype) for name, dtype in COLUMNS.items()})
+    return pd.concat(frames, ignore_index=True)
+
+
+def expand_inputs(inputs):
+    """
+    Expands files, directories (searched recursively) and glob patterns into CSV paths.
+
+    Args:
+        inputs (list): Paths or patterns
+
+    Returns:
+        list: Sorted unique CSV files
+    """
+    paths = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.update(glob.glob(os.path.join(item, '**', '*.csv'), recursive=True))
+        else:
+            paths.update(p for p in glob.glob(item, recursive=True) if p.endswith('.csv'))
+    return sorted(paths)
+
+
+def main():
+    """
+    Command-line entry point.
+    """
+    parser = argparse.ArgumentParser(description='Normalise laptop CSV files into one partitioned dataset')
+    parser.add_argument('inputs', nargs='*', default=['data'], help='CSV files, directories or glob patterns')
+    parser.add_argument('--output', default='data/normalized', help='Dataset directory')
+    parser.add_argument('--workers', type=int, help='Processes (default: all cores)')
+    parser.add_argument('--year', type=int, help='Year for files without one in their name')
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    paths = [p for p in expand_inputs(args.inputs) if not os.path.abspath(p).startswith(output + os.sep)]
+    logger.info("Normalising {} files into {}", len(paths), args.output)
+    normalize_files(paths, args.output, args.workers, args.year)
+
+
+if __name__ == '__main__':
+    main()
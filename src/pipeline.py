@@ -0,0 +1,263 @@
+"""
+Staged crawl pipeline with fetch, extract and persist running concurrently.
+
+``scrape_all_laptops`` fetches, parses and stores one page after the other,
+and ``webscraping.main`` used to write the CSV, read it back and clean it
+before plotting. Here each stage is a thread connected to the next by a
+bounded queue:
+
+    fetch (politeness sleep + HTTP) -> extract (parse, browser escalation)
+        -> persist (CSV batches, recrawl statistics) -> typed DataFrame
+
+While the fetch stage waits between requests the previous pages are parsed
+and written, so a run takes about as long as its fetches. A full queue
+blocks the stage before it (backpressure), so a slow parser or disk never
+lets pages pile up in memory. Records are typed at extraction, so the final
+frame is built from the in-memory ``RecordBuffer`` without a CSV round trip.
+
+The 'hybrid' and 'http' engines are supported; the Selenium engine keeps
+its own tab pool (``scraper_selenium.py``).
+"""
+
+import os
+import queue
+import threading
+
+from loguru import logger
+
+from data_cleaner import save_data
+from dataset import DatasetWriter
+from metrics import registry
+from records import RecordBuffer
+from scraper import CrawlRun, extract_fetched_page, fetch_page
+
+PIPELINE_ENGINES = ('hybrid', 'http')
+
+# Marks the end of a stage's input
+_DONE = object()
+
+
+class CrawlPipeline:
+    """
+    Runs one crawl through concurrent fetch, extract and persist stages.
+    """
+
+    def __init__(self, config, build_url_func, output_file=None):
+        """
+        Args:
+            config (dict): Configuration dictionary
+            build_url_func (function): Function to build URLs
+            output_file (str): CSV receiving the records (defaults to ``config['output_file']``)
+        """
+        self.config = config
+        self.build_url_func = build_url_func
+        self.output_file = output_file or config['output_file']
+        self.queue_size = config.get('pipeline_queue_size', 4)
+        self.batch_size = config.get('pipeline_batch_size', 500)
+        self.engine = config.get('engine', 'hybrid')
+        if self.engine not in PIPELINE_ENGINES:
+            raise ValueError(f"Engine '{self.engine}' has no pipeline (expected one of {PIPELINE_ENGINES})")
+
+        self.hybrid = None
+        if self.engine == 'hybrid':
+            from hybrid_fetcher import HybridScraper
+            self.hybrid = HybridScraper(config)
+
+        # Pages go to the dataset with their RAM filter (the partition of names without a RAM size)
+        self.dataset = None
+        if config.get('dataset_dir'):
+            self.dataset = DatasetWriter(config['dataset_dir'], batch_rows=self.batch_size,
+                                         source=os.path.normpath(self.output_file))
+
+        self.stop = threading.Event()
+        self.errors = []
+        self.written = 0
+        # Pages through the persist stage; the fetch stage waits for them before it ends
+        self.accepted = 0
+        self.progress = threading.Condition()
+
+    def _fetch(self, url, request_num, start_time):
+        if self.hybrid is not None:
+            return self.hybrid.fetch(url, request_num, start_time)
+        return fetch_page(url, request_num, start_time, self.config)
+
+    def _extract(self, url, fetched, request_num, start_time):
+        if self.hybrid is not None:
+            return self.hybrid.extract(url, fetched, request_num, start_time)
+        if fetched is None:
+            return None
+        return extract_fetched_page(fetched, request_num)
+
+    def _put(self, outbox, item, stage):
+        """Hands ``item`` to the next stage, blocking while its queue is full."""
+        if outbox.full():
+            registry.counter('pipeline_backpressure_total', 'Items delayed by a full stage queue',
+                             stage=stage).inc()
+        while not self.stop.is_set():
+            try:
+                outbox.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, inbox):
+        """Next item of a stage's input (``_DONE`` at the end or after a failure)."""
+        while not self.stop.is_set():
+            try:
+                return inbox.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _stage(self, name, body):
+        """Thread target running ``body`` and stopping the pipeline if it fails."""
+        try:
+            body()
+        except Exception as e:
+            logger.exception("Pipeline stage '{}' failed: {}", name, e)
+            self.errors.append(e)
+            self.stop.set()
+
+    def _fetch_stage(self, crawl, outbox):
+        targets = crawl.targets
+        try:
+            current_ram_size = None
+            while not self.stop.is_set():
+                target = targets.take()
+                if target is None:
+                    # Pages still in the pipeline may extend the plan (see CrawlPlan.accept)
+                    with self.progress:
+                        if self.accepted >= crawl.requests and not targets.remaining():
+                            break
+                        self.progress.wait(0.5)
+                    continue
+                ram_size, page = target
+                if ram_size != current_ram_size:
+                    current_ram_size = ram_size
+                    logger.info(f"\n--- Scraping RAM size: {ram_size}GB ---")
+
+                crawl.pause()
+                crawl.requests += 1
+                url = self.build_url_func(page, ram_size)
+                fetched = self._fetch(url, crawl.requests, crawl.start_time)
+                if not self._put(outbox, (ram_size, page, url, crawl.requests, fetched), 'extract'):
+                    return
+        finally:
+            self._put(outbox, _DONE, 'extract')
+
+    def _extract_stage(self, inbox, outbox, start_time):
+        try:
+            while True:
+                item = self._get(inbox)
+                if item is _DONE:
+                    return
+                ram_size, page, url, request_num, fetched = item
+                records = self._extract(url, fetched, request_num, start_time)
+                del item, fetched
+                if not self._put(outbox, (ram_size, page, records), 'persist'):
+                    return
+        finally:
+            self._put(outbox, _DONE, 'persist')
+
+    def _persist_stage(self, crawl, inbox):
+        batch = RecordBuffer()
+
+        def flush():
+            save_data(batch, self.output_file, append=self.written > 0,
+                      aggregates_dir=self.config.get('aggregates_dir'))
+            self.written += len(batch)
+            batch.clear()
+
+        if self.dataset is not None:
+            # The first CSV batch replaces the day's aggregate summary: this run's shards replace its
+            # earlier rows of the same output (committed with the first shard, see DatasetWriter.replace)
+            self.dataset.replace()
+        try:
+            while True:
+                item = self._get(inbox)
+                if item is _DONE:
+                    break
+                ram_size, page, page_records = item
+                page_records = crawl.collect(ram_size, page, page_records)
+                with self.progress:
+                    self.accepted += 1
+                    self.progress.notify_all()
+                if not page_records:
+                    continue
+
+                batch.extend(page_records)
+                if self.dataset is not None:
+                    self.dataset.add(page_records, ram_size)
+                if len(batch) >= self.batch_size:
+                    flush()
+        finally:
+            # Pages already accepted reach the dataset even if the crawl stops or a stage fails
+            if self.dataset is not None:
+                self.dataset.flush()
+
+        if not self.stop.is_set():
+            for ram_size, _, page_records in crawl.carry_forward():
+                batch.extend(page_records)
+                if self.dataset is not None:
+                    self.dataset.add(page_records, ram_size)
+            if len(batch) or self.written == 0:
+                flush()
+            if self.dataset is not None:
+                self.dataset.finish()
+
+    def run(self):
+        """
+        Crawls all planned pages.
+
+        Returns:
+            tuple: (RecordBuffer of all records, typed DataFrame of the run)
+
+        Raises:
+            Exception: The first error raised by a stage
+        """
+        crawl = CrawlRun(self.config, f'staged pipeline, {self.engine} engine')
+
+        fetched = queue.Queue(self.queue_size)
+        extracted = queue.Queue(self.queue_size)
+        stages = [
+            threading.Thread(target=self._stage, name='pipeline-fetch',
+                             args=('fetch', lambda: self._fetch_stage(crawl, fetched))),
+            threading.Thread(target=self._stage, name='pipeline-extract',
+                             args=('extract', lambda: self._extract_stage(fetched, extracted, crawl.start_time))),
+            threading.Thread(target=self._stage, name='pipeline-persist',
+                             args=('persist', lambda: self._persist_stage(crawl, extracted)))
+        ]
+        try:
+            for thread in stages:
+                thread.start()
+            for thread in stages:
+                thread.join()
+        except KeyboardInterrupt:
+            self.stop.set()
+            for thread in stages:
+                thread.join()
+            raise
+        finally:
+            if self.hybrid is not None:
+                self.hybrid.close()
+
+        if self.errors:
+            raise self.errors[0]
+        records = crawl.finish()
+        return records, records.to_dataframe()
+
+
+def run_pipeline(config, build_url_func, output_file=None):
+    """
+    Crawls, persists and returns the cleaned frame of one run.
+
+    Args:
+        config (dict): Configuration dictionary
+        build_url_func (function): Function to build URLs
+        output_file (str): CSV receiving the records (defaults to ``config['output_file']``)
+
+    Returns:
+        tuple: (RecordBuffer of all records, typed DataFrame ready for ``visualize_data``)
+    """
+    return CrawlPipeline(config, build_url_func, output_file).run()
@@ -0,0 +1,281 @@
+"""
+Near-duplicate product matching across crawls and years.
+
+Names drift between ``laptops_rating2019.csv`` and ``laptops_bestbuy_2025.csv``
+and between crawls (colour variants, "Refurbished", "- English", model
+suffixes), so grouping on the exact name splits one product into several.
+Comparing every name with every other is quadratic; instead:
+
+1. names are normalised (case, punctuation, condition/colour/language noise
+   words) and reduced to a set of word and word-pair shingles;
+2. each distinct name gets a MinHash signature (``num_perm`` universal hashes,
+   vectorised with numpy);
+3. signatures are cut into LSH bands; names sharing a band bucket become
+   candidates. The bucket key also holds the brand (first normalised word)
+   and the spec key (``spec_key``: every token with a digit, i.e. model
+   numbers, screen size, RAM/storage capacities, CPU, Windows version),
+   because names differing only there ("Vivobook 14" / "Vivobook 16X",
+   "512GB" / "1TB", "Win10" / "Win11") are as similar as two colour
+   variants of one configuration but are different products;
+4. names are assigned in order: each joins the family whose representative
+   (first member) it matches best at ``threshold``, or starts a new one.
+   Comparing with the representative rather than merging every accepted
+   pair keeps families from chaining A~B~C into one group.
+
+Work is linear in the number of distinct names plus candidate pairs. The
+result is a ``family_id`` column the cleaning and visualisation stages can
+group on:
+
+    df = add_product_families(load_and_process_data('data/laptops_bestbuy_2025.csv'))
+
+    python src/product_matching.py data/laptops_rating2019.csv data/laptops_bestbuy_2025.csv
+    python src/product_matching.py --dataset data/normalized --threshold 0.7
+"""
+
+import argparse
+import re
+import zlib
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+# Words that describe condition, colour or packaging rather than the product
+NOISE_WORDS = {
+    'refurbished', 'refurb', 'renewed', 'open', 'box', 'openbox', 'used', 'grade', 'good',
+    'excellent', 'fair', 'english', 'french', 'bilingual', 'en', 'fr', 'new', 'certified',
+    'black', 'white', 'silver', 'grey', 'gray', 'blue', 'red', 'gold', 'pink', 'green',
+    'purple', 'platinum', 'charcoal', 'graphite', 'midnight', 'starlight', 'mixed', 'dark',
+    'light', 'space', 'natural', 'arctic', 'luna', 'granite', 'sage', 'mist', 'rose',
+    'laptop', 'notebook', 'with', 'and', 'the', 'w'
+}
+
+# Mersenne prime for the universal hashes h(x) = (a * x + b) mod p
+_PRIME = (1 << 31) - 1
+_TOKEN = re.compile(r'[a-z0-9]+')
+
+
+def normalize_name(name):
+    """
+    Canonical form of a product name for matching.
+
+    Args:
+        name (str): Product name
+
+    Returns:
+        str: Lower-case tokens without noise words
+
+    Example:
+        >>> normalize_name('ASUS Chromebook 11.6" Laptop - Dark Grey (Intel Celeron N3060) - Refurbished')
+        'asus chromebook 11 6 intel celeron n3060'
+    """
+    return ' '.join(token for token in _TOKEN.findall(str(name).lower()) if token not in NOISE_WORDS)
+
+
+def spec_key(normalized):
+    """
+    Tokens that must agree for two names to denote one product.
+
+    Args:
+        normalized (str): Output of ``normalize_name``
+
+    Returns:
+        tuple: Sorted distinct tokens containing a digit
+
+    Example:
+        >>> spec_key('asus vivobook 16x intel core i7 1355u 12gb ddr4 1tb ssd win11 home')
+        ('12gb', '1355u', '16x', '1tb', 'ddr4', 'i7', 'win11')
+    """
+    return tuple(sorted({token for token in normalized.split() if any(c.isdigit() for c in token)}))
+
+
+def shingles(normalized):
+    """
+    Word and adjacent-word-pair shingles of a normalised name.
+
+    Args:
+        normalized (str): Output of ``normalize_name``
+
+    Returns:
+        set: Shingle strings
+    """
+    words = normalized.split()
+    return set(words) | {f'{a} {b}' for a, b in zip(words, words[1:])}
+
+
+def lsh_bands(num_perm, threshold):
+    """
+    Chooses (bands, rows) with ``bands * rows <= num_perm`` whose LSH
+    threshold ``(1 / bands) ** (1 / rows)`` is closest to ``threshold``.
+
+    Args:
+        num_perm (int): Signature length
+        threshold (float): Target Jaccard similarity
+
+    Returns:
+        tuple: (bands, rows)
+    """
+    best = None
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        error = abs((1 / bands) ** (1 / rows) - threshold)
+        if best is None or error < best[0]:
+            best = (error, bands, rows)
+    return best[1], best[2]
+
+
+class MinHasher:
+    """
+    MinHash signatures from a fixed, seeded family of universal hashes.
+    """
+
+    def __init__(self, num_perm=128, seed=1):
+        """
+        Args:
+            num_perm (int): Hash functions per signature
+            seed (int): Seed of the hash coefficients (same seed = comparable signatures)
+        """
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.a = rng.integers(1, _PRIME, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, _PRIME, num_perm, dtype=np.uint64)
+
+    def signatures(self, shingle_sets):
+        """
+        Signatures of many shingle sets.
+
+        Args:
+            shingle_sets (list): Non-empty sets of shingle strings
+
+        Returns:
+            np.ndarray: (len(shingle_sets), num_perm) uint64 matrix
+        """
+        # crc32 is stable across processes, unlike the salted built-in hash()
+        lengths = np.fromiter((len(s) for s in shingle_sets), dtype=np.int64, count=len(shingle_sets))
+        values = np.fromiter((zlib.crc32(item.encode('utf-8')) for s in shingle_sets for item in s),
+                             dtype=np.uint64, count=int(lengths.sum())) % np.uint64(_PRIME)
+        offsets = np.concatenate(([0], np.cumsum(lengths)))
+        result = np.empty((len(shingle_sets), self.num_perm), dtype=np.uint64)
+        # Sets are processed in chunks of ~64k shingles to bound the (shingles x num_perm) matrix
+        first = 0
+        while first < len(shingle_sets):
+            last = max(first + 1, int(np.searchsorted(offsets, offsets[first] + 65536, side='right')) - 1)
+            chunk = values[offsets[first]:offsets[last]]
+            hashed = (chunk[:, None] * self.a + self.b) % np.uint64(_PRIME)
+            result[first:last] = np.minimum.reduceat(hashed, offsets[first:last] - offsets[first], axis=0)
+            first = last
+        return result
+
+
+def match_names(names, threshold=0.6, num_perm=128, seed=1):
+    """
+    Groups names that likely denote the same product.
+
+    Args:
+        names (iterable): Product names
+        threshold (float): Minimum estimated Jaccard similarity of name shingles
+        num_perm (int): MinHash signature length
+        seed (int): Hash seed
+
+    Returns:
+        np.ndarray: Family id per input name (0..families-1, in order of first appearance)
+    """
+    names = pd.Series(list(names), dtype='string').fillna('')
+    normalized = names.map(normalize_name)
+    codes, distinct = pd.factorize(normalized)
+    count = len(distinct)
+
+    sets = [shingles(name) or {name} for name in distinct]
+    groups = [(name.split(' ', 1)[0], spec_key(name)) for name in distinct]
+    signatures = MinHasher(num_perm, seed).signatures(sets)
+    bands, rows = lsh_bands(num_perm, threshold)
+
+    # Bucket members per (band, brand, spec key, band signature)
+    buckets = defaultdict(list)
+    for band in range(bands):
+        block = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows])
+        for index, key in enumerate(map(bytes, block)):
+            buckets[band, groups[index], key].append(index)
+    neighbours = defaultdict(set)
+    for members in buckets.values():
+        for index in members[1:]:
+            neighbours[index].update(members)
+
+    # Representative (first member) of each name's family
+    representative = np.arange(count)
+    candidates = accepted = 0
+    for index in range(count):
+        leaders = {int(representative[other]) for other in neighbours.get(index, ()) if other < index}
+        best, best_similarity = None, threshold
+        for leader in sorted(leaders):
+            candidates += 1
+            similarity = np.count_nonzero(signatures[index] == signatures[leader]) / num_perm
+            if similarity >= best_similarity:
+                best, best_similarity = leader, similarity
+        if best is not None:
+            accepted += 1
+            representative[index] = best
+
+    families = pd.factorize(representative[codes])[0]
+    logger.info("Matched {} names ({} distinct) into {} families ({} representative comparisons, "
+                "{} names joined a family; {} bands x {} rows)", len(names), count,
+                families.max() + 1 if len(families) else 0, candidates, accepted, bands, rows)
+    return families
+
+
+def add_product_families(df, column='laptops', threshold=0.6, num_perm=128, seed=1):
+    """
+    Adds a ``family_id`` column grouping near-duplicate product names.
+
+    Args:
+        df (pd.DataFrame): Dataframe with a product name column
+        column (str): Name column
+        threshold (float): Minimum estimated Jaccard similarity
+        num_perm (int): MinHash signature length
+        seed (int): Hash seed
+
+    Returns:
+        pd.DataFrame: ``df`` with ``family_id``
+    """
+    return df.assign(family_id=match_names(df[column], threshold, num_perm, seed))
+
+
+def main():
+    """
+    Command-line entry point: match names across files and write the family mapping.
+    """
+    parser = argparse.ArgumentParser(description='Group near-duplicate laptop names into product families')
+    parser.add_argument('inputs', nargs='*', help='CSV files (any schema version)')
+    parser.add_argument('--dataset', help='Normalised dataset directory (see normalize.py)')
+    parser.add_argument('--threshold', type=float, default=0.6)
+    parser.add_argument('--num-perm', type=int, default=128)
+    parser.add_argument('--output', default='data/product_families.csv')
+    args = parser.parse_args()
+
+    if args.dataset:
+        from normalize import load_dataset
+        df = load_dataset(args.dataset)
+    else:
+        from data_cleaner import load_and_process_data
+        frames = [load_and_process_data(path).assign(source=path)
+                  for path in args.inputs or ['data/laptops_bestbuy_2025.csv']]
+        df = pd.concat(frames, ignore_index=True)
+
+    df = add_product_families(df, threshold=args.threshold, num_perm=args.num_perm)
+    mapping = df[['laptops', 'source', 'family_id']].drop_duplicates()
+    mapping.to_csv(args.output, index=False)
+
+    sizes = mapping.groupby('family_id')['laptops'].nunique().sort_values(ascending=False)
+    cross = mapping.groupby('family_id')['source'].nunique()
+    print(f"{mapping['laptops'].nunique()} names -> {len(sizes)} families; "
+          f"{int((cross > 1).sum())} families span several sources")
+    for family_id in sizes.index[:5]:
+        print(f"family {family_id}:")
+        for name in mapping.loc[mapping['family_id'] == family_id, 'laptops'].unique()[:4]:
+            print(f"    {name}")
+    logger.success("Family mapping written to {}", args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,378 @@
+"""
+Built-in profiling of a run, attributed to pipeline stages.
+
+Stages are the ``metrics.timer`` blocks the scrapers already record (fetch,
+parse, extract, write, sleep, load, clean, plot, ...). While a
+``StageProfiler`` is active it follows every thread's current stage and:
+
+- samples all threads inside a stage every ``interval`` seconds with
+  ``sys._current_frames()`` (wall-clock sampling: waits on the network count,
+  idle threads outside any stage are not sampled). At the default 100 Hz the
+  sampler costs well under 1% of a run, so it can stay on for canary runs;
+- in 'cprofile' mode, additionally runs one deterministic ``cProfile``
+  profiler per stage and thread (exact call counts, noticeably slower);
+- records the resident memory at each ``memory_snapshot(label)`` checkpoint
+  and at the end, with a ``tracemalloc`` snapshot when allocations are
+  traced. Tracing slows allocation-heavy parsing several times over, so by
+  default (``memory='auto'``) it is only on in 'cprofile' mode.
+
+Everything is written to ``<run_dir>/profile/``:
+
+- ``stacks.collapsed``: one ``stage;outer;...;inner count`` line per sampled
+  stack, for ``flamegraph.pl``, speedscope or inferno
+- ``summary.txt``: samples per stage and the top-N functions by self and
+  total time
+- ``<stage>.pstats``: merged cProfile statistics ('cprofile' mode; open with
+  ``python -m pstats``, snakeviz or flameprof)
+- ``memory.txt``: RSS per checkpoint; with tracing, traced size, peak, top
+  allocation sites and the growth since the previous checkpoint
+
+    python src/webscraping.py --profile
+    python visualize_existing_data.py --profile cprofile
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import tracemalloc
+from collections import Counter, defaultdict
+from contextlib import nullcontext
+from time import perf_counter, thread_time
+
+from loguru import logger
+
+from memory_budget import process_tree_rss
+from metrics import registry
+
+PROFILE_MODES = ('sampling', 'cprofile')
+
+# Stage of the profiled thread's code outside any timer block
+ROOT_STAGE = 'other'
+
+# Profiler receiving ``memory_snapshot`` checkpoints
+_active = None
+
+
+def _frame_label(code):
+    """Flamegraph frame name of a code object (no ';', which separates frames)."""
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f'{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'.replace(';', ':')
+
+
+class StageProfiler:
+    """
+    Sampling (and optionally cProfile and tracemalloc) profiler split by stage.
+    """
+
+    def __init__(self, output_dir, mode='sampling', interval=0.01, top=25, memory='auto', memory_frames=1):
+        """
+        Args:
+            output_dir (str): Directory receiving the profile files
+            mode (str): 'sampling' or 'cprofile' (sampling plus per-stage cProfile)
+            interval (float): Seconds between two samples
+            top (int): Functions / allocation sites listed per stage or snapshot
+            memory (bool or str): Trace allocations with tracemalloc ('auto' = in 'cprofile' mode only)
+            memory_frames (int): Frames stored per traced allocation (more = slower)
+        """
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode '{mode}' (expected one of {PROFILE_MODES})")
+        self.output_dir = output_dir
+        self.mode = mode
+        self.interval = interval
+        self.top = top
+        self.memory = mode == 'cprofile' if memory == 'auto' else bool(memory)
+        self.memory_frames = memory_frames
+
+        # thread id -> stack of active stage names (only touched by that thread)
+        self._stages = {}
+        self.samples = defaultdict(Counter)
+        self.sample_count = 0
+        self.sampler_cpu = 0.0
+        self._labels = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+        # (stage, thread id) -> cProfile.Profile, and each thread's enabled one
+        self._profiles = {}
+        self._running = {}
+        self.snapshots = []
+        self._started = None
+        self._elapsed = 0.0
+
+    @classmethod
+    def from_config(cls, run_dir, config, mode=None):
+        """
+        Args:
+            run_dir (str): Run directory (the profile goes to ``<run_dir>/profile``)
+            config (dict): Configuration dictionary
+            mode (str): Overrides ``config['profile_mode']``
+
+        Returns:
+            StageProfiler: Profiler configured from ``profile_*`` settings
+        """
+        return cls(
+            os.path.join(run_dir, 'profile'),
+            mode=mode or config.get('profile_mode', 'sampling'),
+            interval=config.get('profile_interval', 0.01),
+            top=config.get('profile_top', 25),
+            memory=config.get('profile_memory', 'auto'),
+            memory_frames=config.get('profile_memory_frames', 1)
+        )
+
+    # Stage tracking (called by metrics.timer in the thread running the stage)
+
+    def stage_started(self, stage):
+        ident = threading.get_ident()
+        stack = self._stages.get(ident)
+        if stack is None:
+            stack = self._stages[ident] = []
+        if self.mode == 'cprofile':
+            self._switch_profile(ident, stage)
+        stack.append(stage)
+
+    def stage_finished(self, stage):
+        ident = threading.get_ident()
+        stack = self._stages.get(ident)
+        if not stack:
+            return
+        stack.pop()
+        if self.mode == 'cprofile':
+            self._switch_profile(ident, stack[-1] if stack else None)
+
+    def _switch_profile(self, ident, stage):
+        """Moves the thread's deterministic profiling to ``stage`` (None = off)."""
+        running = self._running.pop(ident, None)
+        if running is not None:
+            running.disable()
+        if stage is None:
+            return
+        profile = self._profiles.get((stage, ident))
+        if profile is None:
+            profile = self._profiles[stage, ident] = cProfile.Profile()
+        profile.enable()
+        self._running[ident] = profile
+
+    # Sampling
+
+    def _stack_key(self, frame):
+        codes = []
+        while frame is not None:
+            codes.append(frame.f_code)
+            frame = frame.f_back
+        codes.reverse()
+        return tuple(codes)
+
+    def _sample_loop(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            started = thread_time()
+            for ident, frame in sys._current_frames().items():
+                stack = self._stages.get(ident)
+                if ident == own or not stack:
+                    continue
+                try:
+                    stage = stack[-1]
+                except IndexError:
+                    # The stage ended between the check and the read
+                    continue
+                self.samples[stage][self._stack_key(frame)] += 1
+            # Do not keep the last sampled frame (and its locals) alive until the next round
+            frame = None
+            self.sample_count += 1
+            self.sampler_cpu += thread_time() - started
+
+    # Memory
+
+    def snapshot(self, label):
+        """
+        Records the RSS and, when allocations are traced, a tracemalloc snapshot.
+
+        Args:
+            label (str): Checkpoint name shown in ``memory.txt``
+        """
+        rss = process_tree_rss(os.getpid())
+        if not self.memory or not tracemalloc.is_tracing():
+            self.snapshots.append((label, rss, None, None, None))
+            logger.debug("Memory checkpoint '{}': RSS {:.1f} MB", label, rss / 1e6)
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        # Filtering is slow (fnmatch per trace); it is left to the report, after sampling has stopped
+        self.snapshots.append((label, rss, current, peak, tracemalloc.take_snapshot()))
+        if hasattr(tracemalloc, 'reset_peak'):  # Python 3.9+
+            tracemalloc.reset_peak()
+        logger.debug("Memory checkpoint '{}': RSS {:.1f} MB, {:.1f} MB traced, peak {:.1f} MB",
+                     label, rss / 1e6, current / 1e6, peak / 1e6)
+
+    # Lifecycle
+
+    def start(self):
+        """
+        Starts tracing; the calling thread's code outside any stage counts as ``ROOT_STAGE``.
+        """
+        global _active
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start(self.memory_frames)
+        registry.add_stage_listener(self)
+        self.stage_started(ROOT_STAGE)
+        self._started = perf_counter()
+        self._thread = threading.Thread(target=self._sample_loop, name='stage-profiler', daemon=True)
+        self._thread.start()
+        _active = self
+        logger.info("Profiling ({} mode, {:.0f} Hz sampling{}) into {}", self.mode, 1 / self.interval,
+                    ', tracemalloc' if self.memory else '', self.output_dir)
+        self.snapshot('start')
+
+    def stop(self):
+        """
+        Stops tracing and writes the profile files.
+        """
+        global _active
+        _active = None
+        self._stop.set()
+        self._thread.join()
+        self._elapsed = perf_counter() - self._started
+        self.stage_finished(ROOT_STAGE)
+        registry.remove_stage_listener(self)
+        for profile in self._running.values():
+            profile.disable()
+        self._running.clear()
+        self.snapshot('end')
+        if self.memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.write()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+        return False
+
+    # Output
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = _frame_label(code)
+        return label
+
+    def write(self):
+        """
+        Writes collapsed stacks, the hot-function summary and the optional pstats/memory reports.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        with open(os.path.join(self.output_dir, 'stacks.collapsed'), 'w') as f:
+            for stage, stacks in sorted(self.samples.items()):
+                for codes, count in stacks.most_common():
+                    f.write(';'.join([stage] + [self._label(code) for code in codes]) + f' {count}\n')
+
+        with open(os.path.join(self.output_dir, 'summary.txt'), 'w') as f:
+            f.write(self._summary())
+            if self.mode == 'cprofile':
+                f.write(self._write_pstats())
+
+        if self.snapshots:
+            with open(os.path.join(self.output_dir, 'memory.txt'), 'w') as f:
+                f.write(self._memory_report())
+        logger.info("Profile written to {} ({} samples, sampler CPU {:.2f}s = {:.2%} of {:.1f}s)",
+                    self.output_dir, self.sample_count, self.sampler_cpu,
+                    self.sampler_cpu / max(self._elapsed, 1e-9), self._elapsed)
+
+    def _summary(self):
+        total = sum(sum(stacks.values()) for stacks in self.samples.values())
+        lines = [
+            f"Mode: {self.mode}, interval {self.interval * 1000:.1f} ms, {self.sample_count} sampling rounds "
+            f"over {self._elapsed:.2f}s (sampler CPU {self.sampler_cpu:.3f}s)",
+            "Samples are wall-clock: a stage waiting on the network or a sleep is counted as it waits.",
+            ''
+        ]
+        for stage, stacks in sorted(self.samples.items(), key=lambda item: -sum(item[1].values())):
+            count = sum(stacks.values())
+            own = Counter()
+            inclusive = Counter()
+            for codes, samples in stacks.items():
+                own[codes[-1]] += samples
+                for code in set(codes):
+                    inclusive[code] += samples
+            lines.append(f"== {stage}: {count} samples (~{count * self.interval:.2f}s, "
+                         f"{count / max(total, 1):.1%} of sampled time)")
+            lines.append(f"   {'self%':>7} {'total%':>7}  function")
+            for code, samples in own.most_common(self.top):
+                lines.append(f"   {samples / count:>7.1%} {inclusive[code] / count:>7.1%}  {self._label(code)}")
+            lines.append('')
+        return '\n'.join(lines) + '\n'
+
+    def _write_pstats(self):
+        """Merges each stage's per-thread profiles into ``<stage>.pstats``; returns their top-N text."""
+        by_stage = defaultdict(list)
+        for (stage, _), profile in self._profiles.items():
+            by_stage[stage].append(profile)
+        text = []
+        for stage, profiles in sorted(by_stage.items()):
+            stats = pstats.Stats(profiles[0])
+            for profile in profiles[1:]:
+                stats.add(profile)
+            stats.dump_stats(os.path.join(self.output_dir, f'{stage}.pstats'))
+            # print_stats writes to the Stats object's stream
+            stream = io.StringIO()
+            stats.stream = stream
+            stats.sort_stats('cumulative').print_stats(self.top)
+            text.append(f"== cProfile {stage} (by cumulative time)\n{stream.getvalue()}")
+        return '\n'.join(text)
+
+    def _memory_report(self):
+        lines = []
+        previous = None
+        ignored = (
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<unknown>')
+        )
+        for label, rss, current, peak, snapshot in self.snapshots:
+            if snapshot is None:
+                lines.append(f"== {label}: RSS {rss / 1e6:.1f} MB (allocations not traced)")
+                continue
+            snapshot = snapshot.filter_traces(ignored)
+            lines.append(f"== {label}: RSS {rss / 1e6:.1f} MB, {current / 1e6:.1f} MB traced, "
+                         f"peak since previous checkpoint {peak / 1e6:.1f} MB")
+            for stat in snapshot.statistics('lineno')[:self.top]:
+                lines.append(f"   {stat}")
+            if previous is not None:
+                lines.append(f"   -- growth since '{previous[0]}':")
+                for stat in snapshot.compare_to(previous[1], 'lineno')[:self.top]:
+                    lines.append(f"   {stat}")
+            lines.append('')
+            previous = (label, snapshot)
+        return '\n'.join(lines) + '\n'
+
+
+def profile_run(run_dir, config, mode=None):
+    """
+    Context manager profiling a run into ``<run_dir>/profile`` when ``mode`` is set.
+
+    Args:
+        run_dir (str): Run directory
+        config (dict): Configuration dictionary (``profile_*`` settings)
+        mode (str): 'sampling', 'cprofile' or None (no profiling)
+
+    Returns:
+        StageProfiler or nullcontext: Context manager for the profiled block
+    """
+    if not mode:
+        return nullcontext()
+    return StageProfiler.from_config(run_dir, config, mode)
+
+
+def memory_snapshot(label):
+    """
+    Takes a tracemalloc snapshot in the active profiler, if any.
+
+    Args:
+        label (str): Checkpoint name
+    """
+    if _active is not None:
+        _active.snapshot(label)
@@ -0,0 +1,169 @@
+"""
+Typed product records and a columnar buffer for a crawl's results.
+
+Fields are parsed once, at extraction time: the price text (``"$1,099.99"``)
+becomes integer cents, the rating a float and the review count an int. A
+``LaptopRecord`` is a slotted object (no per-instance ``__dict__``), and
+``RecordBuffer`` keeps a whole crawl in typed ``array`` columns, so a record
+costs its name string plus 24 bytes of numbers instead of a dict of boxed
+values and a price string. The columns convert to a DataFrame (or an Arrow
+table) with block copies instead of going through Python objects again, so
+the saved CSV already holds numeric prices and no cleaning pass is needed.
+"""
+
+import re
+from array import array
+
+import numpy as np
+import pandas as pd
+
+_NON_PRICE = re.compile(r'[^0-9.\-]')
+
+
+def parse_price_cents(value):
+    """
+    Parses a price into integer cents.
+
+    Args:
+        value (str or float): Price text (e.g. '$1,099.99', 'C$899') or a dollar amount
+
+    Returns:
+        int: Price in cents, or None if no price can be read
+
+    Example:
+        >>> parse_price_cents('$1,099.99')
+        109999
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return None if value != value else int(round(value * 100))
+    text = _NON_PRICE.sub('', str(value))
+    if not text:
+        return None
+    try:
+        return int(round(float(text) * 100))
+    except ValueError:
+        return None
+
+
+class LaptopRecord:
+    """
+    One extracted product.
+    """
+
+    __slots__ = ('name', 'price_cents', 'rating', 'reviews')
+
+    def __init__(self, name, price_cents, rating=0.0, reviews=0):
+        self.name = name
+        self.price_cents = price_cents
+        self.rating = float(rating)
+        self.reviews = int(reviews)
+
+    @property
+    def price(self):
+        """float: Price in dollars."""
+        return self.price_cents / 100
+
+    def __eq__(self, other):
+        if not isinstance(other, LaptopRecord):
+            return NotImplemented
+        return (self.name, self.price_cents, self.rating, self.reviews) == \
+            (other.name, other.price_cents, other.rating, other.reviews)
+
+    def __repr__(self):
+        return f'LaptopRecord({self.name!r}, ${self.price:,.2f}, rating={self.rating}, reviews={self.reviews})'
+
+
+def _column(values, dtype):
+    """
+    Copies a typed array into a numpy array with one memcpy (no per-item boxing).
+
+    A copy rather than a view: an ``array`` exporting its buffer cannot grow,
+    and the buffer keeps collecting records after a frame has been built.
+    """
+    return np.frombuffer(values, dtype=dtype, count=len(values)).copy() if len(values) else np.empty(0, dtype)
+
+
+class RecordBuffer:
+    """
+    Columnar, append-only store of ``LaptopRecord`` fields.
+    """
+
+    def __init__(self, records=()):
+        """
+        Args:
+            records (iterable): Initial records
+        """
+        self.names = []
+        self.price_cents = array('q')
+        self.ratings = array('d')
+        self.reviews = array('q')
+        self.extend(records)
+
+    def append(self, record):
+        """
+        Args:
+            record (LaptopRecord): Record to add
+        """
+        self.names.append(record.name)
+        self.price_cents.append(record.price_cents)
+        self.ratings.append(record.rating)
+        self.reviews.append(record.reviews)
+
+    def extend(self, records):
+        """
+        Args:
+            records (iterable): Records to add
+        """
+        for record in records:
+            self.append(record)
+
+    def clear(self):
+        """
+        Drops all records (the buffer can be reused for the next batch).
+        """
+        self.names.clear()
+        del self.price_cents[:], self.ratings[:], self.reviews[:]
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        for row in zip(self.names, self.price_cents, self.ratings, self.reviews):
+            yield LaptopRecord(*row)
+
+    def to_dataframe(self):
+        """
+        Builds the output frame (columns ``laptops``, ``prices``, ``ratings``, ``votes``).
+
+        Numeric columns are block copies of the array buffers; prices are
+        converted from cents to dollars in one vectorised step.
+
+        Returns:
+            pd.DataFrame: Typed dataframe (float prices and ratings, int votes)
+        """
+        return pd.DataFrame({
+            'laptops': list(self.names),
+            'prices': _column(self.price_cents, np.int64) / 100,
+            'ratings': _column(self.ratings, np.float64),
+            'votes': _column(self.reviews, np.int64)
+        })
+
+    def to_arrow(self):
+        """
+        Builds an Arrow table with the same columns as ``to_dataframe``.
+
+        Requires ``pyarrow`` (optional dependency).
+
+        Returns:
+            pyarrow.Table: Typed table
+        """
+        import pyarrow as pa
+
+        return pa.table({
+            'laptops': pa.array(self.names, type=pa.string()),
+            'prices': pa.array(_column(self.price_cents, np.int64) / 100),
+            'ratings': pa.array(_column(self.ratings, np.float64)),
+            'votes': pa.array(_column(self.reviews, np.int64))
+        })
@@ -0,0 +1,262 @@
+"""
+Change-frequency-driven recrawl scheduling.
+
+Every crawled (RAM filter, page) target gets a content hash of its extracted
+records. Across runs the scheduler learns how often each target actually
+changes and orders the next run by the probability that a target has changed
+since it was last crawled, so volatile pages are fetched first and stable
+pages less often, within a fixed per-run request budget.
+
+The change rate uses a smoothed Cho & Garcia-Molina estimator for pages that
+are only observed at crawl time (several changes between two crawls look like one):
+
+    rate = -log((n - x + 0.5) / (n + 1)) / mean_interval
+
+with ``n`` observed intervals and ``x`` of them showing a change. The ``+1``
+keeps the rate above zero, so a page that never changed still becomes due
+eventually. The probability of a change after ``t`` seconds is then
+``1 - exp(-rate * t)``.
+
+A run replaces the output of the previous one (CSV, aggregate summary and
+dataset date), so the scheduler also keeps each target's last records and
+the crawl carries those of deferred targets forward (``carried_records``):
+a page skipped because it rarely changes keeps its products in the output.
+"""
+
+import hashlib
+import json
+import math
+import os
+from time import time
+
+from loguru import logger
+
+from crawl_planner import plan_listings
+from records import LaptopRecord
+
+
+def records_hash(records):
+    """
+    Order-independent content hash of a page's extracted records.
+
+    Args:
+        records (list): ``LaptopRecord`` objects
+
+    Returns:
+        str: Hex digest
+    """
+    rows = sorted(
+        f"{r.name}\x1f{r.price_cents}\x1f{r.rating}\x1f{r.reviews}"
+        for r in records
+    )
+    return hashlib.sha256('\x1e'.join(rows).encode('utf-8')).hexdigest()
+
+
+class RecrawlScheduler:
+    """
+    Persistent per-target change statistics and run planning.
+    """
+
+    def __init__(self, state_file, min_probability=0.0):
+        """
+        Load the scheduler state.
+
+        Args:
+            state_file (str): JSON file holding per-target statistics
+            min_probability (float): Targets less likely than this to have
+                changed are skipped even if budget remains
+        """
+        self.state_file = state_file
+        self.min_probability = min_probability
+        self.state = {}
+        # Targets left out of this run's plan, and those crawled by it
+        self.deferred = []
+        self.recorded = set()
+        if os.path.exists(state_file):
+            with open(state_file) as f:
+                self.state = json.load(f)
+
+    @staticmethod
+    def key(ram_size, page):
+        return f'{ram_size}|{page}'
+
+    def change_rate(self, stats):
+        """
+        Estimated changes per second for one target.
+
+        Args:
+            stats (dict): Target statistics
+
+        Returns:
+            float: Change rate, or None if the target was crawled fewer than twice
+        """
+        intervals = stats['crawls'] - 1
+        if intervals < 1 or stats['observed_seconds'] <= 0:
+            return None
+        mean_interval = stats['observed_seconds'] / intervals
+        return -math.log((intervals - stats['changes'] + 0.5) / (intervals + 1.0)) / mean_interval
+
+    def change_probability(self, ram_size, page, now=None):
+        """
+        Probability that a target changed since its last crawl.
+
+        Unknown targets, and targets seen only once, score 1.0.
+
+        Args:
+            ram_size (str): RAM filter
+            page (str): Page number
+            now (float): Current timestamp (defaults to ``time()``)
+
+        Returns:
+            float: Probability in [0, 1]
+        """
+        stats = self.state.get(self.key(ram_size, page))
+        if stats is None:
+            return 1.0
+        rate = self.change_rate(stats)
+        if rate is None:
+            return 1.0
+        elapsed = (time() if now is None else now) - stats['last_crawled']
+        return 1.0 - math.exp(-rate * elapsed)
+
+    def plan(self, ram_sizes, pages, budget, now=None):
+        """
+        Orders and thins out the run's targets.
+
+        Args:
+            ram_sizes (list): RAM filters
+            pages (list): Page numbers
+            budget (int): Maximum requests this run
+            now (float): Current timestamp
+
+        Returns:
+            list: (ram_size, page) tuples, most likely changed first
+        """
+        return self.plan_targets([(r, p) for r in ram_sizes for p in pages], budget, now)
+
+    def plan_targets(self, candidates, budget, now=None):
+        """
+        Orders and thins out explicit (ram_size, page) targets.
+
+        Args:
+            candidates (list): (ram_size, page) tuples in their default order
+            budget (int): Maximum requests this run
+            now (float): Current timestamp
+
+        Returns:
+            list: (ram_size, page) tuples, most likely changed first
+        """
+        now = time() if now is None else now
+        scored = []
+        for order, (ram_size, page) in enumerate(candidates):
+            probability = self.change_probability(ram_size, page, now)
+            if probability >= self.min_probability:
+                # Ties (e.g. never crawled) keep the configured order
+                scored.append((-probability, order, ram_size, page))
+        scored.sort()
+
+        targets = [(ram_size, page) for _, _, ram_size, page in scored[:budget]]
+        planned = set(targets)
+        self.deferred = [target for target in candidates if target not in planned]
+        skipped = len(candidates) - len(targets)
+        logger.info("Recrawl plan: {} targets, {} deferred (budget {})", len(targets), skipped, budget)
+        return targets
+
+    def record(self, ram_size, page, records, now=None):
+        """
+        Record the outcome of crawling a target.
+
+        Args:
+            ram_size (str): RAM filter
+            page (str): Page number
+            records (list): Extracted records
+            now (float): Crawl timestamp
+
+        Returns:
+            bool: True if the content changed since the previous crawl
+        """
+        now = time() if now is None else now
+        digest = records_hash(records)
+        key = self.key(ram_size, page)
+        self.recorded.add(key)
+        last_records = [[r.name, r.price_cents, r.rating, r.reviews] for r in records]
+        stats = self.state.get(key)
+        if stats is None:
+            self.state[key] = {
+                'last_hash': digest,
+                'last_crawled': now,
+                'crawls': 1,
+                'changes': 0,
+                'observed_seconds': 0.0,
+                'last_records': last_records
+            }
+            return True
+
+        changed = digest != stats['last_hash']
+        stats['observed_seconds'] += now - stats['last_crawled']
+        stats['crawls'] += 1
+        stats['changes'] += int(changed)
+        stats['last_hash'] = digest
+        stats['last_crawled'] = now
+        stats['last_records'] = last_records
+        return changed
+
+    def carried_records(self, past_end=None):
+        """
+        Last records of the targets this run deferred and did not crawl.
+
+        Args:
+            past_end (function): Called with (ram_size, page); True for pages
+                the run found past their listing's end (``CrawlPlan.past_end``),
+                which are not carried
+
+        Returns:
+            list: (ram_size, page, records) tuples in plan order
+        """
+        carried = []
+        for ram_size, page in self.deferred:
+            stats = self.state.get(self.key(ram_size, page))
+            if (stats is None or 'last_records' not in stats or self.key(ram_size, page) in self.recorded
+                    or (past_end is not None and past_end(ram_size, page))):
+                continue
+            carried.append((ram_size, page, [LaptopRecord(*row) for row in stats['last_records']]))
+        if carried:
+            logger.info("Recrawl plan: {} products of {} deferred targets carried forward",
+                        sum(len(records) for _, _, records in carried), len(carried))
+        return carried
+
+    def save(self):
+        """
+        Persist the statistics (atomically replaces the state file).
+        """
+        os.makedirs(os.path.dirname(self.state_file) or '.', exist_ok=True)
+        temp_file = self.state_file + '.tmp'
+        with open(temp_file, 'w') as f:
+            json.dump(self.state, f)
+        os.replace(temp_file, self.state_file)
+
+
+def plan_crawl(config):
+    """
+    Returns the run's (ram_size, page) targets and the scheduler to report to.
+
+    The listings and pages covering the configured facets come from
+    ``crawl_planner.plan_listings``. Without ``config['recrawl_state_file']``
+    they are crawled in order, cut at the request budget.
+
+    Args:
+        config (dict): Configuration dictionary
+
+    Returns:
+        tuple: (CrawlPlan iterating (ram_size, page), RecrawlScheduler or None)
+    """
+    budget = config.get('request_budget', config.get('max_requests'))
+    plan = plan_listings(config)
+    state_file = config.get('recrawl_state_file')
+    if not state_file:
+        plan.targets = plan.targets[:budget]
+        return plan, None
+
+    scheduler = RecrawlScheduler(state_file, config.get('recrawl_min_probability', 0.0))
+    plan.targets = scheduler.plan_targets(plan.targets, budget)
+    return plan, scheduler
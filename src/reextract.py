@@ -0,0 +1,173 @@
+"""
+Offline re-extraction over saved pages.
+
+After a selector fix (e.g. Best Buy rotating a hashed class name such as
+``style-module_price__ql4Q1``), run ``scraper.extract_page_records`` again
+over pages that were already fetched instead of recrawling. Sources are the
+raw-HTML archive (``html_archive.py``) or a directory of saved ``.html``
+files. Pages are parsed in a process pool across all cores, and records are
+streamed to a CSV through ``save_data`` in batches:
+
+    python src/reextract.py --since 2025-06-01 --until 2025-07-01 --output data/reextracted.csv
+    python src/reextract.py --directory saved_pages/ --output data/reextracted.csv
+
+Archived pages of the unfiltered listing (see ``crawl_planner.py``) keep only
+the products of the requested RAM facets, as in the crawl that fetched them;
+the facet of a page is read from its URL. The output CSV is replaced, so an
+existing file is only overwritten with ``--overwrite``.
+"""
+
+import argparse
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from time import time
+
+from loguru import logger
+
+from config import get_config
+from crawl_planner import filter_facets, ram_size_from_url
+from data_cleaner import save_data
+from html_archive import HtmlArchive
+from metrics import registry
+from records import RecordBuffer
+from scraper import extract_page_records
+
+# Per-process archive handle and RAM facets set by ``_init_worker``
+_worker_archive = None
+_worker_ram_sizes = None
+
+
+def _init_worker(archive_path, ram_sizes=None):
+    global _worker_archive, _worker_ram_sizes
+    if archive_path:
+        _worker_archive = HtmlArchive(archive_path, train_after=0)
+    _worker_ram_sizes = ram_sizes
+
+
+def _extract_archived(item):
+    page_id, ram_size = item
+    records = extract_page_records(_worker_archive.get_page(page_id))
+    return filter_facets(records, ram_size, _worker_ram_sizes)
+
+
+def _extract_file(path):
+    with open(path, encoding='utf-8', errors='replace') as f:
+        return extract_page_records(f.read())
+
+
+def archived_pages(archive_path, since=None, until=None, all_captures=False):
+    """
+    Selects archived captures to re-extract.
+
+    Args:
+        archive_path (str): Archive database
+        since (float): Earliest fetch timestamp
+        until (float): Latest fetch timestamp
+        all_captures (bool): Keep every capture instead of the latest per URL
+
+    Returns:
+        list: (page id, RAM filter of its URL) in fetch order
+    """
+    archive = HtmlArchive(archive_path, train_after=0)
+    try:
+        pages = archive.iter_pages(since, until)
+    finally:
+        archive.close()
+    if all_captures:
+        return [(page_id, ram_size_from_url(url)) for page_id, url, _ in pages]
+    latest = {}
+    for page_id, url, _ in pages:
+        latest[url] = page_id
+    return sorted((page_id, ram_size_from_url(url)) for url, page_id in latest.items())
+
+
+def reextract(items, extract_func, output_file, archive_path=None, workers=None, batch_size=5000,
+              ram_sizes=None):
+    """
+    Runs extraction over ``items`` in a process pool and streams records to CSV.
+
+    Args:
+        items (list): (page id, RAM filter) pairs or file paths
+        extract_func (function): Top-level function mapping an item to records
+        output_file (str): CSV written through ``save_data`` (replaced, then appended)
+        archive_path (str): Archive each worker opens, for archived items
+        workers (int): Processes (defaults to all cores)
+        batch_size (int): Records buffered before each append
+        ram_sizes (list): RAM facets kept from archived unfiltered listing pages
+
+    Returns:
+        int: Number of records written
+    """
+    workers = workers or os.cpu_count() or 1
+    batch = RecordBuffer()
+    written = 0
+    started = time()
+
+    def flush():
+        nonlocal written
+        save_data(batch, output_file, append=written > 0)
+        written += len(batch)
+        batch.clear()
+
+    # Small chunks keep all workers busy while results stream back in order
+    chunksize = max(1, min(32, len(items) // (workers * 8) or 1))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(archive_path, ram_sizes)) as executor:
+        for pages_done, records in enumerate(executor.map(extract_func, items, chunksize=chunksize), 1):
+            batch.extend(records)
+            registry.counter('reextract_pages_total', 'Pages re-extracted offline').inc()
+            if len(batch) >= batch_size:
+                flush()
+            if pages_done % 500 == 0:
+                logger.info("Re-extracted {}/{} pages ({:.1f} pages/s)", pages_done, len(items),
+                            pages_done / (time() - started))
+
+    if len(batch) or written == 0:
+        flush()
+    elapsed = time() - started
+    logger.success("Re-extracted {} records from {} pages in {:.1f}s with {} processes",
+                   written, len(items), elapsed, workers)
+    return written
+
+
+def _timestamp(value):
+    return datetime.fromisoformat(value).timestamp() if value else None
+
+
+def main():
+    """
+    Command-line entry point.
+    """
+    config = get_config()
+    parser = argparse.ArgumentParser(description='Re-run product extraction over saved pages (no network)')
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--archive', default=config.get('archive_path'), help='Raw-HTML archive database')
+    source.add_argument('--directory', help='Directory of saved .html pages')
+    parser.add_argument('--since', help='ISO date/time of the earliest archived capture')
+    parser.add_argument('--until', help='ISO date/time of the latest archived capture')
+    parser.add_argument('--all-captures', action='store_true', help='Every capture, not only the latest per URL')
+    parser.add_argument('--output', required=True, help='CSV to write (replaced)')
+    parser.add_argument('--overwrite', action='store_true', help='Replace the output CSV if it exists')
+    parser.add_argument('--ram-sizes', nargs='+', default=config['ram_sizes'],
+                        help='RAM facets kept from unfiltered listing pages')
+    parser.add_argument('--workers', type=int, help='Processes (default: all cores)')
+    parser.add_argument('--batch-size', type=int, default=5000)
+    args = parser.parse_args()
+    if os.path.exists(args.output) and not args.overwrite:
+        parser.error(f"{args.output} exists; pass --overwrite to replace it")
+
+    if args.directory:
+        items = sorted(glob.glob(os.path.join(args.directory, '**', '*.html'), recursive=True))
+        extract_func, archive_path = _extract_file, None
+    else:
+        items = archived_pages(args.archive, _timestamp(args.since), _timestamp(args.until), args.all_captures)
+        extract_func, archive_path = _extract_archived, args.archive
+
+    logger.info("Re-extracting {} pages into {}", len(items), args.output)
+    reextract(items, extract_func, args.output, archive_path, args.workers, args.batch_size, args.ram_sizes)
+
+
+if __name__ == '__main__':
+    main()
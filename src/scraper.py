@@ -5,13 +5,23 @@ Updated for the NEW Best Buy Canada website structure (2025).
 The website is now React-based with different HTML structure.
 """
 
-from requests import get
 from bs4 import BeautifulSoup
+from functools import partial
 from time import sleep, time
 from random import randint
 from loguru import logger
 import re
 
+from fetcher import get_fetcher
+from field_selectors import class_filter, count_container, log_field_rates
+from html_archive import archive_page
+from recrawl_scheduler import plan_crawl
+from records import LaptopRecord, RecordBuffer, parse_price_cents
+from memory_budget import observe_page
+from metrics import registry, timer
+from stream_parser import StreamingPageParser
+from logger import sampled
+
 
 def extract_rating_and_reviews(container):
     """
@@ -25,7 +35,7 @@ def extract_rating_and_reviews(container):
     """
     try:
         # Look for aggregateRating schema
-        rating_div = container.find('span', class_='style-module_reviewCountContainer__HQlM5')
+        rating_div = container.find('span', class_=class_filter('rating'))
         if rating_div:
             # Extract rating value from meta tag
             rating_meta = rating_div.find('meta', {'itemprop': 'ratingValue'})
@@ -36,7 +46,7 @@ def extract_rating_and_reviews(container):
                 reviews = int(review_meta.get('content', 0))
                 return rating, reviews
     except Exception as e:
-        logger.debug(f"Error extracting rating: {str(e)}")
+        sampled.debug('rating_error', "Error extracting rating: {}", e)
     
     return None, None
 
@@ -53,19 +63,19 @@ def extract_price(container):
     """
     try:
         # Look for the price in the screen reader text (most reliable)
-        price_span = container.find('span', class_='style-module_screenReaderOnly__4QmbS')
+        price_span = container.find('span', class_=class_filter('price'))
         if price_span:
             price_text = price_span.get_text(strip=True)
             return price_text
         
         # Fallback: try the visible price div
-        price_div = container.find('div', class_='style-module_price__ql4Q1')
+        price_div = container.find('div', class_=class_filter('fallback_price'))
         if price_div:
             price_text = price_div.get_text(strip=True)
             return price_text
             
     except Exception as e:
-        logger.debug(f"Error extracting price: {str(e)}")
+        sampled.debug('price_error', "Error extracting price: {}", e)
     
     return None
 
@@ -74,45 +84,136 @@ def extract_laptop_data(container):
     """
     Extracts all relevant data from a laptop container.
     
+    Which of the name, price and rating elements were found is counted
+    (see ``field_selectors.count_container``) for the run's match rates.
+    
     Args:
         container: BeautifulSoup container element
     
     Returns:
-        dict: Dictionary containing name, price, rating, and reviews
+        LaptopRecord: Name, price in cents, rating and reviews
               Returns None if essential data is missing
     """
     try:
-        # Extract product name
-        name_h3 = container.find('h3', class_='productItemName_3IZ3c')
+        # Look up every field first, so the match rates count each of them
+        name_h3 = container.find('h3', class_=class_filter('name'))
+        price = extract_price(container)
+        rating, reviews = extract_rating_and_reviews(container)
+        count_container(name_h3 is not None, price is not None, rating is not None)
+        
         if not name_h3:
-            logger.debug("No product name found, skipping")
+            sampled.debug('missing_name', "No product name found, skipping")
             return None
         
         name = name_h3.get_text(strip=True)
         
-        # Extract price
-        price = extract_price(container)
-        if not price:
-            logger.debug(f"No price found for {name}, skipping")
+        price_cents = parse_price_cents(price)
+        if price_cents is None:
+            sampled.debug('missing_price', "No price found for {}, skipping", name)
             return None
         
-        # Extract rating and reviews
-        rating, reviews = extract_rating_and_reviews(container)
-        
-        return {
-            'name': name,
-            'price': price,
-            'rating': rating if rating is not None else 0,
-            'reviews': reviews if reviews is not None else 0
-        }
+        return LaptopRecord(
+            name,
+            price_cents,
+            rating if rating is not None else 0.0,
+            reviews if reviews is not None else 0
+        )
     except Exception as e:
-        logger.error(f"Error extracting laptop data: {str(e)}")
+        sampled.log('ERROR', 'extract_error', "Error extracting laptop data: {}", e)
         return None
 
 
-def scrape_page(url, request_num, start_time, config):
+def find_product_containers(page_html):
+    """
+    Finds the product containers of a parsed listing page.
+    
+    Args:
+        page_html: BeautifulSoup document
+    
+    Returns:
+        list: Product containers (schema.org Product divs, else ``listItem`` divs)
     """
-    Scrapes a single page and returns laptop containers.
+    containers = page_html.find_all('div', {'itemType': 'http://schema.org/Product'})
+    if not containers:
+        containers = page_html.find_all('div', class_=lambda x: x and 'listItem' in x)
+    return containers
+
+
+def has_product_containers(html):
+    """
+    Whether a page holds product containers (parses it again; meant for pages
+    that yielded no records, to tell rendered-only pages from extraction failures).
+    
+    Args:
+        html (str): Page HTML
+    
+    Returns:
+        bool: True if ``find_product_containers`` finds any
+    """
+    page_html = BeautifulSoup(html, 'html.parser')
+    found = bool(find_product_containers(page_html))
+    release_tree(page_html)
+    return found
+
+
+def release_tree(page_html):
+    """
+    Frees a parsed document now instead of at the next cyclic GC pass.
+    
+    Tags reference each other in cycles, so a dropped tree lingers until the
+    garbage collector runs. ``BeautifulSoup.decompose()`` on the document
+    object itself does not walk its children, so each top-level node is
+    decomposed instead.
+    
+    Args:
+        page_html: BeautifulSoup document
+    """
+    for node in list(page_html.contents):
+        node.decompose()
+
+
+def extract_page_records(html):
+    """
+    Parses a page and returns only its compact product records.
+    
+    The parse tree is decomposed before returning, so no ``Tag`` (and through
+    it the whole page) outlives this call. Also used to replay extraction over
+    archived pages (see ``reextract.py``).
+    
+    Args:
+        html (str): Page HTML (static or browser-rendered)
+    
+    Returns:
+        list: ``LaptopRecord`` objects
+    """
+    observe_page(len(html))
+    with timer('parse'):
+        page_html = BeautifulSoup(html, 'html.parser')
+        containers = find_product_containers(page_html)
+    
+    records = []
+    for container in containers:
+        # One observation per product (the 'extract' stage is per product, 'parse' per page)
+        with timer('extract'):
+            data = extract_laptop_data(container)
+        if data:
+            records.append(data)
+    
+    del containers
+    release_tree(page_html)
+    return records
+
+
+def fetch_page(url, request_num, start_time, config):
+    """
+    Downloads a single page and archives its body.
+    
+    This is the network half of ``scrape_page``; the staged pipeline
+    (``pipeline.py``) runs it ahead of extraction.
+    
+    With ``config['stream_parse']`` the body is fed to a
+    ``StreamingPageParser`` while it downloads, and the page's records are
+    returned instead of its HTML (``extract_fetched_page`` accepts both).
     
     Args:
         url (str): URL to scrape
@@ -121,7 +222,7 @@ def scrape_page(url, request_num, start_time, config):
         config (dict): Configuration dictionary
     
     Returns:
-        list: List of laptop containers or None if error
+        str or list: Page HTML (``LaptopRecord`` list when streaming) or None if error
     """
     # Get headers from config or use default
     user_agent = config.get('user_agent', 
@@ -137,119 +238,234 @@ def scrape_page(url, request_num, start_time, config):
         'Cache-Control': 'max-age=0'
     }
     
+    sink_factory = None
+    if config.get('stream_parse', False):
+        # The body is only kept (joined once, after parsing) when it is archived
+        keep_body = bool(config.get('archive_path'))
+        sink_factory = lambda: StreamingPageParser(keep_body=keep_body)
+    
     try:
-        # Make request with headers and timeout
-        timeout = config.get('timeout', 30)
-        response = get(url, headers=headers, timeout=timeout)
+        # Make request; timeouts, retries and hedging are handled by the fetch layer
+        with timer('fetch'):
+            response, body = get_fetcher(config).fetch(url, headers, sink_factory)
         
         # Monitor requests
         elapsed_time = time() - start_time
-        logger.info(f'Request #{request_num} | Frequency: {request_num/elapsed_time:.2f} req/s | URL: {url[:80]}...')
+        logger.info('Request #{} | Frequency: {:.2f} req/s | URL: {}...', request_num, request_num / elapsed_time, url[:80])
         
         # Check status code
         if response.status_code != 200:
-            logger.warning(f'Request #{request_num} | Status code: {response.status_code}')
+            logger.warning('Request #{} | Status code: {}', request_num, response.status_code)
             return None
         
-        # Parse HTML
-        page_html = BeautifulSoup(response.text, 'html.parser')
+        if isinstance(body, StreamingPageParser):
+            if body.chunks is not None:
+                archive_page(config, url, body.body)
+            return body.records
         
-        # Find product containers - NEW STRUCTURE
-        # Products are in <div> with class containing "listItem" and itemType schema
-        containers = page_html.find_all('div', {'itemType': 'http://schema.org/Product'})
-        
-        if not containers:
-            logger.warning(f'No product containers found on page. HTML might be dynamically loaded.')
-            logger.debug(f'Page title: {page_html.title.string if page_html.title else "No title"}')
-            # Try alternative selector
-            containers = page_html.find_all('div', class_=lambda x: x and 'listItem' in x)
-        
-        logger.info(f'Found {len(containers)} product containers on page')
-        return containers
+        # Keep the raw body so extractor fixes can be replayed without recrawling
+        archive_page(config, url, body)
+        return body
         
     except Exception as e:
-        logger.error(f'Request #{request_num} | Error: {str(e)}')
+        logger.error('Request #{} | Error: {}', request_num, e)
+        registry.counter('scrape_errors_total', 'Failed page requests').inc()
         return None
 
 
-def scrape_all_laptops(config, build_url_func):
+def extract_fetched_page(body, request_num):
     """
-    Scrapes all laptop data based on configuration.
+    Extracts the records of a page returned by ``fetch_page``.
+    
+    Args:
+        body (str or list): Page HTML, or the records already extracted
+            while streaming (``config['stream_parse']``)
+        request_num (int): Request number the page was fetched with
+    
+    Returns:
+        list: ``LaptopRecord`` objects or None if extraction failed
+    """
+    try:
+        records = body if isinstance(body, list) else extract_page_records(body)
+    except Exception as e:
+        logger.error('Request #{} | Error: {}', request_num, e)
+        registry.counter('scrape_errors_total', 'Failed page requests').inc()
+        return None
+    
+    if not records:
+        logger.warning('No products found on page. HTML might be dynamically loaded.')
+    logger.info('Extracted {} products from page', len(records))
+    return records
+
+
+def scrape_page(url, request_num, start_time, config):
+    """
+    Scrapes a single page and returns its extracted product records.
+    
+    Only the records leave this function; the response body and parse tree
+    are released before it returns.
     
     Args:
+        url (str): URL to scrape
+        request_num (int): Current request number
+        start_time (float): Start time of scraping session
         config (dict): Configuration dictionary
-        build_url_func (function): Function to build URLs
     
     Returns:
-        dict: Dictionary containing lists of names, prices, ratings, and reviews
-    """
-    names, prices, ratings, reviews = [], [], [], []
-    start_time = time()
-    requests = 0
-    successful_extractions = 0
-    
-    logger.info("=" * 60)
-    logger.info("Starting Best Buy Canada laptop scraping...")
-    logger.info(f"Pages to scrape: {len(config['pages'])}")
-    logger.info(f"RAM sizes to filter: {config['ram_sizes']}")
-    logger.info("=" * 60)
-    
-    for ram_size in config['ram_sizes']:
-        logger.info(f"\n--- Scraping RAM size: {ram_size}GB ---")
-        
-        for page in config['pages']:
-            # Random delay between requests to be respectful
-            if requests > 0:  # Don't sleep before first request
-                sleep_time = randint(config['sleep_min'], config['sleep_max'])
-                logger.info(f"Sleeping for {sleep_time} seconds...")
+        list: ``LaptopRecord`` objects or None if error
+    """
+    body = fetch_page(url, request_num, start_time, config)
+    if body is None:
+        return None
+    return extract_fetched_page(body, request_num)
+
+
+class CrawlRun:
+    """
+    One crawl over the planned (RAM size, page) targets, shared by all engines.
+    
+    Plans the targets, spaces the requests, accepts each page into the plan
+    (listing ends and extensions), keeps its records, reports it to the
+    recrawl scheduler, and logs the run summary. Engines only supply the
+    function that turns a URL into records (``run``), or feed finished pages
+    to ``collect`` themselves (tab pool, staged pipeline).
+    """
+    
+    def __init__(self, config, description, notes=()):
+        """
+        Plans the run and logs its header.
+        
+        Args:
+            config (dict): Configuration dictionary
+            description (str): Engine shown in the header, e.g. 'staged pipeline'
+            notes (iterable): Extra header lines
+        """
+        self.config = config
+        self.records = RecordBuffer()
+        self.start_time = time()
+        self.requests = 0
+        self.extracted = 0
+        # Order and thin out the (RAM size, page) targets within the request budget
+        self.targets, self.scheduler = plan_crawl(config)
+        
+        logger.info("=" * 60)
+        logger.info("Starting Best Buy Canada laptop scraping ({})...", description)
+        logger.info(f"Pages to scrape: {len(config['pages'])}")
+        logger.info(f"RAM sizes to filter: {config['ram_sizes']}")
+        logger.info(f"Planned requests: {len(self.targets)}")
+        for note in notes:
+            logger.info(note)
+        logger.info("=" * 60)
+    
+    def pause(self):
+        """
+        Random delay between requests to be respectful (none before the first).
+        """
+        if self.requests > 0:
+            sleep_time = randint(self.config['sleep_min'], self.config['sleep_max'])
+            logger.info("Sleeping for {} seconds...", sleep_time)
+            with timer('sleep'):
                 sleep(sleep_time)
+    
+    def collect(self, ram_size, page, page_records):
+        """
+        Accepts one finished page into the plan and keeps its records.
+        
+        Args:
+            ram_size (str): RAM filter of the page
+            page (str): Page number
+            page_records (list): Extracted records (None if the page failed)
+        
+        Returns:
+            list: Records kept (None or empty if there were none)
+        """
+        page_records = self.targets.accept(ram_size, page, page_records)
+        if not page_records:
+            logger.warning("No data found for RAM={}GB, Page={}", ram_size, page)
+            return page_records
+        
+        self.records.extend(page_records)
+        self.extracted += len(page_records)
+        logger.info("Extracted {} laptops from this page", len(page_records))
+        registry.counter('scrape_products_total', 'Products extracted').inc(len(page_records))
+        if self.scheduler is not None:
+            self.scheduler.record(ram_size, page, page_records)
+        return page_records
+    
+    def run(self, build_url_func, scrape_page_func):
+        """
+        Crawls the planned pages one after the other.
+        
+        Args:
+            build_url_func (function): Function to build URLs
+            scrape_page_func (function): ``scrape_page_func(url, request_num, start_time)``
+                returning the page's records, or None if it failed
+        
+        Returns:
+            RecordBuffer: Extracted records
+        """
+        current_ram_size = None
+        for ram_size, page in self.targets:
+            if ram_size != current_ram_size:
+                current_ram_size = ram_size
+                logger.info(f"\n--- Scraping RAM size: {ram_size}GB ---")
             
-            requests += 1
-            
-            # Build and scrape URL
+            self.pause()
+            self.requests += 1
             url = build_url_func(page, ram_size)
-            containers = scrape_page(url, requests, start_time, config)
-            
-            if containers is None or len(containers) == 0:
-                logger.warning(f"No data found for RAM={ram_size}GB, Page={page}")
-                continue
-            
-            # Extract data from containers
-            page_extractions = 0
-            for container in containers:
-                data = extract_laptop_data(container)
-                
-                if data:
-                    names.append(data['name'])
-                    prices.append(data['price'])
-                    ratings.append(data['rating'])
-                    reviews.append(data['reviews'])
-                    successful_extractions += 1
-                    page_extractions += 1
-            
-            logger.info(f"Extracted {page_extractions} laptops from this page")
-            
-            # Check if max requests exceeded
-            if requests >= config['max_requests']:
-                logger.warning(f'Reached maximum requests limit ({config["max_requests"]}). Stopping.')
-                break
-        
-        if requests >= config['max_requests']:
-            break
-    
-    # Summary
-    total_time = time() - start_time
-    logger.info("\n" + "=" * 60)
-    logger.info("SCRAPING COMPLETED!")
-    logger.info(f"Total requests: {requests}")
-    logger.info(f"Total laptops extracted: {successful_extractions}")
-    logger.info(f"Total time: {total_time:.2f} seconds")
-    logger.info(f"Average time per request: {total_time/requests:.2f} seconds")
-    logger.info("=" * 60)
-    
-    return {
-        'names': names,
-        'prices': prices,
-        'ratings': ratings,
-        'reviews': reviews
-    }
+            self.collect(ram_size, page, scrape_page_func(url, self.requests, self.start_time))
+        
+        self.carry_forward()
+        return self.finish()
+    
+    def carry_forward(self):
+        """
+        Keeps the last records of the pages the scheduler deferred
+        (see ``RecrawlScheduler.carried_records``).
+        
+        Returns:
+            list: (ram_size, page, records) tuples carried forward
+        """
+        if self.scheduler is None:
+            return []
+        # Deferred pages keep their last products in the output this run replaces
+        carried = self.scheduler.carried_records(self.targets.past_end)
+        for _, _, page_records in carried:
+            self.records.extend(page_records)
+        return carried
+    
+    def finish(self):
+        """
+        Saves the scheduler statistics and logs the run summary.
+        
+        Returns:
+            RecordBuffer: Records of the run
+        """
+        if self.scheduler is not None:
+            self.scheduler.save()
+        
+        total_time = time() - self.start_time
+        logger.info("\n" + "=" * 60)
+        logger.info("SCRAPING COMPLETED!")
+        logger.info(f"Total requests: {self.requests}")
+        logger.info(f"Total laptops extracted: {self.extracted}")
+        logger.info(f"Total time: {total_time:.2f} seconds")
+        logger.info(f"Average time per request: {total_time/max(self.requests, 1):.2f} seconds")
+        log_field_rates()
+        self.targets.log_summary()
+        logger.info("=" * 60)
+        return self.records
+
+
+def scrape_all_laptops(config, build_url_func):
+    """
+    Scrapes all laptop data based on configuration.
+    
+    Args:
+        config (dict): Configuration dictionary
+        build_url_func (function): Function to build URLs
+    
+    Returns:
+        RecordBuffer: Extracted records
+    """
+    return CrawlRun(config, 'HTTP').run(build_url_func, partial(scrape_page, config=config))
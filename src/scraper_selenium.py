@@ -11,13 +11,23 @@ from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
-from webdriver_manager.chrome import ChromeDriverManager
+from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
 from bs4 import BeautifulSoup
 from time import sleep, time
 from random import randint
 from loguru import logger
 
+from browser_daemon import daemon_state, resolve_chromedriver
+from field_selectors import class_filter, count_container
+from html_archive import archive_page
+from memory_budget import memory_budget, observe_page
+from metrics import registry, timer
+from records import LaptopRecord, RecordBuffer, parse_price_cents
+from scraper import CrawlRun, release_tree
+from logger import sampled
+
+PRODUCT_SELECTOR = 'div[itemtype="http://schema.org/Product"]'
+
 
 class BestBuySeleniumScraper:
     """
@@ -36,6 +46,9 @@ class BestBuySeleniumScraper:
         self.config = config
         self.headless = headless
         self.driver = None
+        self.browser_mode = config.get('browser_mode', 'auto')
+        self.attached = False
+        self.tabs = max(1, config.get('selenium_tabs', 1))
         
     def setup_driver(self):
         """
@@ -66,17 +79,34 @@ class BestBuySeleniumScraper:
         chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
         chrome_options.add_experimental_option('useAutomationExtension', False)
         
+        # Tab pool: driver.get must return at once so other tabs can be polled
+        page_load_strategy = 'none' if self.tabs > 1 else 'normal'
+        chrome_options.page_load_strategy = page_load_strategy
+        
         try:
-            # Try to use system ChromeDriver first, fallback to WebDriver Manager
-            try:
-                # Use system chromium-chromedriver
-                service = Service('/usr/bin/chromedriver')
-                self.driver = webdriver.Chrome(service=service, options=chrome_options)
-            except Exception as e:
-                logger.debug(f"System chromedriver not found, trying WebDriver Manager: {e}")
-                # Fallback to WebDriver Manager
-                service = Service(ChromeDriverManager().install())
-                self.driver = webdriver.Chrome(service=service, options=chrome_options)
+            daemon = None if self.browser_mode == 'launch' else daemon_state(self.config)
+            if daemon:
+                # Attach to the warm browser; launch-only options do not apply
+                attach_options = Options()
+                attach_options.debugger_address = daemon['debugger_address']
+                attach_options.page_load_strategy = page_load_strategy
+                self.driver = webdriver.Remote(command_executor=daemon['driver_url'], options=attach_options)
+                self.attached = True
+                logger.info("Attached to browser daemon at {}", daemon['debugger_address'])
+            elif self.browser_mode == 'attach':
+                logger.error("browser_mode is 'attach' but no browser daemon is running "
+                             "(start one with: python src/browser_daemon.py start)")
+                return False
+            else:
+                # Driver path is resolved once per Chrome version and cached, so this works offline
+                try:
+                    service = Service(resolve_chromedriver(self.config))
+                    self.driver = webdriver.Chrome(service=service, options=chrome_options)
+                except Exception as e:
+                    # A cached or system driver that does not match the browser: resolve once more
+                    logger.debug(f"Chromedriver could not start a session, trying WebDriver Manager: {e}")
+                    service = Service(resolve_chromedriver(self.config, refresh=True))
+                    self.driver = webdriver.Chrome(service=service, options=chrome_options)
             
             # Set page load timeout
             self.driver.set_page_load_timeout(self.config.get('timeout', 30))
@@ -94,8 +124,10 @@ class BestBuySeleniumScraper:
         """
         if self.driver:
             try:
+                # For an attached session this ends the session only;
+                # chromedriver leaves a browser it did not launch running
                 self.driver.quit()
-                logger.info("WebDriver closed successfully")
+                logger.info("Detached from browser daemon" if self.attached else "WebDriver closed successfully")
             except Exception as e:
                 logger.warning(f"Error closing WebDriver: {str(e)}")
     
@@ -112,9 +144,7 @@ class BestBuySeleniumScraper:
         try:
             # Wait for product containers with Schema.org markup
             WebDriverWait(self.driver, timeout).until(
-                EC.presence_of_element_located(
-                    (By.CSS_SELECTOR, 'div[itemtype="http://schema.org/Product"]')
-                )
+                EC.presence_of_element_located((By.CSS_SELECTOR, PRODUCT_SELECTOR))
             )
             logger.debug("Products loaded successfully")
             return True
@@ -149,39 +179,233 @@ class BestBuySeleniumScraper:
             start_time (float): Start time of scraping session
             
         Returns:
-            list: List of BeautifulSoup product containers
+            list: ``LaptopRecord`` objects, or None on failure
         """
         try:
             # Load the page
-            logger.info(f'Request #{request_num} | Loading: {url[:80]}...')
-            self.driver.get(url)
+            logger.info('Request #{} | Loading: {}...', request_num, url[:80])
+            with timer('render'):
+                self.driver.get(url)
+                
+                # Wait for products to load
+                products_loaded = self.wait_for_products(timeout=15)
             
-            # Wait for products to load
-            if not self.wait_for_products(timeout=15):
+            if not products_loaded:
                 logger.warning("No products found or timeout")
                 return None
             
             # Scroll to load lazy content
-            self.scroll_page()
+            with timer('scroll'):
+                self.scroll_page()
             
-            # Get page source and parse with BeautifulSoup
             page_source = self.driver.page_source
-            soup = BeautifulSoup(page_source, 'html.parser')
             
-            # Find product containers (note: HTML attributes are lowercase)
-            containers = soup.find_all('div', {'itemtype': lambda x: x and 'Product' in x})
+            # Keep the rendered page so extractor fixes can be replayed without recrawling
+            archive_page(self.config, url, page_source)
+            records = self.extract_page_records(page_source)
+            del page_source
             
             # Monitor progress
             elapsed_time = time() - start_time
-            logger.info(f'Request #{request_num} | Found {len(containers)} products | '
-                       f'Frequency: {request_num/elapsed_time:.2f} req/s')
+            logger.info('Request #{} | Found {} products | Frequency: {:.2f} req/s',
+                        request_num, len(records), request_num / elapsed_time)
             
-            return containers
+            return records
             
         except Exception as e:
-            logger.error(f'Request #{request_num} | Error: {str(e)}')
+            logger.error('Request #{} | Error: {}', request_num, e)
+            registry.counter('scrape_errors_total', 'Failed page requests').inc()
             return None
     
+    def open_tabs(self, count):
+        """
+        Opens tabs in the current browser until there are ``count``.
+        
+        Args:
+            count (int): Number of tabs in the pool
+        
+        Returns:
+            list: Window handles, the original tab first
+        """
+        handles = [self.driver.current_window_handle]
+        for _ in range(count - 1):
+            self.driver.switch_to.new_window('tab')
+            handles.append(self.driver.current_window_handle)
+        return handles
+    
+    def close_tabs(self, handles):
+        """
+        Closes the pool's extra tabs (they would outlive the session on a shared browser).
+        
+        Args:
+            handles (list): Handles returned by ``open_tabs``
+        """
+        for handle in handles[1:]:
+            try:
+                self.driver.switch_to.window(handle)
+                self.driver.close()
+            except Exception as e:
+                logger.debug(f"Error closing tab: {str(e)}")
+        self.driver.switch_to.window(handles[0])
+    
+    def _poll_tab(self, tab):
+        """
+        Checks a loading tab without waiting.
+        
+        Returns:
+            int: Product containers present, or -1 while the previous
+                 (already harvested) document is still displayed
+        """
+        self.driver.switch_to.window(tab['handle'])
+        try:
+            return self.driver.execute_script(
+                'return window.__bbHarvested ? -1 : document.querySelectorAll(arguments[0]).length;',
+                PRODUCT_SELECTOR
+            )
+        except WebDriverException:
+            # Document replaced mid-script while navigating
+            return -1
+    
+    def _finish_tab(self, tab):
+        """
+        Extracts a settled tab and marks its document as harvested.
+        
+        Returns:
+            list: ``LaptopRecord`` objects
+        """
+        self.driver.switch_to.window(tab['handle'])
+        page_source = self.driver.page_source
+        self.driver.execute_script('window.__bbHarvested = true;')
+        archive_page(self.config, tab['url'], page_source)
+        records = self.extract_page_records(page_source)
+        logger.info('Request #{} | Found {} products (tab)', tab['request_num'], len(records))
+        return records
+    
+    def scrape_with_tabs(self, targets, build_url_func, collect, start_time):
+        """
+        Loads pages concurrently in a pool of tabs of the one browser.
+        
+        Each free tab is sent to the next target (still spaced by the random
+        ``sleep_min``-``sleep_max`` delay, but without blocking), and loading
+        tabs are polled round-robin; a page is scrolled once its products are
+        present and parsed ``tab_scroll_settle`` seconds later. Extraction thus
+        overlaps with the other tabs' loading and the politeness delay.
+        
+        Targets are taken from the plan one at a time when a tab is free, so
+        listing ends (and extensions) found on finished pages apply to the
+        pages not yet dispatched.
+        
+        Args:
+            targets (CrawlPlan): Planned (ram_size, page) targets
+            build_url_func: Function to build URLs
+            collect (function): ``collect(ram_size, page, records)`` per finished page
+            start_time (float): Start time of scraping session
+        
+        Returns:
+            int: Number of requests made
+        """
+        tab_timeout = self.config.get('tab_timeout', 15)
+        settle = self.config.get('tab_scroll_settle', 2.0)
+        poll_interval = self.config.get('tab_poll_interval', 0.1)
+        
+        # Tabs are only filled while the browser stays under the memory budget
+        budget = memory_budget(self.config)
+        handles = self.open_tabs(self.tabs)
+        tabs = [{'handle': handle, 'busy': False} for handle in handles]
+        requests = 0
+        next_dispatch = 0.0
+        logger.info("Loading pages in {} tabs of one browser", len(tabs))
+        
+        try:
+            # Pages in flight may still extend the plan, so it is only done once none are left
+            while targets.remaining() or any(tab['busy'] for tab in tabs):
+                now = time()
+                free = next((tab for tab in tabs if not tab['busy']), None)
+                if free is not None and now >= next_dispatch and budget.acquire(block=False):
+                    target = targets.take()
+                    if target is None:
+                        budget.release()
+                    else:
+                        ram_size, page = target
+                        requests += 1
+                        url = build_url_func(page, ram_size)
+                        logger.info('Request #{} | Loading in tab: {}...', requests, url[:80])
+                        self.driver.switch_to.window(free['handle'])
+                        self.driver.get(url)
+                        free.update(busy=True, ram_size=ram_size, page=page, url=url, request_num=requests,
+                                    dispatched=now, ready_at=None)
+                        next_dispatch = now + randint(self.config['sleep_min'], self.config['sleep_max'])
+                        continue
+                
+                progressed = False
+                for tab in tabs:
+                    if not tab['busy']:
+                        continue
+                    now = time()
+                    try:
+                        if tab['ready_at'] is None:
+                            if self._poll_tab(tab) > 0:
+                                registry.observe_stage('render', now - tab['dispatched'])
+                                self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+                                tab['ready_at'] = now
+                            elif now - tab['dispatched'] > tab_timeout:
+                                logger.warning("Timeout waiting for products to load (waited {}s)", tab_timeout)
+                                collect(tab['ram_size'], tab['page'], None)
+                                tab['busy'] = False
+                        elif now - tab['ready_at'] >= settle:
+                            collect(tab['ram_size'], tab['page'], self._finish_tab(tab))
+                            tab['busy'] = False
+                    except Exception as e:
+                        logger.error('Request #{} | Error: {}', tab['request_num'], e)
+                        registry.counter('scrape_errors_total', 'Failed page requests').inc()
+                        collect(tab['ram_size'], tab['page'], None)
+                        tab['busy'] = False
+                    if not tab['busy']:
+                        budget.release()
+                        progressed = True
+                
+                if not progressed:
+                    sleep(poll_interval)
+                
+                elapsed_time = time() - start_time
+                sampled.debug('tab_progress', 'Tabs busy: {} | Frequency: {:.2f} req/s',
+                              sum(tab['busy'] for tab in tabs), requests / elapsed_time)
+        finally:
+            self.close_tabs(handles)
+        
+        return requests
+    
+    def extract_page_records(self, page_source):
+        """
+        Parses a rendered page and returns only its compact product records.
+        
+        The parse tree is decomposed before returning, so pages in flight hold
+        their records rather than a whole BeautifulSoup tree each.
+        
+        Args:
+            page_source (str): Rendered page HTML
+        
+        Returns:
+            list: ``LaptopRecord`` objects
+        """
+        observe_page(len(page_source))
+        with timer('parse'):
+            soup = BeautifulSoup(page_source, 'html.parser')
+            # Find product containers (note: HTML attributes are lowercase)
+            containers = soup.find_all('div', {'itemtype': lambda x: x and 'Product' in x})
+        
+        records = []
+        for container in containers:
+            # One observation per product (the 'extract' stage is per product, 'parse' per page)
+            with timer('extract'):
+                data = self.extract_laptop_data(container)
+            if data:
+                records.append(data)
+        
+        del containers
+        release_tree(soup)
+        return records
+    
     def extract_laptop_data(self, container):
         """
         Extract data from a product container.
@@ -190,31 +414,26 @@ class BestBuySeleniumScraper:
             container: BeautifulSoup container element
             
         Returns:
-            dict: Product data or None if extraction fails
+            LaptopRecord: Product data or None if extraction fails
         """
         try:
             # Extract product name
-            name_h3 = container.find('h3', class_='productItemName_3IZ3c')
-            if not name_h3:
-                return None
-            name = name_h3.get_text(strip=True)
+            name_h3 = container.find('h3', class_=class_filter('name'))
             
             # Extract price
-            price_span = container.find('span', class_='style-module_screenReaderOnly__4QmbS')
+            price_span = container.find('span', class_=class_filter('price'))
             if not price_span:
-                price_div = container.find('div', class_='style-module_price__ql4Q1')
+                price_div = container.find('div', class_=class_filter('fallback_price'))
                 price = price_div.get_text(strip=True) if price_div else None
             else:
                 price = price_span.get_text(strip=True)
             
-            if not price:
-                return None
-            
             # Extract rating and reviews
-            rating = 0
+            rating = 0.0
             reviews = 0
+            rating_meta = review_meta = None
             
-            rating_container = container.find('span', class_='style-module_reviewCountContainer__HQlM5')
+            rating_container = container.find('span', class_=class_filter('rating'))
             if rating_container:
                 rating_meta = rating_container.find('meta', {'itemprop': 'ratingValue'})
                 review_meta = rating_container.find('meta', {'itemprop': 'reviewCount'})
@@ -224,15 +443,20 @@ class BestBuySeleniumScraper:
                 if review_meta:
                     reviews = int(review_meta.get('content', 0))
             
-            return {
-                'name': name,
-                'price': price,
-                'rating': rating,
-                'reviews': reviews
-            }
+            count_container(name_h3 is not None, price is not None,
+                            rating_meta is not None and review_meta is not None)
+            if not name_h3:
+                return None
+            name = name_h3.get_text(strip=True)
+            
+            price_cents = parse_price_cents(price)
+            if price_cents is None:
+                return None
+            
+            return LaptopRecord(name, price_cents, rating, reviews)
             
         except Exception as e:
-            logger.debug(f"Error extracting product data: {str(e)}")
+            sampled.debug('extract_error', "Error extracting product data: {}", e)
             return None
     
     def scrape_all_laptops(self, build_url_func):
@@ -243,97 +467,24 @@ class BestBuySeleniumScraper:
             build_url_func: Function to build URLs
             
         Returns:
-            dict: Dictionary containing lists of names, prices, ratings, and reviews
+            RecordBuffer: Extracted records
         """
-        # Initialize data storage
-        names, prices, ratings, reviews = [], [], [], []
-        start_time = time()
-        requests = 0
-        successful_extractions = 0
-        
         # Setup driver
         if not self.setup_driver():
             logger.error("Failed to initialize WebDriver. Aborting.")
-            return {
-                'names': names,
-                'prices': prices,
-                'ratings': ratings,
-                'reviews': reviews
-            }
+            return RecordBuffer()
         
         try:
-            logger.info("=" * 60)
-            logger.info("Starting Best Buy Canada laptop scraping with Selenium...")
-            logger.info(f"Pages to scrape: {len(self.config['pages'])}")
-            logger.info(f"RAM sizes to filter: {self.config['ram_sizes']}")
-            logger.info("=" * 60)
-            
-            for ram_size in self.config['ram_sizes']:
-                logger.info(f"\n--- Scraping RAM size: {ram_size}GB ---")
-                
-                for page in self.config['pages']:
-                    # Random delay between requests
-                    if requests > 0:
-                        sleep_time = randint(
-                            self.config['sleep_min'],
-                            self.config['sleep_max']
-                        )
-                        logger.info(f"Sleeping for {sleep_time} seconds...")
-                        sleep(sleep_time)
-                    
-                    requests += 1
-                    
-                    # Build URL and scrape
-                    url = build_url_func(page, ram_size)
-                    containers = self.scrape_page(url, requests, start_time)
-                    
-                    if not containers:
-                        logger.warning(f"No data for RAM={ram_size}GB, Page={page}")
-                        continue
-                    
-                    # Extract data from each product
-                    page_extractions = 0
-                    for container in containers:
-                        data = self.extract_laptop_data(container)
-                        
-                        if data:
-                            names.append(data['name'])
-                            prices.append(data['price'])
-                            ratings.append(data['rating'])
-                            reviews.append(data['reviews'])
-                            successful_extractions += 1
-                            page_extractions += 1
-                    
-                    logger.info(f"✓ Extracted {page_extractions} laptops from this page")
-                    
-                    # Check max requests limit
-                    if requests >= self.config['max_requests']:
-                        logger.warning(f'Reached max requests ({self.config["max_requests"]})')
-                        break
-                
-                if requests >= self.config['max_requests']:
-                    break
-            
-            # Summary
-            total_time = time() - start_time
-            logger.info("\n" + "=" * 60)
-            logger.info("SCRAPING COMPLETED!")
-            logger.info(f"Total requests: {requests}")
-            logger.info(f"Total laptops extracted: {successful_extractions}")
-            logger.info(f"Total time: {total_time:.2f} seconds")
-            logger.info(f"Average time per request: {total_time/requests:.2f} seconds")
-            logger.info("=" * 60)
-            
+            notes = [f"Concurrent tabs: {self.tabs}"] if self.tabs > 1 else []
+            crawl = CrawlRun(self.config, 'Selenium', notes)
+            if self.tabs == 1:
+                return crawl.run(build_url_func, self.scrape_page)
+            crawl.requests = self.scrape_with_tabs(crawl.targets, build_url_func, crawl.collect, crawl.start_time)
+            crawl.carry_forward()
+            return crawl.finish()
         finally:
             # Always close the driver
             self.close_driver()
-        
-        return {
-            'names': names,
-            'prices': prices,
-            'ratings': ratings,
-            'reviews': reviews
-        }
 
 
 def scrape_all_laptops(config, build_url_func):
@@ -345,7 +496,7 @@ def scrape_all_laptops(config, build_url_func):
         build_url_func: Function to build URLs
         
     Returns:
-        dict: Dictionary containing lists of names, prices, ratings, and reviews
+        RecordBuffer: Extracted records
     """
     scraper = BestBuySeleniumScraper(config, headless=True)
     return scraper.scrape_all_laptops(build_url_func)
@@ -0,0 +1,261 @@
+"""
+Incremental product extraction from a listing page while it downloads.
+
+``scrape_page`` used to wait for the complete ``response.text`` and only then
+build a BeautifulSoup tree. ``StreamingPageParser`` is an event-based
+tokenizer (the standard library's ``HTMLParser``, which accepts input in
+arbitrary pieces through ``feed``) that keeps no tree: it follows the open
+elements on a stack and, inside each product container, only the few
+elements the extractor reads (name ``h3``, price span/div, rating metas).
+When a container's element closes its ``LaptopRecord`` is built and handed
+to ``on_record``, so extraction overlaps the network transfer and neither
+the document string nor a parse tree is ever held in full.
+
+The selection rules are those of ``scraper.find_product_containers`` and
+``scraper.extract_laptop_data``: schema.org Product ``div``s are the
+containers; ``listItem`` ``div``s are used only for pages without any (those
+are emitted at ``close``, since the fallback is only known at the end).
+Field classes follow the extraction strategy of ``field_selectors.py``.
+
+    parser = StreamingPageParser()
+    for chunk in response.iter_content(16384, decode_unicode=True):
+        parser.feed(chunk)
+    records = parser.close()
+"""
+
+from html.parser import HTMLParser
+
+from field_selectors import count_container, token_matcher
+from records import LaptopRecord, parse_price_cents
+
+PRODUCT_ITEMTYPE = 'http://schema.org/Product'
+
+# Elements without an end tag; never pushed on the open-element stack
+VOID_ELEMENTS = frozenset({'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+                           'link', 'meta', 'param', 'source', 'track', 'wbr'})
+
+
+class _Container:
+    """Fields of one open product container (first match of each wins, as with ``find``)."""
+
+    __slots__ = ('depth', 'is_product', 'name', 'price', 'fallback_price',
+                 'rating_depth', 'rating_done', 'rating', 'reviews')
+
+    def __init__(self, depth, is_product):
+        self.depth = depth
+        self.is_product = is_product
+        self.name = None
+        self.price = None
+        self.fallback_price = None
+        self.rating_depth = None
+        self.rating_done = False
+        self.rating = None
+        self.reviews = None
+
+    def record(self):
+        """``LaptopRecord`` of the container, or None without a name or price."""
+        count_container(self.name is not None,
+                        self.price is not None or self.fallback_price is not None,
+                        self.rating is not None and self.reviews is not None)
+        if self.name is None:
+            return None
+        price_cents = parse_price_cents(self.price if self.price is not None else self.fallback_price)
+        if price_cents is None:
+            return None
+        rating, reviews = 0.0, 0
+        if self.rating is not None and self.reviews is not None:
+            try:
+                rating, reviews = float(self.rating), int(self.reviews)
+            except (TypeError, ValueError):
+                rating, reviews = 0.0, 0
+        return LaptopRecord(self.name, price_cents, rating, reviews)
+
+
+class _Text:
+    """Text collected for one container field until its element closes."""
+
+    __slots__ = ('depth', 'container', 'field', 'parts')
+
+    def __init__(self, depth, container, field):
+        self.depth = depth
+        self.container = container
+        self.field = field
+        self.parts = []
+
+    def finish(self):
+        # Same as Tag.get_text(strip=True): each string stripped, empty ones dropped, no separator
+        setattr(self.container, self.field, ''.join(filter(None, (part.strip() for part in self.parts))))
+
+
+class StreamingPageParser(HTMLParser):
+    """
+    Feed-driven extractor of ``LaptopRecord`` objects from a listing page.
+    """
+
+    def __init__(self, on_record=None, keep_body=False, strategy=None):
+        """
+        Args:
+            on_record (function): Called with each record as soon as its container
+                closes (records are also collected and returned by ``close``)
+            keep_body (bool): Keep the fed chunks so the page can still be
+                archived (``body``); costs the memory streaming otherwise saves
+            strategy (str): Field selector strategy (None = ``field_selectors.get_strategy()``)
+        """
+        super().__init__(convert_charrefs=True)
+        self.on_record = on_record
+        self.records = []
+        self.chunks = [] if keep_body else None
+        self.bytes_fed = 0
+        self._open = []           # Names of the open elements
+        self._containers = []     # Open product containers, outermost first
+        self._texts = []          # Fields collecting text
+        self._fallback = []       # Records of listItem-only containers
+        self._seen_product = False
+        self._pending = []        # Pieces of the current text node (split by chunk boundaries)
+        self._is_name = token_matcher('name', strategy)
+        self._is_price = token_matcher('price', strategy)
+        self._is_fallback_price = token_matcher('fallback_price', strategy)
+        self._is_rating = token_matcher('rating', strategy)
+
+    @property
+    def body(self):
+        """str: The fed document (only with ``keep_body``, else None)."""
+        return ''.join(self.chunks) if self.chunks is not None else None
+
+    def feed(self, data):
+        """
+        Parses the next piece of the document, emitting completed records.
+
+        Args:
+            data (str): Next chunk of the page
+        """
+        if self.chunks is not None:
+            self.chunks.append(data)
+        self.bytes_fed += len(data)
+        super().feed(data)
+
+    def close(self):
+        """
+        Parses the rest of the input and closes every open element.
+
+        Returns:
+            list: All ``LaptopRecord`` objects of the page
+        """
+        super().close()
+        self._flush_text()
+        self._pop_to(0)
+        if not self._seen_product:
+            for record in self._fallback:
+                self._emit(record)
+        self._fallback = []
+        return self.records
+
+    def _emit(self, record):
+        self.records.append(record)
+        if self.on_record is not None:
+            self.on_record(record)
+
+    def _pop_to(self, depth):
+        """Closes open elements down to ``depth``, finishing the fields and containers they held."""
+        del self._open[depth:]
+        while self._texts and self._texts[-1].depth >= depth:
+            self._texts.pop().finish()
+        for container in self._containers:
+            if container.rating_depth is not None and container.rating_depth >= depth:
+                container.rating_depth = None
+                container.rating_done = True
+        while self._containers and self._containers[-1].depth >= depth:
+            container = self._containers.pop()
+            record = container.record()
+            if record is None:
+                continue
+            if container.is_product:
+                self._emit(record)
+            elif not self._seen_product:
+                self._fallback.append(record)
+
+    def _flush_text(self):
+        """Hands the completed text node to the collecting fields."""
+        if self._pending:
+            node = ''.join(self._pending)
+            self._pending = []
+            for text in self._texts:
+                text.parts.append(node)
+
+    def handle_starttag(self, tag, attrs):
+        self._flush_text()
+        depth = len(self._open)
+        if tag == 'meta':
+            self._handle_meta(attrs)
+            return
+        if tag in VOID_ELEMENTS:
+            return
+        self._open.append(tag)
+        if tag not in ('div', 'h3', 'span'):
+            return
+
+        attributes = dict(attrs)
+        classes = (attributes.get('class') or '').split()
+        if tag == 'div':
+            is_product = attributes.get('itemtype') == PRODUCT_ITEMTYPE
+            if is_product or any('listItem' in name for name in classes):
+                self._seen_product = self._seen_product or is_product
+                self._containers.append(_Container(depth, is_product))
+                return
+        if not self._containers:
+            return
+
+        for container in self._containers:
+            if tag == 'h3' and container.name is None and self._is_name(classes):
+                self._collect(depth, container, 'name')
+            elif tag == 'span' and container.price is None and self._is_price(classes):
+                self._collect(depth, container, 'price')
+            elif tag == 'div' and container.fallback_price is None and self._is_fallback_price(classes):
+                self._collect(depth, container, 'fallback_price')
+            elif (tag == 'span' and container.rating_depth is None and not container.rating_done
+                  and self._is_rating(classes)):
+                container.rating_depth = depth
+
+    def _collect(self, depth, container, field):
+        # Claimed at once, so a nested element of the same class cannot take over the field
+        setattr(container, field, '')
+        self._texts.append(_Text(depth, container, field))
+
+    def _handle_meta(self, attrs):
+        attributes = dict(attrs)
+        prop = attributes.get('itemprop')
+        if prop not in ('ratingValue', 'reviewCount'):
+            return
+        for container in self._containers:
+            if container.rating_depth is None:
+                continue
+            content = attributes.get('content', 0)
+            if prop == 'ratingValue' and container.rating is None:
+                container.rating = content
+            elif prop == 'reviewCount' and container.reviews is None:
+                container.reviews = content
+
+    def handle_startendtag(self, tag, attrs):
+        # <tag/>: opened and closed at once
+        self._flush_text()
+        if tag == 'meta':
+            self._handle_meta(attrs)
+        elif tag not in VOID_ELEMENTS:
+            self.handle_starttag(tag, attrs)
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        self._flush_text()
+        # Close the innermost open element of this name (and anything left open inside it)
+        for index in range(len(self._open) - 1, -1, -1):
+            if self._open[index] == tag:
+                self._pop_to(index)
+                return
+
+    def handle_data(self, data):
+        if self._texts:
+            self._pending.append(data)
+
+    def handle_comment(self, data):
+        # Comments end a text node but are not part of the text
+        self._flush_text()
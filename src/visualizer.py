@@ -4,14 +4,22 @@ Data visualization module for laptop data analysis.
 Enhanced with beautiful, modern styling and comprehensive visualizations.
 """
 
+import matplotlib
 import matplotlib.pyplot as plt
 import seaborn as sns
 import numpy as np
 from loguru import logger
 
-# Set the style for all plots
-plt.style.use('seaborn-v0_8-darkgrid')
-sns.set_palette("husl")
+from figure_cache import figure_key
+from metrics import timer
+
+# Style of all plots (part of every figure's cache key, see figure_cache.py)
+STYLE = {'style': 'seaborn-v0_8-darkgrid', 'palette': 'husl'}
+
+plt.style.use(STYLE['style'])
+sns.set_palette(STYLE['palette'])
+
+NUMERIC_COLUMNS = ['prices', 'ratings', 'votes']
 
 
 def create_histograms(df):
@@ -20,6 +28,9 @@ def create_histograms(df):
     
     Args:
         df (pd.DataFrame): Dataframe containing the data
+    
+    Returns:
+        matplotlib.figure.Figure: Figure (shown by ``visualize_data``)
     """
     fig, axes = plt.subplots(nrows=1, ncols=3, figsize=(18, 5))
     fig.suptitle('Distribution Analysis', fontsize=20, fontweight='bold', y=1.02)
@@ -58,7 +69,7 @@ def create_histograms(df):
     axes[2].legend(fontsize=10)
     
     plt.tight_layout()
-    plt.show()
+    return fig
 
 
 def create_boxplots(df):
@@ -67,6 +78,9 @@ def create_boxplots(df):
     
     Args:
         df (pd.DataFrame): Dataframe containing the data
+    
+    Returns:
+        matplotlib.figure.Figure: Figure (shown by ``visualize_data``)
     """
     fig, axes = plt.subplots(nrows=1, ncols=3, figsize=(18, 6))
     fig.suptitle('Statistical Distribution Analysis (Boxplots)', fontsize=20, fontweight='bold', y=1.02)
@@ -118,7 +132,7 @@ def create_boxplots(df):
         ax.spines['bottom'].set_linewidth(2)
     
     plt.tight_layout()
-    plt.show()
+    return fig
 
 
 def create_scatter_plots(df):
@@ -127,6 +141,9 @@ def create_scatter_plots(df):
     
     Args:
         df (pd.DataFrame): Dataframe containing the data
+    
+    Returns:
+        matplotlib.figure.Figure: Figure (shown by ``visualize_data``)
     """
     fig, axes = plt.subplots(nrows=1, ncols=2, figsize=(18, 6))
     fig.suptitle('Relationship Analysis', fontsize=20, fontweight='bold', y=1.02)
@@ -159,7 +176,7 @@ def create_scatter_plots(df):
         ax.spines['bottom'].set_linewidth(2)
     
     plt.tight_layout()
-    plt.show()
+    return fig
 
 
 def create_correlation_heatmap(df):
@@ -168,6 +185,9 @@ def create_correlation_heatmap(df):
     
     Args:
         df (pd.DataFrame): Dataframe containing the data
+    
+    Returns:
+        matplotlib.figure.Figure: Figure (shown by ``visualize_data``)
     """
     fig, ax = plt.subplots(figsize=(10, 8))
     
@@ -186,7 +206,7 @@ def create_correlation_heatmap(df):
     ax.set_yticklabels(['Prices', 'Ratings', 'Reviews'], fontsize=12, fontweight='bold', rotation=0)
     
     plt.tight_layout()
-    plt.show()
+    return fig
 
 
 def create_summary_stats_plot(df):
@@ -195,6 +215,9 @@ def create_summary_stats_plot(df):
     
     Args:
         df (pd.DataFrame): Dataframe containing the data
+    
+    Returns:
+        matplotlib.figure.Figure: Figure (shown by ``visualize_data``)
     """
     fig, ax = plt.subplots(figsize=(12, 8))
     ax.axis('off')
@@ -229,6 +252,10 @@ def create_summary_stats_plot(df):
     📦 DATASET:
        • Total Laptops: {len(df)}
     """
+    if 'family_id' in df.columns:
+        # Listings of one product (colours, open box, refurbished) count once
+        stats_text += f"""   • Distinct Products: {df['family_id'].nunique()}
+    """
     
     ax.text(0.1, 0.5, stats_text, fontsize=13, family='monospace',
             verticalalignment='center', bbox=dict(boxstyle='round', 
@@ -236,28 +263,142 @@ def create_summary_stats_plot(df):
     
     plt.title('Statistical Summary', fontsize=18, fontweight='bold', pad=20)
     plt.tight_layout()
+    return fig
+
+
+def show_cached_figure(path, dpi=100):
+    """
+    Shows a figure stored by the figure cache without redrawing it.
+    
+    Args:
+        path (str): PNG file
+        dpi (int): Resolution the figure was stored at (keeps its on-screen size)
+    """
+    image = plt.imread(path)
+    height, width = image.shape[:2]
+    fig = plt.figure(figsize=(width / dpi, height / dpi), dpi=dpi)
+    fig.figimage(image)
     plt.show()
+    plt.close(fig)
 
 
-def visualize_data(df):
+def figure_style(cache):
+    """
+    Style settings of the figures (part of their cache keys).
+    
+    Args:
+        cache (FigureCache): Figure cache the figures are stored in
+    
+    Returns:
+        dict: ``STYLE`` plus library versions and DPI
+    """
+    return dict(STYLE, matplotlib=matplotlib.__version__, seaborn=sns.__version__, dpi=cache.dpi)
+
+
+def render_figure(plot_func, df, columns, cache=None):
+    """
+    Shows one figure, from the cache when its data, code and style are unchanged.
+    
+    Args:
+        plot_func (function): One of the ``create_*`` functions
+        df (pd.DataFrame): Dataframe containing the data
+        columns (list): Columns ``plot_func`` reads
+        cache (FigureCache): Figure cache (None = always render)
+    
+    Returns:
+        tuple: (True if the figure was served from the cache, its ``figure_key`` or None)
+    """
+    key = None
+    if cache is not None:
+        key = figure_key(df, columns, plot_func, figure_style(cache))
+        path = cache.get(key)
+        if path is not None:
+            show_cached_figure(path, cache.dpi)
+            return True, key
+    fig = plot_func(df)
+    if key is not None:
+        cache.put(key, fig)
+    plt.show()
+    plt.close(fig)
+    return False, key
+
+
+def describe_data(df):
+    """
+    Descriptive statistics logged before the figures.
+    
+    Args:
+        df (pd.DataFrame): Dataframe containing the data
+    
+    Returns:
+        str: Statistics of the numeric columns (and of the product families, if matched)
+    """
+    report = f"Descriptive statistic measures of the data\n{df[NUMERIC_COLUMNS].describe()}"
+    if 'family_id' in df.columns:
+        families = df.groupby('family_id')['prices'].agg(['size', 'min', 'max'])
+        report += (f"\n{len(families)} product families; price spread within families with several listings:\n"
+                   f"{(families['max'] - families['min'])[families['size'] > 1].describe()}")
+    return report
+
+
+def show_cached_run(key, cache):
+    """
+    Replays a recorded run (statistics and figures) without loading its data.
+    
+    Args:
+        key (str): ``figure_cache.run_key`` of the run
+        cache (FigureCache): Figure cache
+    
+    Returns:
+        bool: False if the run or one of its figures is not cached
+    """
+    entry = cache.get_run(key)
+    if entry is None:
+        return False
+    logger.info('=' * 100)
+    logger.info(entry['report'])
+    logger.info('=' * 100)
+    with timer('plot'):
+        for path in entry['figures']:
+            show_cached_figure(path, cache.dpi)
+    logger.info(f"Run replayed from the figure cache ({len(entry['figures'])} figures, data not loaded)")
+    return True
+
+
+def visualize_data(df, cache=None, run_key=None):
     """
     Creates all enhanced visualizations for the data.
     
     Args:
         df (pd.DataFrame): Dataframe containing the data
+        cache (FigureCache): Serve unchanged figures from this cache
+            (see ``figure_cache.get_figure_cache``)
+        run_key (str): Record the run under this ``figure_cache.run_key``,
+            so ``show_cached_run`` can replay it
     """
     logger.info('=' * 100)
     logger.info('📊 CREATING BEAUTIFUL VISUALIZATIONS...')
     logger.info('=' * 100)
-    logger.info('Descriptive statistic measures of the data')
-    logger.info(f"\n{df[['prices', 'ratings', 'votes']].describe()}")
+    report = describe_data(df)
+    logger.info(report)
     logger.info('=' * 100)
     
+    # Each figure with the columns it reads (its cache key ignores the others)
+    summary_columns = NUMERIC_COLUMNS + (['family_id'] if 'family_id' in df.columns else [])
+    figures = [
+        (create_histograms, NUMERIC_COLUMNS),
+        (create_boxplots, NUMERIC_COLUMNS),
+        (create_scatter_plots, NUMERIC_COLUMNS),
+        (create_correlation_heatmap, NUMERIC_COLUMNS),
+        (create_summary_stats_plot, summary_columns)
+    ]
+    
     # Create all visualizations
-    create_histograms(df)
-    create_boxplots(df)
-    create_scatter_plots(df)
-    create_correlation_heatmap(df)
-    create_summary_stats_plot(df)
+    with timer('plot'):
+        rendered = [render_figure(plot_func, df, columns, cache) for plot_func, columns in figures]
+    if cache is not None:
+        logger.info(f"{sum(cached for cached, _ in rendered)} of {len(figures)} figures served from the figure cache")
+        if run_key is not None:
+            cache.put_run(run_key, [key for _, key in rendered], report)
     
     logger.success('✨ All visualizations created successfully!')
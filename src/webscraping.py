@@ -5,50 +5,177 @@
 This code is used to scrap data from the bestbuy website. On can adapt it to scrap data for his own purpose 
 '''
 
-from time import sleep
+import argparse
+import os
+from datetime import datetime
+from time import time
 
 # Import custom modules
-from config import get_config, build_url
-from scraper_selenium import scrape_all_laptops  # Using Selenium scraper
-from data_cleaner import save_data, load_and_process_data
+from canary import SelectorDriftError, preflight
+from config import get_config, make_url_builder
+from data_cleaner import save_data
+from field_selectors import set_strategy
+from figure_cache import get_figure_cache
+from pipeline import PIPELINE_ENGINES, run_pipeline
 from visualizer import visualize_data
-from loguru import logger
+from metrics import registry
+from profiling import PROFILE_MODES, memory_snapshot, profile_run
+from logger import logger, setup_logging, flush_logging
 
 
-def main():
+def get_scrape_function(config):
+    """
+    Returns the ``scrape_all_laptops`` of the configured engine.
+    
+    Engines are imported on demand, so the HTTP engines run without Selenium installed.
+    
+    Args:
+        config (dict): Configuration dictionary ('engine': 'hybrid', 'http' or 'selenium')
+    
+    Returns:
+        function: ``scrape_all_laptops(config, build_url_func)``
+    """
+    engine = config.get('engine', 'hybrid')
+    if engine == 'hybrid':
+        from hybrid_fetcher import scrape_all_laptops
+    elif engine == 'http':
+        from scraper import scrape_all_laptops
+    elif engine == 'selenium':
+        from scraper_selenium import scrape_all_laptops
+    else:
+        raise ValueError(f"Unknown engine '{engine}' (expected 'hybrid', 'http' or 'selenium')")
+    return scrape_all_laptops
+
+
+def create_run_dir(config):
+    """
+    Creates a timestamped directory for this run's reports.
+    
+    Args:
+        config (dict): Configuration dictionary
+    
+    Returns:
+        str: Path of the run directory
+    """
+    run_dir = os.path.join(config.get('runs_dir', 'runs'), datetime.now().strftime('%Y%m%d-%H%M%S'))
+    os.makedirs(run_dir, exist_ok=True)
+    return run_dir
+
+
+def write_run_report(run_dir, run_info):
+    """
+    Writes the metrics registry as a JSON run report and a Prometheus text file.
+    
+    Args:
+        run_dir (str): Run directory
+        run_info (dict): Run metadata to embed in the JSON report
+    """
+    registry.write_report(os.path.join(run_dir, 'report.json'), run_info)
+    registry.write_prometheus(os.path.join(run_dir, 'metrics.prom'))
+    logger.info(f"Run report written to {run_dir}")
+
+
+def add_profile_argument(parser):
+    """
+    Adds the ``--profile [MODE]`` option shared by the entry points.
+    
+    Args:
+        parser (argparse.ArgumentParser): Parser to extend
+    """
+    parser.add_argument('--profile', nargs='?', const='config', choices=PROFILE_MODES + ('config',),
+                        help="Profile the run per stage into runs/<timestamp>/profile "
+                             "(default mode: config['profile_mode'])")
+
+
+def profile_mode(args, config):
+    """
+    Resolves the profiler mode requested on the command line.
+    
+    Args:
+        args (argparse.Namespace): Parsed arguments with ``profile``
+        config (dict): Configuration dictionary
+    
+    Returns:
+        str: 'sampling', 'cprofile' or None (no profiling)
+    """
+    if args.profile == 'config':
+        return config.get('profile_mode', 'sampling')
+    return args.profile
+
+
+def main(argv=None):
     """
     Main execution function that orchestrates the web scraping workflow.
     
     Workflow:
         1. Load configuration
-        2. Scrape laptop data from BestBuy
-        3. Save raw data to CSV
-        4. Clean and process the data
-        5. Visualize results with plots and statistics
+        2. Probe one page to check that the product selectors still match
+           (``canary.py``); abort the run if they do not
+        3. Scrape laptop data from BestBuy; fetching, extraction and saving to
+           CSV overlap in the staged pipeline (hybrid and http engines)
+        4. Visualize the in-memory typed results with plots and statistics
+        5. Write the per-stage metrics run report (and, with ``--profile``,
+           the per-stage profile; see ``profiling.py``)
+    
+    Args:
+        argv (list): Command-line arguments (defaults to ``sys.argv[1:]``)
     """
-    logger.warning("Warning Simulation")
+    parser = argparse.ArgumentParser(description='Scrape Best Buy laptop listings and plot them')
+    add_profile_argument(parser)
+    args = parser.parse_args(argv)
     
     # Get configuration
     config = get_config()
+    setup_logging(config.get('log_mode', 'default'))
+    logger.warning("Warning Simulation")
     
-    # Scrape data
-    logger.info("Starting web scraping...")
-    data = scrape_all_laptops(config, build_url)
-    
-    # Wait before processing
-    sleep(3)
+    run_dir = create_run_dir(config)
+    started = time()
     
-    # Save raw data
-    logger.info("Saving data...")
-    save_data(data, config['output_file'])
+    with profile_run(run_dir, config, profile_mode(args, config)):
+        # Check the selectors on one page before spending the request budget
+        build_url_func = make_url_builder(config)
+        if config.get('canary', True):
+            try:
+                preflight(config, build_url_func)
+            except SelectorDriftError as e:
+                logger.error("Aborting the crawl: {}", e)
+                write_run_report(run_dir, {
+                    'started': datetime.fromtimestamp(started).isoformat(),
+                    'duration_seconds': round(time() - started, 3),
+                    'aborted': str(e)
+                })
+                flush_logging()
+                return
+        else:
+            set_strategy(config.get('extraction_strategy', 'exact'))
+        
+        # Scrape and save data; records are typed at extraction, so the frame needs no cleaning pass
+        engine = config.get('engine', 'hybrid')
+        logger.info("Starting web scraping ({} engine)...", engine)
+        if engine in PIPELINE_ENGINES:
+            data, df = run_pipeline(config, build_url_func)
+        else:
+            scrape_all_laptops = get_scrape_function(config)
+            data = scrape_all_laptops(config, build_url_func)
+            logger.info("Saving data...")
+            df = save_data(data, config['output_file'], aggregates_dir=config.get('aggregates_dir'),
+                           dataset_dir=config.get('dataset_dir'))
+        memory_snapshot('scraped')
+        
+        # Visualize results
+        logger.info("Visualizing data...")
+        visualize_data(df, get_figure_cache(config))
     
-    # Load and clean data
-    logger.info("Cleaning data...")
-    df = load_and_process_data(config['output_file'])
+    write_run_report(run_dir, {
+        'started': datetime.fromtimestamp(started).isoformat(),
+        'duration_seconds': round(time() - started, 3),
+        'products': len(data),
+        'output_file': config['output_file']
+    })
     
-    # Visualize results
-    logger.info("Visualizing data...")
-    visualize_data(df)
+    # Flush queued log sinks before exiting
+    flush_logging()
 
 
 if __name__ == '__main__':
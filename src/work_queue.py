@@ -0,0 +1,396 @@
+"""
+Persistent, lease-based URL work queue shared by crawl workers.
+
+A coordinator seeds the queue with the ``build_url`` URL space; workers on
+any node lease URLs with a visibility timeout, and acknowledge them together
+with their extracted records in one transaction. Leases that expire (crashed
+or stalled worker) become visible again. An acknowledgement carries the lease
+token, so a worker whose lease expired and was handed to someone else cannot
+write its results a second time. A done task keeps the token of the lease it
+was acknowledged under (``acked_leases``), so output written outside the
+queue, such as dataset shards, can be matched to the acknowledged lease.
+
+The default backend is a SQLite file (WAL mode); other backends register in
+``BACKENDS`` and are selected by the scheme of ``config['queue_url']``.
+"""
+
+import os
+import sqlite3
+import uuid
+from abc import ABC, abstractmethod
+from time import time, sleep
+
+from loguru import logger
+
+from records import LaptopRecord
+
+
+class Lease:
+    """
+    A URL handed to one worker until ``expires_at``.
+    """
+
+    __slots__ = ('url', 'page', 'ram_size', 'token', 'attempts', 'expires_at')
+
+    def __init__(self, url, page, ram_size, token, attempts, expires_at):
+        self.url = url
+        self.page = page
+        self.ram_size = ram_size
+        self.token = token
+        self.attempts = attempts
+        self.expires_at = expires_at
+
+    def __repr__(self):
+        return f'Lease({self.url!r}, attempts={self.attempts})'
+
+
+class QueueBackend(ABC):
+    """
+    Interface of a work queue backend.
+    """
+
+    @abstractmethod
+    def seed(self, tasks):
+        """
+        Add tasks that are not queued yet.
+
+        Args:
+            tasks (iterable): (url, page, ram_size) tuples
+
+        Returns:
+            int: Number of new tasks
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def lease(self, worker_id, visibility_timeout):
+        """
+        Lease the next pending (or expired) task.
+
+        Args:
+            worker_id (str): Identifier of the leasing worker
+            visibility_timeout (float): Seconds until the lease expires
+
+        Returns:
+            Lease: The leased task, or None if nothing is available
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def extend(self, lease, visibility_timeout):
+        """
+        Extend a lease that is still held.
+
+        Returns:
+            bool: False if the lease was lost
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def ack(self, lease, records):
+        """
+        Mark a task done and store its records atomically.
+
+        Args:
+            lease (Lease): Lease returned by ``lease``
+            records (list): Extracted ``LaptopRecord`` objects
+
+        Returns:
+            bool: False if the lease had expired and was taken over (records discarded)
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def nack(self, lease, error, retry_delay=0.0):
+        """
+        Give a task back after a failure.
+
+        Args:
+            lease (Lease): Lease returned by ``lease``
+            error (str): Failure description
+            retry_delay (float): Seconds before the task becomes visible again
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def acquire_slot(self, min_interval):
+        """
+        Reserve the next request slot under the global rate limit.
+
+        Args:
+            min_interval (float): Minimum seconds between two requests across all workers
+
+        Returns:
+            float: Seconds the caller must wait before sending its request
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def results(self):
+        """
+        Returns:
+            list: All stored ``LaptopRecord`` objects, in task order
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def acked_leases(self):
+        """
+        Returns:
+            dict: URL -> token of the lease each done task was acknowledged under
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def stats(self):
+        """
+        Returns:
+            dict: Task counts by state
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def close(self):
+        """
+        Release the backend's connections.
+        """
+        raise NotImplementedError
+
+
+class SQLiteWorkQueue(QueueBackend):
+    """
+    Work queue stored in a local SQLite file.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            url TEXT UNIQUE NOT NULL,
+            page TEXT,
+            ram_size TEXT,
+            state TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            lease_owner TEXT,
+            lease_token TEXT,
+            visible_at REAL NOT NULL DEFAULT 0,
+            last_error TEXT,
+            updated_at REAL
+        );
+        CREATE INDEX IF NOT EXISTS tasks_ready ON tasks (state, visible_at);
+        CREATE TABLE IF NOT EXISTS results (
+            task_id INTEGER NOT NULL REFERENCES tasks (id),
+            position INTEGER NOT NULL,
+            name TEXT,
+            price_cents INTEGER,
+            rating REAL,
+            reviews INTEGER,
+            PRIMARY KEY (task_id, position)
+        );
+        CREATE TABLE IF NOT EXISTS rate_limit (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            next_slot REAL NOT NULL
+        );
+    """
+
+    def __init__(self, path, max_attempts=3):
+        """
+        Open (and create if needed) the queue database.
+
+        Args:
+            path (str): SQLite file path
+            max_attempts (int): Leases per task before it is marked failed
+        """
+        self.path = path
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(self.SCHEMA)
+
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so two workers can
+        # never select the same task between SELECT and UPDATE
+        self.conn.execute('BEGIN IMMEDIATE')
+
+    def seed(self, tasks):
+        now = time()
+        self._transaction()
+        try:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO tasks (url, page, ram_size, updated_at) VALUES (?, ?, ?, ?)',
+                [(url, page, ram_size, now) for url, page, ram_size in tasks]
+            )
+            added = self.conn.total_changes - before
+            self.conn.execute('COMMIT')
+        except Exception:
+            self.conn.execute('ROLLBACK')
+            raise
+        return added
+
+    def lease(self, worker_id, visibility_timeout):
+        now = time()
+        self._transaction()
+        try:
+            # Expired leases whose attempts are used up are failed, not re-leased
+            self.conn.execute(
+                "UPDATE tasks SET state = 'failed', last_error = 'lease expired', updated_at = ? "
+                "WHERE state = 'leased' AND visible_at <= ? AND attempts >= ?",
+                (now, now, self.max_attempts)
+            )
+            row = self.conn.execute(
+                "SELECT id, url, page, ram_size, attempts FROM tasks "
+                "WHERE state IN ('pending', 'leased') AND visible_at <= ? "
+                "ORDER BY id LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is None:
+                self.conn.execute('COMMIT')
+                return None
+
+            task_id, url, page, ram_size, attempts = row
+            token = uuid.uuid4().hex
+            expires_at = now + visibility_timeout
+            self.conn.execute(
+                "UPDATE tasks SET state = 'leased', attempts = attempts + 1, lease_owner = ?, "
+                "lease_token = ?, visible_at = ?, updated_at = ? WHERE id = ?",
+                (worker_id, token, expires_at, now, task_id)
+            )
+            self.conn.execute('COMMIT')
+        except Exception:
+            self.conn.execute('ROLLBACK')
+            raise
+        return Lease(url, page, ram_size, token, attempts + 1, expires_at)
+
+    def extend(self, lease, visibility_timeout):
+        expires_at = time() + visibility_timeout
+        cursor = self.conn.execute(
+            "UPDATE tasks SET visible_at = ? WHERE url = ? AND lease_token = ? AND state = 'leased'",
+            (expires_at, lease.url, lease.token)
+        )
+        if cursor.rowcount:
+            lease.expires_at = expires_at
+        return bool(cursor.rowcount)
+
+    def ack(self, lease, records):
+        now = time()
+        self._transaction()
+        try:
+            row = self.conn.execute(
+                "SELECT id FROM tasks WHERE url = ? AND lease_token = ? AND state = 'leased'",
+                (lease.url, lease.token)
+            ).fetchone()
+            if row is None:
+                self.conn.execute('ROLLBACK')
+                logger.warning("Lease lost for {}, discarding {} records", lease.url, len(records))
+                return False
+
+            task_id = row[0]
+            self.conn.execute('DELETE FROM results WHERE task_id = ?', (task_id,))
+            self.conn.executemany(
+                'INSERT INTO results (task_id, position, name, price_cents, rating, reviews) VALUES (?, ?, ?, ?, ?, ?)',
+                [(task_id, position, r.name, r.price_cents, r.rating, r.reviews)
+                 for position, r in enumerate(records)]
+            )
+            self.conn.execute(
+                "UPDATE tasks SET state = 'done', updated_at = ? WHERE id = ?",
+                (now, task_id)
+            )
+            self.conn.execute('COMMIT')
+        except Exception:
+            self.conn.execute('ROLLBACK')
+            raise
+        return True
+
+    def nack(self, lease, error, retry_delay=0.0):
+        now = time()
+        self.conn.execute(
+            "UPDATE tasks SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "lease_token = NULL, visible_at = ?, last_error = ?, updated_at = ? "
+            "WHERE url = ? AND lease_token = ? AND state = 'leased'",
+            (self.max_attempts, now + retry_delay, str(error), now, lease.url, lease.token)
+        )
+
+    def acquire_slot(self, min_interval):
+        now = time()
+        self._transaction()
+        try:
+            row = self.conn.execute('SELECT next_slot FROM rate_limit WHERE id = 1').fetchone()
+            slot = max(now, row[0]) if row else now
+            self.conn.execute(
+                'INSERT OR REPLACE INTO rate_limit (id, next_slot) VALUES (1, ?)',
+                (slot + min_interval,)
+            )
+            self.conn.execute('COMMIT')
+        except Exception:
+            self.conn.execute('ROLLBACK')
+            raise
+        return slot - now
+
+    def results(self):
+        rows = self.conn.execute(
+            'SELECT r.name, r.price_cents, r.rating, r.reviews FROM results r '
+            'JOIN tasks t ON t.id = r.task_id ORDER BY t.id, r.position'
+        ).fetchall()
+        return [LaptopRecord(*row) for row in rows]
+
+    def acked_leases(self):
+        return dict(self.conn.execute("SELECT url, lease_token FROM tasks WHERE state = 'done'").fetchall())
+
+    def stats(self):
+        counts = dict(self.conn.execute('SELECT state, COUNT(*) FROM tasks GROUP BY state').fetchall())
+        return {state: counts.get(state, 0) for state in ('pending', 'leased', 'done', 'failed')}
+
+    def close(self):
+        """
+        Close the database connection.
+        """
+        self.conn.close()
+
+
+def _open_sqlite(location, config):
+    """Factory for ``sqlite:///path`` queue URLs."""
+    return SQLiteWorkQueue(location, max_attempts=config.get('max_attempts', 3))
+
+
+# Queue URL scheme -> factory(location, config)
+BACKENDS = {
+    'sqlite': _open_sqlite
+}
+
+
+def open_queue(config):
+    """
+    Opens the work queue named by ``config['queue_url']``.
+
+    Args:
+        config (dict): Configuration dictionary
+
+    Returns:
+        QueueBackend: The queue
+
+    Example:
+        >>> open_queue({'queue_url': 'sqlite:///data/crawl_queue.db'})
+    """
+    queue_url = config.get('queue_url', 'sqlite:///data/crawl_queue.db')
+    scheme, _, location = queue_url.partition('://')
+    if scheme not in BACKENDS:
+        raise ValueError(f"Unknown queue backend '{scheme}' (known: {', '.join(BACKENDS)})")
+    # SQLAlchemy-style paths: sqlite:///relative.db, sqlite:////absolute.db
+    if location.startswith('/'):
+        location = location[1:]
+    return BACKENDS[scheme](location, config)
+
+
+def wait_for_slot(queue, min_interval):
+    """
+    Blocks until this worker's request slot under the global rate limit.
+
+    Args:
+        queue (QueueBackend): Shared queue holding the rate limiter state
+        min_interval (float): Minimum seconds between requests cluster-wide
+    """
+    delay = queue.acquire_slot(min_interval)
+    if delay > 0:
+        sleep(delay)
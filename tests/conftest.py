@@ -0,0 +1,8 @@
+"""
+Shared test setup: the modules under test live in src/ and import each other by bare name.
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
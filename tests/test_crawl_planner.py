@@ -0,0 +1,110 @@
+"""
+Tests for listing ends and extensions of the crawl plan (src/crawl_planner.py).
+"""
+
+from config import UNFILTERED
+from crawl_planner import CrawlPlan, PlannerState
+from records import LaptopRecord
+
+
+def laptops(count, ram_size='8'):
+    return [LaptopRecord(f'Laptop {i} {ram_size}GB RAM', 100000, 4.0, 1) for i in range(count)]
+
+
+def crawl(plan, counts):
+    """Takes the plan's targets and accepts ``counts[page]`` products per page (0 past the end)."""
+    taken = []
+    for ram_size, page in plan:
+        taken.append((ram_size, page))
+        plan.accept(ram_size, page, laptops(counts.get(int(page), 0), ram_size))
+    return taken
+
+
+def test_short_page_ends_listing_and_skips_the_rest():
+    state = PlannerState()
+    plan = CrawlPlan([('8', str(page)) for page in range(1, 5)], 'filtered', 10, ['8'],
+                     state=state, served_page_size=10)
+
+    assert crawl(plan, {1: 10, 2: 4}) == [('8', '1'), ('8', '2')]
+    assert plan.ends == {'8': 2}
+    assert plan.skipped == 2
+    assert state.sizes == {'8': 14}
+
+
+def test_empty_page_ends_listing():
+    plan = CrawlPlan([('8', '1'), ('8', '2'), ('8', '3')], 'filtered', 10, ['8'], served_page_size=10)
+
+    assert crawl(plan, {1: 10}) == [('8', '1'), ('8', '2')]
+    assert plan.ends == {'8': 2}
+    assert plan.past_end('8', '3')
+
+
+def test_short_page_of_a_longer_listing_is_not_its_end():
+    state = PlannerState()
+    state.sizes['8'] = 30
+    plan = CrawlPlan([('8', '1'), ('8', '2'), ('8', '3')], 'filtered', 10, ['8'],
+                     state=state, served_page_size=10)
+
+    # Page 2 lost products to extraction failures: the listing still goes on
+    assert len(crawl(plan, {1: 10, 2: 6, 3: 10})) == 3
+    assert plan.ends == {}
+
+
+def test_full_last_page_extends_listing():
+    plan = CrawlPlan([('8', '1'), ('8', '2')], 'filtered', 10, ['8'], covers={'8': None},
+                     served_page_size=10)
+
+    assert crawl(plan, {1: 10, 2: 10, 3: 10, 4: 3}) == [('8', str(page)) for page in range(1, 5)]
+    assert plan.extended == 2
+    assert plan.ends == {'8': 4}
+
+
+def test_extension_stops_at_cover_and_budget():
+    covered = CrawlPlan([('8', '1')], 'filtered', 10, ['8'], covers={'8': 20}, served_page_size=10)
+    assert len(crawl(covered, {1: 10, 2: 10, 3: 10})) == 2
+
+    budgeted = CrawlPlan([('8', '1')], 'filtered', 10, ['8'], covers={'8': None}, budget=2,
+                         served_page_size=10)
+    assert len(crawl(budgeted, {1: 10, 2: 10, 3: 10})) == 2
+
+    # Listings without a cover are never extended
+    uncovered = CrawlPlan([('8', '1')], 'filtered', 10, ['8'], served_page_size=10)
+    assert len(crawl(uncovered, {1: 10, 2: 10})) == 1
+
+
+def test_take_returns_pages_appended_after_it_ran_dry():
+    plan = CrawlPlan([('8', '1')], 'filtered', 10, ['8'], covers={'8': None}, served_page_size=10)
+
+    assert plan.take() == ('8', '1')
+    assert plan.take() is None
+    plan.accept('8', '1', laptops(10))
+    assert plan.take() == ('8', '2')
+
+
+def test_cover_ends_listing_at_served_page_size():
+    plan = CrawlPlan([('8', '1'), ('8', '2'), ('8', '3')], 'filtered', 100, ['8'], covers={'8': 72},
+                     served_page_size=100)
+
+    assert not plan.past_end('8', '1')
+    assert plan.past_end('8', '2')
+    assert list(plan) == [('8', '1')]
+
+
+def test_page_size_is_learned_from_a_clamped_site():
+    state = PlannerState()
+    plan = CrawlPlan([('8', '1'), ('8', '2'), ('8', '3')], 'filtered', 100, ['8'], state=state)
+
+    # The site serves 24 products although 100 were asked for: only the empty page ends the listing
+    assert len(crawl(plan, {1: 24, 2: 24})) == 3
+    assert plan.served_page_size == 24
+    assert state.page_sizes == {'100': 24}
+    assert plan.ends == {'8': 3}
+
+
+def test_unfiltered_pages_keep_requested_facets():
+    plan = CrawlPlan([(UNFILTERED, '1')], 'unfiltered', 10, ['8', '16'], served_page_size=10)
+    records = laptops(3, '8') + laptops(2, '16') + laptops(5, '32')
+
+    kept = plan.accept(UNFILTERED, '1', records)
+    assert len(kept) == 5
+    assert plan.dropped == 5
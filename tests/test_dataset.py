@@ -0,0 +1,120 @@
+"""
+Tests for manifest commits and replacements of the sharded dataset (src/dataset.py).
+"""
+
+from dataset import DatasetWriter, load_dataset, read_manifest, unconfirmed_leases
+from records import LaptopRecord
+from work_queue import Lease
+
+CRAWL_DATE = '2025-06-15'
+
+
+def laptops(count, ram_size='8', prefix='Laptop'):
+    return [LaptopRecord(f'{prefix} {i} {ram_size}GB RAM', 100000, 4.0, 1) for i in range(count)]
+
+
+def writer(directory, source='data/laptops.csv', **kwargs):
+    return DatasetWriter(str(directory), crawl_date=CRAWL_DATE, source=source, **kwargs)
+
+
+def test_shards_are_visible_once_committed(tmp_path):
+    dataset = writer(tmp_path, batch_rows=100)
+    dataset.add(laptops(3, '8'), '8')
+    dataset.add(laptops(2, '16'), '16')
+    assert read_manifest(str(tmp_path)) == []
+
+    dataset.flush()
+    shards = read_manifest(str(tmp_path))
+    assert sorted((shard['ram_size'], shard['rows']) for shard in shards) == [('16', 2), ('8', 3)]
+    assert {shard['source'] for shard in shards} == {'data/laptops.csv'}
+
+    df = load_dataset(str(tmp_path), workers=1)
+    assert len(df) == 5
+    assert set(df['crawl_date']) == {CRAWL_DATE}
+
+
+def test_shards_missing_from_manifests_are_ignored(tmp_path):
+    dataset = writer(tmp_path)
+    dataset.add(laptops(3), '8')
+    dataset.flush()
+    stray = tmp_path / f'crawl_date={CRAWL_DATE}' / 'ram_size=8' / 'part-dead-writer-00001.csv'
+    stray.write_text('laptops,prices,ratings,votes\nOrphan 8GB RAM,1.0,1.0,1\n')
+
+    assert len(load_dataset(str(tmp_path), workers=1)) == 3
+
+
+def test_reopened_writer_continues_its_manifest(tmp_path):
+    first = writer(tmp_path, writer_id='node-1')
+    first.add(laptops(3), '8')
+    first.flush()
+
+    second = writer(tmp_path, writer_id='node-1')
+    second.add(laptops(2, prefix='Other'), '8')
+    second.flush()
+
+    shards = read_manifest(str(tmp_path))
+    assert len(shards) == 2
+    assert len({shard['path'] for shard in shards}) == 2
+
+
+def test_replace_waits_for_the_first_commit(tmp_path):
+    earlier = writer(tmp_path)
+    earlier.add(laptops(3), '8')
+    earlier.flush()
+
+    rerun = writer(tmp_path)
+    rerun.replace()
+    # Nothing written yet: a run failing now hides nothing
+    assert len(load_dataset(str(tmp_path), workers=1)) == 3
+
+    rerun.add(laptops(1, prefix='New'), '8')
+    rerun.flush()
+    df = load_dataset(str(tmp_path), workers=1)
+    assert list(df['laptops']) == ['New 0 8GB RAM']
+
+
+def test_replace_keeps_other_sources_and_dates(tmp_path):
+    earlier = writer(tmp_path)
+    earlier.add(laptops(3), '8')
+    earlier.flush()
+    other_source = writer(tmp_path, source='data/worker.csv')
+    other_source.add(laptops(2, prefix='Worker'), '8')
+    other_source.flush()
+    other_date = DatasetWriter(str(tmp_path), crawl_date='2025-06-14', source='data/laptops.csv')
+    other_date.add(laptops(4, prefix='Yesterday'), '8')
+    other_date.flush()
+
+    rerun = writer(tmp_path)
+    rerun.replace()
+    rerun.add(laptops(1, prefix='New'), '8')
+    rerun.flush()
+
+    df = load_dataset(str(tmp_path), workers=1)
+    assert len(df) == 2 + 4 + 1
+    assert not df['laptops'].str.startswith('Laptop').any()
+
+
+def test_finish_commits_replacement_without_rows(tmp_path):
+    earlier = writer(tmp_path)
+    earlier.add(laptops(3), '8')
+    earlier.flush()
+
+    rerun = writer(tmp_path)
+    rerun.replace()
+    rerun.finish()
+    assert read_manifest(str(tmp_path)) == []
+
+
+def test_lease_shards_are_hidden_until_confirmed(tmp_path):
+    lease = Lease('http://example/?page=1', '1', '8', 'token-1', 1, 0.0)
+    dataset = writer(tmp_path)
+    dataset.add(laptops(3), '8')
+    dataset.flush(lease)
+
+    assert read_manifest(str(tmp_path)) == []
+    assert unconfirmed_leases(str(tmp_path)) == {'token-1': 'http://example/?page=1'}
+
+    # Any writer's manifest may confirm the lease (e.g. a coordinator reconciling with the queue)
+    writer(tmp_path, writer_id='coordinator').confirm(['token-1'])
+    assert len(read_manifest(str(tmp_path))) == 1
+    assert unconfirmed_leases(str(tmp_path)) == {}
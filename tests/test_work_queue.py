@@ -0,0 +1,112 @@
+"""
+Tests for the lease-based work queue (src/work_queue.py).
+"""
+
+import pytest
+
+import work_queue
+from records import LaptopRecord
+from work_queue import QueueBackend, SQLiteWorkQueue
+
+
+class Clock:
+    """Replaces ``work_queue.time`` so lease expiry needs no sleeping."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(work_queue, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    queue = SQLiteWorkQueue(str(tmp_path / 'queue.db'), max_attempts=2)
+    queue.seed([('http://example/?page=1', '1', '8')])
+    yield queue
+    queue.close()
+
+
+def test_queue_backend_is_abstract():
+    with pytest.raises(TypeError):
+        QueueBackend()
+
+
+def test_seed_skips_queued_urls(queue):
+    assert queue.seed([('http://example/?page=1', '1', '8'), ('http://example/?page=2', '2', '8')]) == 1
+    assert queue.stats()['pending'] == 2
+
+
+def test_lease_hides_task_until_it_expires(queue, clock):
+    first = queue.lease('worker-a', visibility_timeout=30)
+    assert first.url == 'http://example/?page=1'
+    assert first.attempts == 1
+    assert queue.lease('worker-b', visibility_timeout=30) is None
+
+    clock.now += 31
+    second = queue.lease('worker-b', visibility_timeout=30)
+    assert second.url == first.url
+    assert second.attempts == 2
+    assert second.token != first.token
+
+
+def test_extend_keeps_lease_until_it_is_lost(queue, clock):
+    lease = queue.lease('worker-a', visibility_timeout=30)
+    clock.now += 20
+    assert queue.extend(lease, visibility_timeout=30)
+    clock.now += 20
+    assert queue.lease('worker-b', visibility_timeout=30) is None
+
+    clock.now += 11
+    queue.lease('worker-b', visibility_timeout=30)
+    assert not queue.extend(lease, visibility_timeout=30)
+
+
+def test_expired_lease_fails_after_max_attempts(queue, clock):
+    queue.lease('worker-a', visibility_timeout=30)
+    clock.now += 31
+    queue.lease('worker-b', visibility_timeout=30)
+    clock.now += 31
+    assert queue.lease('worker-c', visibility_timeout=30) is None
+    assert queue.stats() == {'pending': 0, 'leased': 0, 'done': 0, 'failed': 1}
+
+
+def test_ack_with_stale_token_is_discarded(queue, clock):
+    stale = queue.lease('worker-a', visibility_timeout=30)
+    clock.now += 31
+    current = queue.lease('worker-b', visibility_timeout=30)
+
+    assert not queue.ack(stale, [LaptopRecord('Stale 8GB RAM', 100000, 4.0, 3)])
+    assert queue.results() == []
+    assert queue.stats()['leased'] == 1
+
+    records = [LaptopRecord('Laptop 8GB RAM', 99999, 4.5, 12)]
+    assert queue.ack(current, records)
+    assert [record.name for record in queue.results()] == ['Laptop 8GB RAM']
+    assert queue.acked_leases() == {current.url: current.token}
+
+    # A done task cannot be acknowledged again, not even under its own lease
+    assert not queue.ack(current, records)
+    assert len(queue.results()) == 1
+
+
+def test_nack_makes_task_visible_after_retry_delay(queue, clock):
+    lease = queue.lease('worker-a', visibility_timeout=30)
+    queue.nack(lease, 'HTTP 500', retry_delay=5)
+    assert queue.lease('worker-b', visibility_timeout=30) is None
+    assert not queue.ack(lease, [])
+
+    clock.now += 5
+    assert queue.lease('worker-b', visibility_timeout=30).attempts == 2
+
+
+def test_open_queue_rejects_unknown_scheme():
+    with pytest.raises(ValueError):
+        work_queue.open_queue({'queue_url': 'redis://localhost/0'})
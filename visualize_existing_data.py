@@ -1,37 +1,78 @@
 """
 Script to visualize existing laptop data from CSV file.
 
-This script loads the laptops_bestbuy_2025.csv file and creates beautiful visualizations.
+This script loads the laptops_bestbuy_2025.csv file (or partitions of the
+dataset directory written by ``dataset.py``) and creates beautiful visualizations.
+A run whose input, options and code are unchanged is replayed from the figure
+cache without loading the data (see ``figure_cache.run_key``).
 """
 
+import argparse
 import sys
 sys.path.append('src')
 
+import data_cleaner
+import dataset
+import normalize
+import product_matching
+import visualizer
+from config import get_config
 from data_cleaner import load_and_process_data
-from visualizer import visualize_data
+from figure_cache import get_figure_cache, run_key
+from profiling import memory_snapshot, profile_run
+from visualizer import figure_style, show_cached_run, visualize_data
+from webscraping import add_profile_argument, create_run_dir, profile_mode
 from loguru import logger
 
 
-def main():
+def main(argv=None):
     """
     Main function to load and visualize existing data.
+    
+    Args:
+        argv (list): Command-line arguments (defaults to ``sys.argv[1:]``)
     """
+    parser = argparse.ArgumentParser(description='Plot an existing laptop CSV file')
+    parser.add_argument('csv_file', nargs='?', default='data/laptops_bestbuy_2025.csv',
+                        help='CSV file or partitioned dataset directory')
+    parser.add_argument('--from', dest='start', help='Dataset only: first crawl date (YYYY-MM-DD)')
+    parser.add_argument('--to', dest='end', help='Dataset only: last crawl date (YYYY-MM-DD)')
+    parser.add_argument('--ram-sizes', nargs='+', help='Dataset only: RAM partitions to read')
+    add_profile_argument(parser)
+    args = parser.parse_args(argv)
+    
     # Path to the CSV file
-    csv_file = 'data/laptops_bestbuy_2025.csv'
+    csv_file = args.csv_file
+    config = get_config()
+    mode = profile_mode(args, config)
     
     logger.info(f"Loading data from {csv_file}...")
     
     try:
-        # Load and clean the data
-        df = load_and_process_data(csv_file)
-        
-        logger.info(f"Successfully loaded {len(df)} laptops")
-        logger.info(f"\nDataframe shape: {df.shape}")
-        logger.info(f"Columns: {df.columns.tolist()}")
-        
-        # Create visualizations
-        logger.info("\nCreating visualizations...")
-        visualize_data(df)
+        with profile_run(create_run_dir(config) if mode else None, config, mode):
+            # Checked before loading: cleaning and product matching cost more than the plots
+            cache = get_figure_cache(config)
+            key = None
+            if cache is not None:
+                params = {'start': args.start, 'end': args.end, 'ram_sizes': args.ram_sizes}
+                key = run_key(csv_file, params, [data_cleaner, normalize, dataset, product_matching, visualizer],
+                              figure_style(cache))
+                if show_cached_run(key, cache):
+                    logger.success("Visualization complete!")
+                    return
+            
+            # Load and clean the data
+            df = load_and_process_data(csv_file, match_products=True, start=args.start,
+                                       end=args.end, ram_sizes=args.ram_sizes)
+            memory_snapshot('loaded')
+            
+            logger.info(f"Successfully loaded {len(df)} laptops")
+            logger.info(f"\nDataframe shape: {df.shape}")
+            logger.info(f"Columns: {df.columns.tolist()}")
+            
+            # Create visualizations
+            logger.info("\nCreating visualizations...")
+            visualize_data(df, cache, key)
         
         logger.success("Visualization complete!")
         